@@ -1,136 +1,127 @@
-import pandas as pd
-import numpy as np
-from sklearn.linear_model import Ridge
-import matplotlib.pyplot as plt
+import os
 
+import pandas as pd
 
-# Load the dataset
-file_path = “”
-df = pd.read_excel(file_path)
+from ordc.profiling import Profiler
+from ordc.render import render_figures
+from ordc.reporting import rolling_effects_figure, synthetic_control_figures
+from ordc.rolling import rolling_did, rolling_gap, seasonal_gap
+from ordc.staggered import StaggeredDiD
+from ordc.stream import hour_window, stream_peak_prices
+from ordc.synth import (POLICY_DATE, in_time_placebos, placebo_test,
+                        price_matrix, simplex_synthetic_control, synthetic_control,
+                        treated_zones)
 
+# The hourly dataset (or a list of hourly/sub-hourly CSV or Parquet files)
+file_path = "Sythetic control regression database.xlsx"
+RESULTS_DIR = "synthetic_control_results"
 
-# Convert Date column to datetime
-df['Date'] = pd.to_datetime(df['Date'])
+# Each step is recorded (wall/CPU time, peak memory, data size) and written to
+# RESULTS_DIR/pipeline_profile.json/.csv; set ORDC_PROFILE to profile a step
+profiler = Profiler()
 
 
 # Step 1: Filter for peak hours (17–20), calculate daily avg DA_LMP
-df_peak = df[df['Hr_End'].between(17, 20)].groupby(['Date', 'zone', 'treated', 'post'])['DA_LMP'].mean().reset_index()
-df_peak.rename(columns={'DA_LMP': 'avg_price'}, inplace=True)
+# The hourly file is streamed in chunks; only per-(date, zone) sums are kept in memory
+with profiler.stage('peak_prices') as step:
+    df_peak = step.shape(stream_peak_prices(file_path, window=hour_window(17, 20)))
 
 
 # Identify treated zone
-treated_zone = df_peak[df_peak['treated'] == 1]['zone'].unique()[0]
+treated_zone = treated_zones(df_peak)[0]
 
 
 # Step 2: Create synthetic control for the treated zone
-pre_data = df_peak[df_peak['post'] == 0]
-X_controls = pre_data[pre_data['treated'] == 0].pivot(index='Date', columns='zone', values='avg_price')
-y_treated = pre_data[pre_data['treated'] == 1].pivot(index='Date', columns='zone', values='avg_price').iloc[:, 0]
-
-
-# Fit Ridge regression model
-model = Ridge(alpha=1.0, fit_intercept=False)
-model.fit(X_controls, y_treated)
-weights = model.coef_
-
-
-# Apply weights to all periods
-X_full = df_peak[df_peak['treated'] == 0].pivot(index='Date', columns='zone', values='avg_price')
-X_full = X_full[X_controls.columns]
-synthetic = X_full @ weights
-actual = df_peak[df_peak['treated'] == 1].set_index('Date')['avg_price']
+# The date x zone price matrix is built once and shared by every fit below
+with profiler.stage('price_matrix') as step:
+    prices = step.shape(price_matrix(df_peak))
+control_zones = [zone for zone in prices.columns if zone != treated_zone]
 
 
 # Step 3: Compute treatment effect (actual - synthetic)
-result_df = actual.to_frame(name='actual')
-result_df['synthetic'] = synthetic
-result_df['gap'] = result_df['actual'] - result_df['synthetic']
-result_df['post'] = result_df.index >= pd.Timestamp('2022-05-01')
+with profiler.stage('synthetic_control', data=prices):
+    result_df, weights = synthetic_control(prices, treated_zone, control_zones,
+                                           post_start=POLICY_DATE, alpha=1.0)
 avg_effect = result_df[result_df['post']]['gap'].mean()
 
-
-# Step 4: Plot actual vs synthetic
-plt.figure(figsize=(12, 6))
-plt.plot(result_df.index, result_df['actual'], label="Actual (Treated Zone)", linewidth=2)
-plt.plot(result_df.index, result_df['synthetic'], label="Synthetic Control", linestyle='--', linewidth=2)
-plt.axvline(x=pd.Timestamp('2022-05-01'), color='gray', linestyle=':', label='Policy Start (May 2022)')
-plt.title("Synthetic Control (Peak Hours 16–19 Avg Price)")
-plt.ylabel("DA_LMP ($/MWh)")
-plt.xlabel("Date")
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-
-# Step 5: Plot the treatment effect (gap)
-plt.figure(figsize=(12, 5))
-plt.plot(result_df.index, result_df['gap'], label='Treatment Effect (Actual - Synthetic)', color='crimson')
-plt.axvline(x=pd.Timestamp('2022-05-01'), color='gray', linestyle=':', label='Policy Start')
-plt.axhline(0, color='black', linestyle='--')
-plt.title('Estimated Treatment Effect on DA_LMP (Peak Hours)')
-plt.xlabel('Date')
-plt.ylabel('Price Gap ($/MWh)')
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-
-# Step 6: Placebo tests — run synthetic control for each control zone
-control_zones = df_peak[df_peak['treated'] == 0]['zone'].unique()
-post_policy_start = pd.Timestamp('2022-05-01')
-pseudo_gaps = []
-
-
-for zone in control_zones:
-   try:
-       # Create placebo outcome
-       y_placebo = pre_data[pre_data['zone'] == zone].pivot(index='Date', columns='zone', values='avg_price').iloc[:, 0]
-
-
-       # Donor pool excludes this placebo zone
-       donor_data = pre_data[(pre_data['zone'] != zone) & (pre_data['treated'] == 0)]
-       X_donors = donor_data.pivot(index='Date', columns='zone', values='avg_price')
-
-
-       if X_donors.shape[1] < 2:
-           continue  # skip if not enough donor zones
-
-
-       # Fit synthetic model for placebo
-       model_placebo = Ridge(alpha=1.0, fit_intercept=False)
-       model_placebo.fit(X_donors, y_placebo)
-       weights_placebo = model_placebo.coef_
-
-
-       # Apply to full period
-       full_donor = df_peak[df_peak['zone'].isin(X_donors.columns)].pivot(index='Date', columns='zone', values='avg_price')
-       full_donor = full_donor[X_donors.columns]
-       synth_placebo = full_donor @ weights_placebo
-
-
-       # Actual placebo zone price
-       actual_placebo = df_peak[df_peak['zone'] == zone].set_index('Date')['avg_price']
-
-
-       # Calculate gap
-       gap_placebo = actual_placebo - synth_placebo
-       pseudo_avg_gap = gap_placebo[gap_placebo.index >= post_policy_start].mean()
-       pseudo_gaps.append(pseudo_avg_gap)
-
-
-   except Exception as e:
-       print(f"Skipped {zone} due to error: {e}")
-       continue
+# Robustness check: classic synthetic control with non-negative weights summing to one
+with profiler.stage('simplex_synthetic_control', data=prices):
+    convex_df, convex_weights = simplex_synthetic_control(prices, treated_zone, control_zones,
+                                                          post_start=POLICY_DATE)
+convex_effect = convex_df[convex_df['post']]['gap'].mean()
+
+
+# Steps 4-5: Plot actual vs synthetic and the treatment effect (gap)
+# Figures are written headless (Agg) and skipped when their data is unchanged. They are drawn
+# in this process: a worker pool would re-run this unguarded script on spawn-based platforms
+with profiler.stage('figures') as step:
+    drawn = render_figures(RESULTS_DIR, synthetic_control_figures(result_df, POLICY_DATE),
+                           max_workers=1)
+    step.rows = len(drawn)
+
+
+# Step 6: Placebo tests — every control zone as a pseudo-treated unit, solved together
+with profiler.stage('placebo_test', data=prices):
+    placebos = placebo_test(prices, treated_zone, control_zones, post_start=POLICY_DATE,
+                            alpha=1.0)
+
+# In-time placebos: pretend the policy started on the first of each earlier quarter
+pre_dates = prices.index[prices.index < POLICY_DATE]
+fake_dates = pd.date_range(pre_dates.min() + pd.DateOffset(months=6), POLICY_DATE,
+                           freq='QS', inclusive='left')
+with profiler.stage('in_time_placebos', data=prices, fake_dates=len(fake_dates)):
+    _, in_time_effects = in_time_placebos(prices, treated_zone, fake_dates, control_zones,
+                                          post_start=POLICY_DATE, alpha=1.0)
+
+
+# Rolling (30/90-day, stepped daily) and expanding effects from prefix sums: the gap with
+# in-space placebo p-values and the DiD against the control mean, with Newey-West bands
+ROLLING_WINDOWS = {'30-day': '30D', '90-day': '90D', 'expanding': None}
+with profiler.stage('rolling_effects', data=prices) as step:
+    rolling = pd.concat(
+        [frame.assign(estimate=estimate, window=label)
+         for label, window in ROLLING_WINDOWS.items()
+         for estimate, frame in (
+             ('Synthetic Control Gap', rolling_gap(placebos.gaps, window, POLICY_DATE,
+                                                   treated=treated_zone)),
+             ('DiD Coefficient', rolling_did(df_peak, treated_zone, window, POLICY_DATE,
+                                             controls=control_zones)))])
+    rolling.index.name = 'Date'
+    seasonal = seasonal_gap(result_df['gap'], POLICY_DATE, by='season')
+    step.shape(rolling)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    rolling.to_csv(os.path.join(RESULTS_DIR, "rolling_effects.csv"))
+    seasonal.to_csv(os.path.join(RESULTS_DIR, "seasonal_effects.csv"))
+    render_figures(RESULTS_DIR, rolling_effects_figure(rolling, POLICY_DATE), max_workers=1)
+
+
+# Staggered-adoption DiD over every treated zone (the synthetic control above uses the first):
+# zones are grouped into cohorts by first treated day and compared with never-treated zones
+with profiler.stage('staggered_did', data=df_peak):
+    staggered = StaggeredDiD(df_peak, 'avg_price', time='Date').fit(control_group='never')
+staggered_att = staggered.aggregate('simple')
 
 
 # Step 7: Calculate pseudo p-value
-pseudo_gaps = np.array(pseudo_gaps)
+p_value = placebos.p_value
 treated_effect = avg_effect
-p_value = (np.sum(np.abs(pseudo_gaps) >= np.abs(treated_effect)) + 1) / (len(pseudo_gaps) + 1)
 
 
 # Final output
 print(f"Average Treatment Effect: {treated_effect:.2f} $/MWh")
 print(f"Pseudo P-Value: {p_value:.3f}")
+print(f"Average Treatment Effect, convex weights: {convex_effect:.2f} $/MWh")
+print("Convex donor weights:")
+print(convex_weights.round(3).to_string())
+print("\nPlacebo effects (post-period mean gap, $/MWh):")
+print(placebos.placebo_effects.round(2).to_string())
+print("\nIn-time placebo effects (fake policy date -> mean gap before May 2022):")
+print(in_time_effects.round(2).to_string())
+print("\nPost-period gap by season ($/MWh):")
+print(seasonal[['effect', 'std_error', 'n_days']].round(2).to_string())
+print(f"\nStaggered DiD ATT over {len(treated_zones(df_peak))} treated zone(s): "
+      f"{staggered_att['att'].iloc[0]:.2f} $/MWh (SE {staggered_att['std_error'].iloc[0]:.2f})")
+
+profiler.write(RESULTS_DIR)
+print("\nStage timings (also in pipeline_profile.json/.csv):")
+print(profiler.report())
@@ -0,0 +1,84 @@
+"""Compare cold Excel loading with warm Parquet-cache loading.
+
+Writes a synthetic hourly workbook shaped like the synthetic control database
+and times:
+
+* ``pd.read_excel`` on the workbook (what the scripts did before),
+* the first ``load_table`` call, which converts the workbook to Parquet,
+* a warm ``load_table`` call reading every column,
+* a warm ``load_table`` call reading only the columns the model needs.
+
+Usage: python code/benchmarks/bench_io.py [--rows 50000] [--repeat 3]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ordc.io import HOURLY_COLUMNS, load_table  # noqa: E402
+
+
+def make_workbook(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    zones = ['Zone F', 'Zone C', 'NE']
+    hours = 24
+    n_days = max(1, rows // (len(zones) * hours))
+    dates = pd.date_range('2019-01-01', periods=n_days, freq='D')
+    idx = pd.MultiIndex.from_product([dates, range(1, hours + 1), zones],
+                                     names=['Date', 'Hr_End', 'zone'])
+    df = idx.to_frame(index=False)
+    df['treated'] = (df['zone'] == 'Zone F').astype(int)
+    df['post'] = (df['Date'] >= '2022-05-01').astype(int)
+    df['DA_LMP'] = 40 + 10 * rng.standard_normal(len(df))
+    df['load'] = 1500 + 200 * rng.standard_normal(len(df))
+    df['natural gas price'] = 3 + rng.standard_normal(len(df))
+    df['weather'] = 50 + 20 * rng.standard_normal(len(df))
+    df.to_excel(path, index=False)
+    return len(df)
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        workbook = tmp / 'hourly.xlsx'
+        cache_dir = tmp / 'cache'
+        print(f"Writing synthetic workbook ({args.rows} rows)...")
+        n_rows = make_workbook(workbook, args.rows)
+
+        cold = best_of(lambda: pd.read_excel(workbook), 1)
+        start = time.perf_counter()
+        load_table(workbook, cache_dir=cache_dir)
+        convert = time.perf_counter() - start
+        warm_all = best_of(lambda: load_table(workbook, cache_dir=cache_dir), args.repeat)
+        warm_cols = best_of(lambda: load_table(workbook, columns=HOURLY_COLUMNS,
+                                               cache_dir=cache_dir), args.repeat)
+
+    print(f"\nRows: {n_rows}")
+    print(f"{'Cold pd.read_excel':<32}{cold:>10.3f} s")
+    print(f"{'First load_table (convert)':<32}{convert:>10.3f} s")
+    print(f"{'Warm load_table, all columns':<32}{warm_all:>10.3f} s  ({cold / warm_all:,.0f}x)")
+    print(f"{'Warm load_table, model columns':<32}{warm_cols:>10.3f} s  ({cold / warm_cols:,.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Scaling benchmark of the whole pipeline on synthetic NYISO-shaped data.
+
+For each size (hourly rows) a synthetic panel is generated with
+``ordc.simulate`` and written as chunked Parquet files, as real nodal data
+would arrive. Then each stage is timed with ``ordc.profiling``: wall time,
+CPU time, peak RSS, rows and columns.
+
+* ``generate``: write the hourly files;
+* ``prep_monthly``: stream the files into the monthly DiD panel and run
+  ``prepare_panel``;
+* ``prep_daily_peak``: stream the files into the daily peak panel;
+* ``specs_linearmodels``: the twelve ``DEFAULT_SPECS`` with linearmodels
+  (one nested stage per spec);
+* ``specs_absorber``: the same twelve specs through ``fit_specs``;
+* ``synthetic_control``: ridge and convex-weight fits plus all placebos;
+* ``reporting``: ``write_reports`` with every figure redrawn.
+
+Up to the three-zone, seven-year panel (about 180k hourly rows) sizes add
+days; beyond that they add donor zones. Every stage streams, so even 100M
+rows run in bounded memory.
+
+Results are compared with the stored baseline
+(``baselines/bench_pipeline.json``). Stages slower than ``--tolerance``
+times the baseline are flagged, and ``--strict`` makes that an error.
+``--save-baseline`` replaces the baseline with this run. Baselines are
+machine-specific, so record one on the machine used for comparisons.
+
+Usage: python code/benchmarks/bench_pipeline.py [--sizes 1e4 1e5 1e6 1e7 1e8] [--freq h]
+       [--save-baseline] [--strict] [--output results.csv]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ordc.absorb import fit_specs  # noqa: E402
+from ordc.io import iter_table  # noqa: E402
+from ordc.panel import DEFAULT_SPECS, compare_models, fit_spec, prepare_panel  # noqa: E402
+from ordc.profiling import Profiler  # noqa: E402
+from ordc.reporting import write_reports  # noqa: E402
+from ordc.simulate import (FREQUENCIES, monthly_panel, panel_shape,  # noqa: E402
+                           write_hourly_panel)
+from ordc.stream import hour_window, stream_peak_prices  # noqa: E402
+from ordc.synth import (POLICY_DATE, placebo_test, price_matrix,  # noqa: E402
+                        simplex_synthetic_control, synthetic_control)
+
+BASELINE = Path(__file__).resolve().parent / 'baselines' / 'bench_pipeline.json'
+# Stages faster than this are too noisy to flag
+MIN_SECONDS = 0.05
+
+
+def iter_parts(paths, chunk_rows):
+    for path in paths:
+        yield from iter_table(path, chunksize=chunk_rows)
+
+
+def run_size(rows, freq, chunk_rows, seed, workdir):
+    """Run every stage on one synthetic panel; returns the profiler's records."""
+    n_zones, n_days = panel_shape(rows, freq=freq)
+    profiler = Profiler(profile=())
+    with profiler:
+        with profiler.stage('generate', zones=n_zones, days=n_days) as step:
+            paths = write_hourly_panel(workdir, n_zones, n_days, freq, chunk_rows=chunk_rows,
+                                       seed=seed)
+            step.rows, step.cols = n_zones * n_days * 24 * FREQUENCIES[freq], 9
+
+        with profiler.stage('prep_monthly') as step:
+            panel = step.shape(prepare_panel(monthly_panel(iter_parts(paths, chunk_rows))))
+        with profiler.stage('prep_daily_peak') as step:
+            df_peak = step.shape(stream_peak_prices(paths, window=hour_window(17, 20),
+                                                    chunksize=chunk_rows))
+
+        results = {}
+        with profiler.stage('specs_linearmodels', data=panel):
+            for spec in DEFAULT_SPECS:
+                with profiler.stage(spec.name):
+                    results[spec.name] = fit_spec(panel, spec)
+        with profiler.stage('specs_absorber', data=panel):
+            fit_specs(panel, DEFAULT_SPECS)
+
+        with profiler.stage('synthetic_control') as step:
+            prices = step.shape(price_matrix(df_peak))
+            donors = [zone for zone in prices.columns if zone != 'Zone F']
+            synthetic_control(prices, 'Zone F', donors, post_start=POLICY_DATE)
+            simplex_synthetic_control(prices, 'Zone F', donors, post_start=POLICY_DATE)
+            placebo_test(prices, 'Zone F', donors, post_start=POLICY_DATE)
+
+        with profiler.stage('reporting', data=panel):
+            write_reports(workdir / 'report', panel, results, compare_models(results),
+                          max_workers=1)
+
+    frame = profiler.to_frame()
+    frame.insert(0, 'size', rows)
+    return frame
+
+
+def warm_imports():
+    """Import the estimation and plotting stacks so the first size does not pay for them."""
+    import linearmodels.panel  # noqa: F401
+    import scipy.stats  # noqa: F401
+
+    from ordc.render import use_agg
+    from ordc.reporting import pyplot
+
+    use_agg()
+    pyplot()
+
+
+def machine():
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+
+def compare(results, baseline, tolerance):
+    """Join with the baseline on (size, stage) and flag slowdowns beyond ``tolerance``."""
+    base = pd.DataFrame(baseline['results'])[['size', 'stage', 'wall_s']]
+    merged = results.merge(base, on=['size', 'stage'], how='left', suffixes=('', '_baseline'))
+    merged['ratio'] = merged['wall_s'] / merged['wall_s_baseline']
+    merged['regression'] = ((merged['ratio'] > tolerance)
+                            & (merged['wall_s'] > MIN_SECONDS)).fillna(False)
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e4, 1e5, 1e6],
+                        help="hourly rows per run (up to 1e8)")
+    parser.add_argument('--freq', default='h', choices=['h', '15min', '5min'])
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    parser.add_argument('--strict', action='store_true', help="exit 1 on any regression")
+    parser.add_argument('--output', type=Path, help="also write the results as CSV")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", category=UserWarning)
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+    warm_imports()
+    frames = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"Running {int(size):,} rows...", flush=True)
+            frames.append(run_size(int(size), args.freq, args.chunk_rows, args.seed, Path(tmp)))
+    results = pd.concat(frames, ignore_index=True)
+    # Per-spec rows are kept in the output but only stage totals are compared
+    totals = results[results['parent'].isna()].drop(columns=['parent', 'profile'])
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            records = [{key: value for key, value in record.items() if pd.notna(value)}
+                       for record in totals.to_dict(orient='records')]
+            json.dump({'machine': machine(), 'freq': args.freq, 'results': records}, f,
+                      indent=2, default=str)
+        print(f"Saved baseline to {args.baseline}")
+
+    columns = ['size', 'stage', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows', 'cols']
+    if args.baseline.exists() and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        totals = compare(totals, baseline, args.tolerance)
+        columns += ['wall_s_baseline', 'ratio', 'regression']
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(totals[columns].to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+    flagged = totals[totals['regression']] if 'regression' in totals else totals.iloc[:0]
+    if len(flagged):
+        print(f"\n{len(flagged)} stage(s) slower than {args.tolerance}x the baseline:")
+        print(flagged[['size', 'stage', 'wall_s', 'wall_s_baseline', 'ratio']].to_string(index=False))
+        if args.strict:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark lazy panel preparation against eager loading on wide monthly panels.
+
+A synthetic monthly DiD panel (``PANEL_COLUMNS`` schema) with the three
+base zones plus any number of extra nodes is written as Parquet, sorted by
+zone and month as the workbook is. Each stage prepares the rows and columns
+of the Zone F vs Zone C model with controls:
+
+* ``eager``: ``load_table`` with every panel column, ``prepare_panel`` on
+  all rows, then the sample cut (what ``nyiso_panel_regression.py`` did);
+* ``lazy_polars`` / ``lazy_pyarrow``: ``PanelQuery(...).for_spec(spec)``
+  with the zone filter and projection pushed into the scan. Polars is
+  skipped when it is not installed.
+
+Each stage is a profiler stage (wall time, CPU time, peak RSS), and every
+lazy result is checked against the eager one.
+
+Usage: python code/benchmarks/bench_prepare.py [--nodes 3 1000 10000 30000] [--months 72]
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ordc.io import PANEL_COLUMNS, load_table  # noqa: E402
+from ordc.lazy import PanelQuery, default_engine  # noqa: E402
+from ordc.panel import DEFAULT_SPECS, prepare_panel, select_sample  # noqa: E402
+from ordc.profiling import Profiler  # noqa: E402
+from ordc.simulate import POLICY_DATE, zone_names  # noqa: E402
+
+SPEC = next(spec for spec in DEFAULT_SPECS if spec.name == "F vs C Two-way FE with Controls")
+
+
+def make_monthly(path, n_zones, n_months, seed=0, row_group_size=65_536):
+    """Write a monthly panel of ``n_zones`` zones sorted by zone and month; returns its rows."""
+    rng = np.random.default_rng(seed)
+    zones = zone_names(n_zones)
+    months = pd.date_range('2019-01-01', periods=n_months, freq='MS')
+    n = n_zones * n_months
+    df = pd.DataFrame({
+        'month': np.tile(months.values, n_zones),
+        'zone': pd.Categorical(np.repeat(zones, n_months)),
+        'treated': np.repeat([1] + [0] * (n_zones - 1), n_months).astype(np.int8),
+        'post': np.tile(months >= POLICY_DATE, n_zones).astype(np.int8),
+        'avg_price': 40 + 10 * rng.standard_normal(n),
+        'load': 1500 + 200 * rng.standard_normal(n),
+        'natural gas price': 3 + rng.standard_normal(n),
+        'weather': 50 + 20 * rng.standard_normal(n),
+    })
+    df.to_parquet(path, index=False, row_group_size=row_group_size)
+    return n
+
+
+def eager(path, spec):
+    panel = prepare_panel(load_table(path, columns=PANEL_COLUMNS))
+    return select_sample(panel, spec.sample)
+
+
+def run_size(folder, n_zones, n_months, engines):
+    path = Path(folder) / f"monthly_{n_zones}.parquet"
+    rows = make_monthly(path, n_zones, n_months)
+    profiler = Profiler(profile=())
+    outputs = {}
+    with profiler:
+        for engine in engines:
+            with profiler.stage(f"lazy_{engine}") as step:
+                outputs[engine] = step.shape(PanelQuery(path, engine=engine).for_spec(SPEC).collect())
+        with profiler.stage('eager') as step:
+            outputs['eager'] = step.shape(eager(path, SPEC))
+
+    frame = profiler.to_frame()
+    frame.insert(0, 'source_rows', rows)
+    frame['matches_eager'] = [stage == 'eager' or same_values(outputs[stage.split('_', 1)[1]],
+                                                              outputs['eager'])
+                              for stage in frame['stage']]
+    return frame
+
+
+def same_values(lazy, eager_panel):
+    """Whether the lazy rows equal the eager ones; categoricals may differ in unused levels."""
+    try:
+        pd.testing.assert_frame_equal(lazy, eager_panel[list(lazy.columns)].reset_index(drop=True),
+                                      check_categorical=False)
+    except AssertionError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[3, 1000, 10000, 30000])
+    parser.add_argument('--months', type=int, default=72)
+    parser.add_argument('--output', type=Path, help="also write the results as CSV")
+    args = parser.parse_args()
+    engines = ['polars', 'pyarrow'] if default_engine() == 'polars' else ['pyarrow']
+
+    frames = []
+    with tempfile.TemporaryDirectory() as folder:
+        for n_zones in args.nodes:
+            print(f"Running {n_zones:,} nodes x {args.months} months...", flush=True)
+            frames.append(run_size(folder, n_zones, args.months, engines))
+    results = pd.concat(frames, ignore_index=True)
+    columns = ['source_rows', 'stage', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows', 'cols',
+               'matches_eager']
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(results[columns].to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Ridge versus convex-weight (simplex) synthetic control on a daily peak panel.
+
+Builds a synthetic date x zone matrix of daily peak prices with a factor
+structure and times, for each donor-pool size:
+
+* the original per-placebo sklearn ``Ridge`` loop,
+* the vectorized ridge placebo engine (``placebo_test``),
+* the simplex solver for all placebos,
+* all placebos across a penalty grid, cold and warm-started from the
+  previous penalty's weights,
+* a penalty path for the treated unit, cold and warm-started (total
+  active-set iterations).
+
+It also reports the treated unit's pre-period RMSPE, in sample and on the
+last 20% of the pre-period held out from the fit.
+
+Usage: python code/benchmarks/bench_synth.py [--days 1500] [--donors 5 20 80]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ordc.synth import (POLICY_DATE, _simplex_problem, placebo_test,  # noqa: E402
+                        simplex_path, simplex_placebo_test, simplex_synthetic_control,
+                        synthetic_control)
+
+
+def make_matrix(n_days, n_donors, seed=0):
+    """Daily peak prices driven by three common factors; the treated zone is a convex mix."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(POLICY_DATE - pd.Timedelta(days=int(n_days * 0.7)), periods=n_days, freq='D')
+    factors = np.cumsum(rng.normal(size=(n_days, 3)), axis=0) + 40
+    loadings = rng.dirichlet(np.ones(3), size=n_donors)
+    donors = factors @ loadings.T + rng.normal(scale=2.0, size=(n_days, n_donors))
+    mix = rng.dirichlet(np.ones(min(3, n_donors)))
+    treated = donors[:, :len(mix)] @ mix + rng.normal(scale=2.0, size=n_days)
+    treated += 5.0 * (dates >= POLICY_DATE)
+    columns = [f"Donor {i:03d}" for i in range(n_donors)]
+    matrix = pd.DataFrame(donors, index=dates, columns=columns)
+    matrix['Zone F'] = treated
+    return matrix, columns
+
+
+def ridge_loop(matrix, treated, donors, alpha=1.0):
+    """The original Step 6: one sklearn Ridge fit per placebo zone."""
+    pre = matrix[matrix.index < POLICY_DATE]
+    for zone in donors:
+        pool = [z for z in donors if z != zone]
+        model = Ridge(alpha=alpha, fit_intercept=False).fit(pre[pool], pre[zone])
+        _ = matrix[zone] - matrix[pool] @ model.coef_
+
+
+PENALTIES = np.geomspace(1e-3, 10, 20)
+
+
+def placebo_sweep(matrix, treated, donors, warm):
+    """Simplex placebos at every penalty, optionally warm-started from the last penalty."""
+    previous = None
+    for penalty in PENALTIES:
+        result = simplex_placebo_test(matrix, treated, donors, penalty=penalty,
+                                      warm_start=previous if warm else None)
+        previous = result
+
+
+def timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - start, out
+
+
+def holdout_rmspe(fit, matrix, treated, donors):
+    """Fit on the first 80% of the pre-period, score on the remaining 20%."""
+    pre = matrix[matrix.index < POLICY_DATE]
+    cut = pre.index[int(len(pre) * 0.8)]
+    result_df, _ = fit(matrix[matrix.index < POLICY_DATE], treated, donors, post_start=cut)
+    held_out = result_df.loc[result_df.index >= cut, 'gap']
+    return float(np.sqrt((held_out ** 2).mean()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=1500)
+    parser.add_argument('--donors', type=int, nargs='+', default=[5, 20, 80])
+    args = parser.parse_args()
+
+    rows = []
+    for n_donors in args.donors:
+        matrix, donors = make_matrix(args.days, n_donors)
+        treated = 'Zone F'
+
+        t_loop, _ = timed(lambda: ridge_loop(matrix, treated, donors))
+        t_ridge, _ = timed(lambda: placebo_test(matrix, treated, donors))
+        t_simplex, _ = timed(lambda: simplex_placebo_test(matrix, treated, donors))
+        t_cold, _ = timed(lambda: placebo_sweep(matrix, treated, donors, warm=False))
+        t_warm, _ = timed(lambda: placebo_sweep(matrix, treated, donors, warm=True))
+
+        pre = matrix[matrix.index < POLICY_DATE].dropna()
+        gram, target = _simplex_problem(pre, donors, treated, None, None)
+        _, cold_iters = zip(*[simplex_path(gram, target, [p]) for p in PENALTIES])
+        _, warm_iters = simplex_path(gram, target, PENALTIES)
+
+        ridge_df, _ = synthetic_control(matrix, treated, donors)
+        simplex_df, _ = simplex_synthetic_control(matrix, treated, donors)
+        in_sample = lambda df: float(np.sqrt((df.loc[~df['post'], 'gap'] ** 2).mean()))  # noqa: E731
+
+        rows.append({
+            'donors': n_donors,
+            'ridge loop (s)': t_loop,
+            'ridge vectorized (s)': t_ridge,
+            'simplex placebos (s)': t_simplex,
+            'penalty sweep cold (s)': t_cold,
+            'penalty sweep warm (s)': t_warm,
+            'path iters cold': sum(i[0] for i in cold_iters),
+            'path iters warm': sum(warm_iters),
+            'ridge RMSPE': in_sample(ridge_df),
+            'simplex RMSPE': in_sample(simplex_df),
+            'ridge holdout RMSPE': holdout_rmspe(synthetic_control, matrix, treated, donors),
+            'simplex holdout RMSPE': holdout_rmspe(simplex_synthetic_control, matrix, treated, donors),
+        })
+
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(pd.DataFrame(rows).set_index('donors').round(4).T)
+
+
+if __name__ == '__main__':
+    main()
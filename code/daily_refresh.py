@@ -0,0 +1,101 @@
+"""Daily refresh of the synthetic control and DiD estimates.
+
+Build the persisted state once from the full workbooks:
+
+    python code/daily_refresh.py --init
+
+Then, each morning, pass the new day's hourly prices (CSV, Parquet or
+workbook) and, when the monthly DiD rows changed, the revised rows:
+
+    python code/daily_refresh.py new_prices.csv [--panel did_rows.xlsx]
+
+New and revised zone-days go to the panel store, the gap series is
+extended (or revised) with the frozen pre-period weights, and the DiD
+models are updated from their sufficient statistics (see
+``ordc.refresh``). Nothing is refitted from scratch. Files may hold only
+some zones, e.g. NYISO and ISO-NE prices arriving separately; a date joins
+the gap series once every zone of the fit has been stored.
+"""
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from ordc.io import PANEL_COLUMNS, load_table
+from ordc.panel import compare_models, prepare_panel
+from ordc.refresh import DidRefresh, PanelStore, SyntheticRefresh
+from ordc.stream import hour_window, stream_peak_prices
+from ordc.synth import POLICY_DATE, price_matrix, synthetic_control, treated_zones
+
+DID_FILE = "DiD database_including weather.xlsx"
+SC_FILE = "Sythetic control regression database.xlsx"
+STATE_DIR = Path("ordc_state")
+PEAK_WINDOW = hour_window(17, 20)
+
+
+def initialize(state_dir):
+    store = PanelStore(state_dir / 'daily_peak')
+    df_peak = store.append(stream_peak_prices(SC_FILE, window=PEAK_WINDOW))
+    treated = treated_zones(df_peak)[0]
+    result_df, weights = synthetic_control(price_matrix(df_peak), treated,
+                                           post_start=POLICY_DATE, alpha=1.0)
+    synth = SyntheticRefresh(result_df, weights, treated, POLICY_DATE)
+    synth.save(state_dir)
+
+    did = DidRefresh().update(prepare_panel(load_table(DID_FILE, columns=PANEL_COLUMNS)))
+    did.save(state_dir / 'did_stats.pkl')
+    return synth, did
+
+
+def refresh(state_dir, prices, panel_rows=None):
+    store = PanelStore(state_dir / 'daily_peak')
+    synth = SyntheticRefresh.load(state_dir)
+    did = DidRefresh.load(state_dir / 'did_stats.pkl')
+
+    rows, revised = store.changes(stream_peak_prices(prices, window=PEAK_WINDOW))
+    if not rows.empty:
+        # Recompute the gaps of the affected dates from every stored zone with
+        # the changes applied; the store is written only once that succeeded
+        dates = rows[store.date].unique()
+        stored = store.read(start=dates.min(), end=dates.max())
+        days = rows
+        if not stored.empty:
+            days = pd.concat([stored[stored[store.date].isin(dates)], rows])
+            days = days.drop_duplicates(store.keys, keep='last')
+        synth.update(days)
+        store.append(rows)
+        synth.save(state_dir)
+    print(f"Stored {(~revised).sum()} new and {revised.sum()} revised zone-days "
+          f"(store holds {len(store)})")
+    synth.check(store)
+
+    if panel_rows is not None:
+        did.update(prepare_panel(load_table(panel_rows, columns=PANEL_COLUMNS)))
+        did.save(state_dir / 'did_stats.pkl')
+    return synth, did
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('prices', nargs='*', help="new hourly price files")
+    parser.add_argument('--panel', help="new or revised monthly DiD rows")
+    parser.add_argument('--init', action='store_true', help="build the state from the workbooks")
+    parser.add_argument('--state', type=Path, default=STATE_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.init:
+        synth, did = initialize(args.state)
+    else:
+        synth, did = refresh(args.state, args.prices, args.panel)
+
+    print(f"Average Treatment Effect: {synth.avg_effect:.2f} $/MWh "
+          f"(through {synth.result_df.index.max():%Y-%m-%d})")
+    print("\nModel Comparison:")
+    print(compare_models(did.fit_all()))
+    print(f"\nDone in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
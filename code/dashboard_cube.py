@@ -0,0 +1,76 @@
+"""Build the dashboard cube and serve it over a local HTTP/JSON endpoint.
+
+Precompute the cube once from the hourly workbook (or hourly CSV/Parquet
+files) into ``dashboard_cube/``:
+
+    python code/dashboard_cube.py build [prices ...]
+
+then serve slices of it to ``results/panel_results/webdashboard.ts``:
+
+    python code/dashboard_cube.py serve [--port 8050]
+
+The cube holds zone x day x peak/off-peak cells with the volatile-day flag,
+the synthetic control gaps and the staggered DiD effects, both as Parquet
+and as static JSON tiles (see ``ordc.cube``). The server answers
+``/meta``, ``/cube``, ``/gaps`` and ``/effects`` from memory with an LRU
+cache (see ``ordc.server``). No request reads hourly data or refits a model.
+"""
+import argparse
+import time
+from pathlib import Path
+
+from ordc.cube import build_cube
+from ordc.profiling import Profiler
+from ordc.server import DEFAULT_PORT, make_server
+from ordc.stream import hour_window
+
+SC_FILE = "Sythetic control regression database.xlsx"
+CUBE_DIR = Path("dashboard_cube")
+PEAK_WINDOW = hour_window(17, 20)
+THRESHOLD = 2.0
+
+
+def build(sources, folder, threshold, window):
+    with Profiler() as profiler:
+        cube = build_cube(sources, window=PEAK_WINDOW, threshold=threshold,
+                          volatility_window=window)
+        with profiler.stage('write'):
+            cube.write(folder)
+    print(f"Wrote {len(cube.cells):,} cells, {len(cube.gaps):,} gap rows and "
+          f"{len(cube.effects):,} effect rows to {folder} (version {cube.meta['version']})")
+    print(profiler.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help="precompute the cube and JSON tiles")
+    build_parser.add_argument('prices', nargs='*', default=[SC_FILE], help="hourly price files")
+    build_parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                              help="volatile-day threshold in standard deviations")
+    build_parser.add_argument('--window', help="trailing window for volatility, e.g. 90D")
+    serve_parser = commands.add_parser('serve', help="serve the cube over HTTP")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    for sub in (build_parser, serve_parser):
+        sub.add_argument('--cube', type=Path, default=CUBE_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        build(args.prices, args.cube, args.threshold, args.window)
+        print(f"\nDone in {time.perf_counter() - start:.2f} s")
+        return
+
+    server = make_server(args.cube, args.host, args.port)
+    print(f"Serving {args.cube} on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
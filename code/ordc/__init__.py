@@ -0,0 +1,64 @@
+"""Reusable building blocks for the NYISO ORDC price analysis."""
+from .absorb import Absorber, fit_specs
+from .bootstrap import block_bootstrap, bootstrap_specs, wild_cluster_bootstrap
+from .compact import CompactPanel
+from .cube import Cube, build_cube
+from .event_study import EventStudy
+from .grid import fit_grid, run_grid, spec_grid
+from .io import load_table
+from .lazy import PanelQuery
+from .panel import DEFAULT_SPECS, ModelSpec, compare_models, fit_spec, prepare_panel
+from .profiling import Profiler
+from .refresh import DidRefresh, PanelStore, SyntheticRefresh
+from .reporting import write_reports
+from .rolling import rolling_did, rolling_gap, seasonal_gap
+from .sparse import SparseFE, sparse_design
+from .staggered import StaggeredDiD
+from .store import ResultsStore
+from .stream import stream_peak_prices
+from .suffstats import Design, SufficientStats, accumulate
+from .synth import placebo_test, simplex_synthetic_control, synthetic_control
+from .volatility import VolatilityPanel, volatility_terms
+
+__all__ = [
+    'Absorber',
+    'CompactPanel',
+    'Cube',
+    'DEFAULT_SPECS',
+    'Design',
+    'DidRefresh',
+    'EventStudy',
+    'ModelSpec',
+    'PanelQuery',
+    'PanelStore',
+    'Profiler',
+    'ResultsStore',
+    'SparseFE',
+    'StaggeredDiD',
+    'SufficientStats',
+    'SyntheticRefresh',
+    'VolatilityPanel',
+    'accumulate',
+    'block_bootstrap',
+    'bootstrap_specs',
+    'build_cube',
+    'compare_models',
+    'fit_grid',
+    'fit_spec',
+    'fit_specs',
+    'load_table',
+    'placebo_test',
+    'prepare_panel',
+    'rolling_did',
+    'rolling_gap',
+    'run_grid',
+    'seasonal_gap',
+    'simplex_synthetic_control',
+    'sparse_design',
+    'spec_grid',
+    'stream_peak_prices',
+    'synthetic_control',
+    'volatility_terms',
+    'wild_cluster_bootstrap',
+    'write_reports',
+]
@@ -0,0 +1,208 @@
+"""Fixed-effects absorption shared across specifications.
+
+:class:`Absorber` factorizes the fixed-effect groups of a panel once and
+demeans columns by alternating projections: it subtracts each effect's group
+means in turn until the sweep stops changing the data. This is the
+method-of-alternating-projections approach used by HDFE estimators. Demeaned
+columns are cached, so a batch of specifications that share a sample and an
+effect structure pays for each column's within transformation only once. Any
+subset of regressors is then an OLS on cached arrays.
+
+With the constant handling and degrees-of-freedom correction used by
+``linearmodels.PanelOLS``, the coefficients match PanelOLS, and so do the
+unadjusted and robust covariances. Effects may be interactions of several
+columns (e.g. zone x year x hour), which PanelOLS cannot absorb directly.
+"""
+import numpy as np
+import pandas as pd
+
+from .panel import FitSummary, select_sample
+
+
+def _labels(data, key):
+    if key in data.columns:
+        return data[key]
+    return pd.Series(data.index.get_level_values(key))
+
+
+def factorize_effect(data, effect):
+    """Integer group codes for one effect: a column/index level or a tuple of them."""
+    if isinstance(effect, str):
+        effect = (effect,)
+    codes = None
+    for key in effect:
+        level_codes, uniques = pd.factorize(_labels(data, key), sort=False)
+        if codes is None:
+            codes = level_codes.astype(np.int64)
+        else:
+            codes = codes * len(uniques) + level_codes
+    return pd.factorize(codes)[0]
+
+
+class Absorber:
+    """Cached within-transformation of a panel for a fixed set of effects.
+
+    Parameters
+    ----------
+    data : DataFrame
+        Rows to estimate on. Effect keys may be columns or index levels.
+    effects : sequence
+        Each item is a column name or a tuple of names whose interaction forms
+        one effect. An empty sequence gives pooled OLS.
+    tol : float
+        Stop iterating once a full sweep moves no value by more than ``tol``
+        times the column's scale.
+    max_iter : int
+        Upper bound on alternating-projection sweeps.
+    """
+
+    def __init__(self, data, effects=('panel_id', 'time_id'), tol=1e-12, max_iter=10_000):
+        self.data = data
+        self.effects = tuple(effects)
+        self.tol = tol
+        self.max_iter = max_iter
+        self.nobs = len(data)
+        self.groups = []
+        for effect in self.effects:
+            codes = factorize_effect(data, effect)
+            self.groups.append((codes, np.bincount(codes).astype(np.float64)))
+        self._neffects = None
+        self._cache = {}
+
+    @property
+    def neffects(self):
+        """Absorbed parameters besides the constant: the rank of the effect dummies minus one.
+
+        For two connected effects this is PanelOLS's count, the levels of
+        each effect less one. Nested or interacted effects (e.g. zone x year
+        with zone x hour) share more dependencies; the exact rank from
+        :func:`~ordc.sparse.effects_rank` keeps the residual degrees of
+        freedom in line with :class:`~ordc.sparse.SparseFE`.
+        """
+        if self._neffects is None:
+            from .sparse import effects_rank
+
+            self._neffects = effects_rank([codes for codes, _ in self.groups]) - 1 \
+                if self.groups else 0
+        return self._neffects
+
+    def _sweep(self, x):
+        for codes, counts in self.groups:
+            for j in range(x.shape[1]):
+                x[:, j] -= (np.bincount(codes, weights=x[:, j], minlength=len(counts)) / counts)[codes]
+
+    def demean(self, values):
+        """Within-transform an array, adding back the column means (PanelOLS convention)."""
+        x = np.array(values, dtype=np.float64, copy=True)
+        squeeze = x.ndim == 1
+        x = x.reshape(len(x), -1)
+        mean = x.mean(axis=0)
+        x -= mean
+        if len(self.groups) == 1:
+            self._sweep(x)
+        elif self.groups:
+            scale = np.maximum(np.abs(x).max(axis=0), 1.0)
+            for _ in range(self.max_iter):
+                before = x.copy()
+                self._sweep(x)
+                if np.all(np.abs(x - before).max(axis=0) <= self.tol * scale):
+                    break
+            else:
+                raise RuntimeError(f"Demeaning did not converge in {self.max_iter} sweeps")
+        x += mean
+        return x[:, 0] if squeeze else x
+
+    def column(self, name):
+        """Demeaned column, computed on first request and cached."""
+        if name not in self._cache:
+            self._cache[name] = self.demean(self.data[name].to_numpy(dtype=np.float64))
+        return self._cache[name]
+
+    def precompute(self, columns):
+        """Demean several columns in one batch and cache them."""
+        missing = [c for c in dict.fromkeys(columns) if c not in self._cache]
+        if missing:
+            block = self.demean(self.data[missing].to_numpy(dtype=np.float64))
+            for j, name in enumerate(missing):
+                self._cache[name] = block[:, j]
+
+    def fit(self, dependent, regressors, cov_type='robust', constant=True, debiased=True):
+        """OLS of a cached dependent on cached regressors; returns a FitSummary.
+
+        ``cov_type`` is 'unadjusted' or 'robust'. As in PanelOLS, the
+        covariance is scaled by ``nobs / (nobs - neffects - k)`` and p-values
+        use the t distribution when ``debiased`` (the PanelOLS default).
+        """
+        names = (['const'] if constant else []) + list(regressors)
+        self.precompute([dependent] + list(regressors))
+        y = self.column(dependent)
+        x = np.column_stack([np.ones(self.nobs) if n == 'const' else self.column(n)
+                             for n in names])
+        extra_df = self.neffects
+        if self.groups and not constant:
+            # Without a constant the first effect keeps all of its levels
+            extra_df += 1
+        summary, _ = within_ols(y, x, names, extra_df, cov_type, constant, debiased)
+        return summary
+
+
+def within_ols(y, x, names, extra_df=0, cov_type='robust', constant=True, debiased=True):
+    """OLS on within-transformed arrays with the PanelOLS conventions.
+
+    ``extra_df`` is the number of absorbed parameters. Returns the
+    FitSummary and the covariance matrix of the parameters.
+    """
+    from scipy import stats
+
+    nobs = len(y)
+    params, *_ = np.linalg.lstsq(x, y, rcond=None)
+    eps = y - x @ params
+
+    df_resid = nobs - extra_df - x.shape[1]
+    scale = nobs / (df_resid if debiased else nobs - extra_df)
+    xpxi = np.linalg.inv(x.T @ x)
+    if cov_type == 'unadjusted':
+        cov = xpxi * scale * (eps @ eps) / nobs
+    elif cov_type == 'robust':
+        xe = x * eps[:, None]
+        cov = xpxi @ (scale * xe.T @ xe) @ xpxi
+    else:
+        raise ValueError(f"Unsupported cov_type {cov_type!r}; use 'unadjusted' or 'robust'")
+
+    std_errors = np.sqrt(np.diag(cov))
+    tstats = np.abs(params / std_errors)
+    pvalues = 2 * (stats.t.sf(tstats, df_resid) if debiased else stats.norm.sf(tstats))
+    centered = y - y.mean() if constant else y
+    rsquared = 1 - (eps @ eps) / (centered @ centered)
+    summary = FitSummary(pd.Series(params, names, name='parameter'),
+                         pd.Series(std_errors, names, name='std_error'),
+                         pd.Series(pvalues, names, name='pvalue'),
+                         float(rsquared), nobs)
+    return summary, cov
+
+
+def spec_effects(spec):
+    effects = []
+    if spec.entity_effects:
+        effects.append('panel_id')
+    if spec.time_effects:
+        effects.append('time_id')
+    return tuple(effects)
+
+
+def fit_specs(panel, specs, absorbers=None):
+    """Fit ModelSpecs through shared Absorbers; returns ``{name: FitSummary}``.
+
+    One Absorber is built per (sample, effects) combination and reused for
+    every spec that shares it. Pass a dict as ``absorbers`` to keep them
+    across calls.
+    """
+    absorbers = {} if absorbers is None else absorbers
+    results = {}
+    for spec in specs:
+        key = (spec.sample, spec_effects(spec))
+        if key not in absorbers:
+            absorbers[key] = Absorber(select_sample(panel, spec.sample), key[1])
+        results[spec.name] = absorbers[key].fit(spec.dependent, spec.regressors,
+                                                cov_type=spec.cov_type)
+    return results
@@ -0,0 +1,267 @@
+"""Bootstrap inference for the DiD coefficient with few clusters.
+
+With three zones, cluster-robust standard errors rest on three scores and
+their p-values are unreliable. This module offers two alternatives. Both
+work on the fixed-effects-demeaned data from an
+:class:`~ordc.absorb.Absorber`, computed once per call.
+
+* :func:`wild_cluster_bootstrap` is the restricted wild cluster bootstrap
+  (WCR) of the t-statistic. Every bootstrap t-statistic is linear algebra
+  on ``G``-vectors and ``G x G`` matrices built once from the restricted
+  residuals, so a batch of replications is two matrix products with a
+  ``B x G`` weight matrix. When all ``2^G`` (Rademacher) or ``6^G`` (Webb)
+  weight vectors fit in the requested replications, they are enumerated
+  exactly instead of sampled.
+* :func:`block_bootstrap` is a moving-block bootstrap over time periods:
+  all zones of a period move together, and blocks of consecutive periods
+  keep serial correlation. ``X'X`` and ``X'y`` are summed per period once;
+  a replication is then a count-weighted sum of those blocks and a
+  ``k x k`` solve, batched over replications.
+
+With fewer than :data:`MIN_CLUSTERS` clusters, or when the clusters are
+nested in a fixed effect so that the CRV1 standard error is numerically
+zero, the wild bootstrap t-statistic is meaningless; its p-value is then
+NaN and a ``RuntimeWarning`` is raised.
+
+Replications run in fixed-size batches, each with its own child of one
+``SeedSequence``. Results therefore depend only on ``seed``, not on the
+number of workers. Batches run on a thread pool: the work is NumPy matrix
+algebra that releases the GIL, and threads share the precomputed arrays
+without copying.
+"""
+import itertools
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .absorb import Absorber, spec_effects
+from .panel import select_sample
+
+WEBB = np.array([-np.sqrt(1.5), -1.0, -np.sqrt(0.5), np.sqrt(0.5), 1.0, np.sqrt(1.5)])
+WEIGHTS = {'rademacher': np.array([-1.0, 1.0]), 'webb': WEBB}
+MIN_CLUSTERS = 3
+# CRV1 standard errors below this fraction of |coef| are rounding noise
+DEGENERATE_SE = 1e-8
+
+
+@dataclass
+class BootstrapResult:
+    """Bootstrap distribution and p-value for one coefficient."""
+    term: str
+    coef: float
+    std_error: float          # cluster-robust (wild) or bootstrap (block) standard error
+    pvalue: float
+    draws: np.ndarray         # bootstrap t-statistics (wild) or coefficients (block)
+    method: str
+    clusters: int = None      # number of clusters (wild)
+    dropped: int = 0          # rank-deficient resamples discarded (block)
+
+    @property
+    def reps(self):
+        return len(self.draws)
+
+    def conf_int(self, level=0.95):
+        """Percentile-t (wild) or percentile (block) confidence interval."""
+        if not self.reps:
+            return np.nan, np.nan
+        if self.method == 'wild':
+            half = np.quantile(np.abs(self.draws), level) * self.std_error
+            return self.coef - half, self.coef + half
+        tail = (1 - level) / 2
+        return tuple(np.quantile(self.draws, [tail, 1 - tail]))
+
+
+def _group_sums(codes, n_groups, values):
+    """Sum the rows of ``values`` (1-D or 2-D) within each group code."""
+    if values.ndim == 1:
+        return np.bincount(codes, weights=values, minlength=n_groups)
+    return np.column_stack([np.bincount(codes, weights=values[:, j], minlength=n_groups)
+                            for j in range(values.shape[1])])
+
+
+def _run_batches(draw, reps, seed, batch_size, max_workers):
+    """Call ``draw(rng, size)`` over reproducible batches and stack the results."""
+    sizes = [min(batch_size, reps - start) for start in range(0, reps, batch_size)]
+    streams = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(len(sizes))]
+    workers = max_workers or min(len(sizes), os.cpu_count() or 1)
+    if workers <= 1:
+        return np.concatenate([draw(rng, size) for rng, size in zip(streams, sizes)])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(draw, streams, sizes)))
+
+
+def _design(panel, dependent, regressors, effects):
+    """Demeaned response and design (constant first), as PanelOLS estimates them."""
+    absorber = Absorber(panel, effects)
+    absorber.precompute([dependent] + list(regressors))
+    y = absorber.column(dependent)
+    X = np.column_stack([np.ones(absorber.nobs)] + [absorber.column(r) for r in regressors])
+    return y, X
+
+
+def wild_cluster_bootstrap(panel, dependent, regressors, term='did',
+                           effects=('panel_id', 'time_id'), cluster='panel_id', reps=9999,
+                           weights='webb', seed=0, batch_size=1000, max_workers=None):
+    """Restricted wild cluster bootstrap p-value for ``H0: coef(term) = 0``.
+
+    The null is imposed on the bootstrap DGP, and the weights are drawn per
+    cluster. The statistic is the CRV1 t-statistic, and the p-value is
+    symmetric: the share of ``|t*| >= |t|``. With ``G`` clusters and ``reps``
+    at least the number of distinct weight vectors (``2^G`` Rademacher,
+    ``6^G`` Webb), every vector is used once and ``reps`` is ignored.
+
+    With fewer than ``MIN_CLUSTERS`` clusters, or a CRV1 standard error
+    that is numerically zero relative to ``|coef|`` (clusters nested in
+    an absorbed effect), no draws are made, the p-value is NaN and a
+    ``RuntimeWarning`` is raised.
+    """
+    if weights not in WEIGHTS:
+        raise ValueError(f"Unknown weights {weights!r}; expected one of {sorted(WEIGHTS)}")
+    regressors = list(regressors)
+    y, X = _design(panel, dependent, regressors, effects)
+    codes, labels = pd.factorize(panel[cluster])
+    n_groups = len(labels)
+    n, k = X.shape
+    j = 1 + regressors.index(term)
+
+    xtxi = np.linalg.inv(X.T @ X)
+    a = X @ xtxi[:, j]                    # coef(term) = a'y
+    coef = float(a @ y)
+    if n_groups < MIN_CLUSTERS:
+        warnings.warn(f"Wild cluster bootstrap needs at least {MIN_CLUSTERS} clusters; "
+                      f"{cluster!r} has {n_groups}, returning a NaN p-value",
+                      RuntimeWarning, stacklevel=2)
+        return BootstrapResult(term, coef, np.nan, np.nan, np.empty(0), 'wild', n_groups)
+    correction = n_groups / (n_groups - 1) * (n - 1) / (n - k)
+    resid = y - X @ (xtxi @ (X.T @ y))
+    std_error = float(np.sqrt(correction * (_group_sums(codes, n_groups, a * resid) ** 2).sum()))
+    if std_error <= DEGENERATE_SE * abs(coef):
+        warnings.warn(f"Cluster-robust standard error of {term!r} is numerically zero "
+                      f"({std_error:.3g} for coefficient {coef:.3g}); {cluster!r} is likely "
+                      f"nested in a fixed effect, returning a NaN p-value",
+                      RuntimeWarning, stacklevel=2)
+        return BootstrapResult(term, coef, std_error, np.nan, np.empty(0), 'wild', n_groups)
+    tstat = coef / std_error
+
+    # Restricted fit without the term; bootstrap responses are X_r b_r + u_r * v_g
+    X_r = np.delete(X, j, axis=1)
+    u_r = y - X_r @ np.linalg.lstsq(X_r, y, rcond=None)[0]
+    s = _group_sums(codes, n_groups, a * u_r)                   # coef* = v's
+    A = _group_sums(codes, n_groups, a[:, None] * X)            # a_g'X_g
+    Q = _group_sums(codes, n_groups, X * u_r[:, None])          # X_h'u_h
+    # Cluster scores of the bootstrap residuals: score* = K v
+    K = np.diag(s) - A @ xtxi @ Q.T
+
+    def statistics(v):
+        se = np.sqrt(correction * ((v @ K.T) ** 2).sum(axis=1))
+        return (v @ s) / se
+
+    support = WEIGHTS[weights]
+    if len(support) ** n_groups <= reps:
+        draws = statistics(np.array(list(itertools.product(support, repeat=n_groups))))
+    else:
+        draws = _run_batches(
+            lambda rng, size: statistics(rng.choice(support, size=(size, n_groups))),
+            reps, seed, batch_size, max_workers)
+    pvalue = float(np.mean(np.abs(draws) >= abs(tstat) - 1e-12 * abs(tstat)))
+    return BootstrapResult(term, coef, std_error, pvalue, draws, 'wild', n_groups)
+
+
+def moving_block_counts(rng, size, n_periods, block_length):
+    """How often each period is drawn in ``size`` moving-block resamples."""
+    n_blocks = -(-n_periods // block_length)
+    starts = rng.integers(0, n_periods - block_length + 1, size=(size, n_blocks))
+    periods = (starts[:, :, None] + np.arange(block_length)).reshape(size, -1)[:, :n_periods]
+    flat = periods + n_periods * np.arange(size)[:, None]
+    return np.bincount(flat.ravel(), minlength=size * n_periods).reshape(size, n_periods)
+
+
+def block_bootstrap(panel, dependent, regressors, term='did', effects=('panel_id', 'time_id'),
+                    time='date', block_length=None, reps=9999, seed=0, batch_size=1000,
+                    max_workers=None):
+    """Moving-block bootstrap of ``coef(term)`` over time periods.
+
+    Periods are ordered by ``time`` and resampled in blocks of
+    ``block_length`` consecutive periods (default ``T^(1/3)``, rounded up).
+    The fixed effects are partialled out once on the full sample, and each
+    replication refits the demeaned regression with resampled periods.
+    Resamples in which the design is singular (e.g. no post-policy period
+    was drawn) are discarded and counted in ``dropped``, so ``reps`` of the
+    result is the number requested minus ``dropped``. The p-value is
+    ``(count + 1) / (reps + 1)``, where ``count`` is the number of centered
+    draws ``|coef* - coef|`` at least ``|coef|``.
+    """
+    regressors = list(regressors)
+    y, X = _design(panel, dependent, regressors, effects)
+    codes, periods = pd.factorize(panel[time], sort=True)
+    n_periods, k = len(periods), X.shape[1]
+    j = 1 + regressors.index(term)
+    if block_length is None:
+        block_length = int(np.ceil(n_periods ** (1 / 3)))
+    if not 1 <= block_length <= n_periods:
+        raise ValueError(f"block_length must be between 1 and {n_periods}")
+
+    # Per-period X'X (flattened) and X'y
+    rows, cols = np.triu_indices(k)
+    upper = _group_sums(codes, n_periods, X[:, rows] * X[:, cols])
+    xtx_t = np.zeros((n_periods, k, k))
+    xtx_t[:, rows, cols] = upper
+    xtx_t[:, cols, rows] = upper
+    xtx_t = xtx_t.reshape(n_periods, k * k)
+    xty_t = _group_sums(codes, n_periods, X * y[:, None])
+    coef = float(np.linalg.solve(X.T @ X, X.T @ y)[j])
+
+    def coefficients(rng, size):
+        counts = moving_block_counts(rng, size, n_periods, block_length).astype(np.float64)
+        xtx = (counts @ xtx_t).reshape(size, k, k)
+        xty = counts @ xty_t
+        out = np.full(size, np.nan)
+        # Resamples that miss a regressor's variation (e.g. only pre-policy periods)
+        full_rank = np.linalg.matrix_rank(xtx) == k
+        out[full_rank] = np.linalg.solve(xtx[full_rank], xty[full_rank, :, None])[:, j, 0]
+        return out
+
+    draws = _run_batches(coefficients, reps, seed, batch_size, max_workers)
+    kept = ~np.isnan(draws)
+    draws = draws[kept]
+    count = int((np.abs(draws - coef) >= abs(coef)).sum())
+    pvalue = (count + 1) / (len(draws) + 1)
+    std_error = float(draws.std(ddof=1)) if len(draws) > 1 else np.nan
+    return BootstrapResult(term, coef, std_error, pvalue, draws, 'block',
+                           dropped=int((~kept).sum()))
+
+
+def bootstrap_specs(panel, specs, term='did', reps=9999, seed=0, **kwargs):
+    """Wild-cluster and block bootstrap p-values for ``term`` in each ModelSpec.
+
+    Specs without ``term`` are skipped. Extra keyword arguments go to both
+    bootstraps (e.g. ``max_workers``). The wild-cluster p-value is NaN for
+    specs with fewer than ``MIN_CLUSTERS`` clusters; ``Block Dropped``
+    counts the rank-deficient block resamples left out of ``Block Draws``.
+    """
+    rows = []
+    for spec in specs:
+        if term not in spec.regressors:
+            continue
+        data = select_sample(panel, spec.sample)
+        effects = spec_effects(spec)
+        wild = wild_cluster_bootstrap(data, spec.dependent, spec.regressors, term, effects,
+                                      reps=reps, seed=seed, **kwargs)
+        block = block_bootstrap(data, spec.dependent, spec.regressors, term, effects,
+                                reps=reps, seed=seed, **kwargs)
+        rows.append({
+            'Model': spec.name,
+            'DiD Coefficient': wild.coef,
+            'Wild-cluster P-value': wild.pvalue,
+            'Clusters': wild.clusters,
+            'Wild-cluster Draws': wild.reps,
+            'Block P-value': block.pvalue,
+            'Block SE': block.std_error,
+            'Block Draws': block.reps,
+            'Block Dropped': block.dropped,
+        })
+    return pd.DataFrame(rows)
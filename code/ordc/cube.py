@@ -0,0 +1,315 @@
+"""Precomputed aggregate cube of prices, gaps and treatment effects for the dashboard.
+
+The web dashboard (``results/panel_results/webdashboard.ts``) filters by
+zone, period, peak/off-peak hours and volatile days. None of those filters
+should need the hourly panel or a regression at request time. So
+:func:`build_cube` streams the hourly files once and keeps three small
+tables:
+
+* ``cells``: one row per zone x day x peak flag, with the volatile-day
+  flag of that zone-day and the hour count, sum and sum of squares of the
+  price. The measures are additive, so any slice re-aggregates exactly to
+  month, year or the whole sample (mean and standard deviation included);
+* ``gaps``: the daily synthetic control gap of every treated zone (ridge
+  weights on never-treated donors) and the in-space placebo gaps of the
+  donors;
+* ``effects``: the staggered-adoption DiD on daily peak prices
+  (:class:`ordc.staggered.StaggeredDiD`), aggregated overall, by event
+  time, by cohort and by calendar day.
+
+:meth:`Cube.write` stores them as Parquet next to compact columnar JSON
+tiles (``tiles/month.json`` and one ``tiles/day/<zone>.json`` per zone),
+which a static site can load directly. :meth:`Cube.query` answers the same
+slices on the server side (see :mod:`ordc.server`).
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .io import iter_table
+from .profiling import stage
+from .stream import add_hour_ending, hour_window
+from .synth import POLICY_DATE, placebo_test, price_matrix, synthetic_control
+
+KEYS = ('Date', 'zone', 'treated', 'post')
+MEASURES = ('n', 'price_sum', 'price_sumsq')
+GRAINS = {'day': 'D', 'month': 'M', 'year': 'Y'}
+TABLES = ('cells', 'gaps', 'effects')
+INDEX_FILE = 'index.json'
+
+
+class CellAggregator:
+    """Running hour counts, sums and sums of squares per zone-day and peak flag."""
+
+    def __init__(self, window=None, value='DA_LMP', keys=KEYS):
+        self.window = window or hour_window()
+        self.value = value
+        self.keys = list(keys) + ['peak']
+        self._parts = []
+        self._pending_rows = 0
+        self._table_rows = 0
+
+    def update(self, chunk):
+        y = chunk[self.value].to_numpy(dtype=np.float64)
+        frame = chunk[self.keys[:-1]].assign(peak=self.window(chunk).astype(np.int8),
+                                             price_sum=y, price_sumsq=y * y, n=1)
+        partial = frame.groupby(self.keys, observed=True, sort=False)[list(MEASURES)].sum()
+        self._parts.append(partial)
+        self._pending_rows += len(partial)
+        if self._pending_rows > max(self._table_rows, 10_000):
+            self._consolidate()
+
+    def _consolidate(self):
+        if self._parts:
+            table = pd.concat(self._parts).groupby(level=self.keys, observed=True).sum()
+            self._parts, self._pending_rows, self._table_rows = [table], 0, len(table)
+
+    def result(self):
+        self._consolidate()
+        if not self._parts:
+            return pd.DataFrame(columns=self.keys + list(MEASURES))
+        out = self._parts[0].sort_index().reset_index().rename(columns={'Date': 'date'})
+        for column in ('treated', 'post', 'peak'):
+            out[column] = out[column].astype(np.int8)
+        out['n'] = out['n'].astype(np.int64)
+        return out
+
+
+def _volatile_days(cells, threshold, window, min_periods):
+    """Volatile flag per cell, from the zone-day mean over all hours."""
+    from .volatility import VolatilityPanel
+
+    keys = ['date', 'zone', 'treated', 'post']
+    days = cells.groupby(keys, observed=True, sort=False)[['price_sum', 'n']].sum().reset_index()
+    days['price'] = days['price_sum'] / days['n']
+    panel = VolatilityPanel(days, value='price', date='date')
+    days['volatile'] = panel.row_flags(threshold, window, min_periods=min_periods).astype(np.int8)
+    return cells.merge(days[keys + ['volatile']], on=keys, how='left')['volatile'].to_numpy()
+
+
+def _peak_panel(cells):
+    """Daily peak-price panel (``Date``, ``zone``, ``treated``, ``post``, ``avg_price``)."""
+    peak = cells[cells['peak'] == 1].rename(columns={'date': 'Date'})
+    return peak.assign(avg_price=peak['price_sum'] / peak['n'])[list(KEYS) + ['avg_price']]
+
+
+def _gaps(df_peak, post_start, alpha):
+    """Synthetic control gaps of the treated zones and placebo gaps of the donors."""
+    matrix = price_matrix(df_peak)
+    treated = list(df_peak.loc[df_peak['treated'] == 1, 'zone'].unique())
+    donors = [zone for zone in matrix.columns if zone not in treated]
+    if not treated or len(donors) < 2:
+        return pd.DataFrame(columns=['date', 'zone', 'treated', 'actual', 'synthetic', 'gap'])
+    frames = []
+    for zone in treated:
+        result_df, _ = synthetic_control(matrix, zone, donors, post_start=post_start, alpha=alpha)
+        frames.append(result_df[['actual', 'synthetic', 'gap']].assign(zone=zone, treated=1))
+    placebos = placebo_test(matrix, treated[0], donors, post_start=post_start, alpha=alpha).gaps
+    for zone in placebos.columns.drop(treated[0]):
+        frames.append(pd.DataFrame({'actual': matrix[zone], 'synthetic': matrix[zone] - placebos[zone],
+                                    'gap': placebos[zone], 'zone': zone, 'treated': 0}))
+    gaps = pd.concat(frames).rename_axis('date').reset_index()
+    gaps['treated'] = gaps['treated'].astype(np.int8)
+    return gaps[['date', 'zone', 'treated', 'actual', 'synthetic', 'gap']]
+
+
+def _effects(df_peak):
+    """Staggered DiD aggregations in one long table (``kind``, ``key``, ``att``, ...)."""
+    from .staggered import AGGREGATIONS, StaggeredDiD
+
+    columns = ['kind', 'key', 'att', 'std_error', 'lower', 'upper']
+    did = StaggeredDiD(df_peak, 'avg_price', time='Date')
+    if not len(did.cohorts):
+        return pd.DataFrame(columns=columns)
+    result = did.fit(control_group='never' if did.never.any() else 'notyet')
+    frames = []
+    for kind in AGGREGATIONS:
+        table = result.aggregate(kind)
+        keys = table.index if kind in ('simple', 'dynamic') else table.index.strftime('%Y-%m-%d')
+        frames.append(table.assign(kind=kind, key=[str(k) for k in keys]))
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def _period(dates, grain):
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain {grain!r}; expected one of {tuple(GRAINS)}")
+    return dates.dt.to_period(GRAINS[grain]).dt.to_timestamp()
+
+
+def _columnar(frame):
+    """A DataFrame as ``{column: [values]}`` with ISO dates and NaN as null."""
+    out = {}
+    for column in frame.columns:
+        series = frame[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dt.strftime('%Y-%m-%d').tolist()
+        elif pd.api.types.is_float_dtype(series):
+            values = [None if np.isnan(v) else round(v, 6) for v in series.tolist()]
+        else:
+            values = series.astype(object).where(series.notna(), None).tolist()
+        out[str(column)] = values
+    return out
+
+
+def to_json(frame):
+    """Compact columnar JSON text of a DataFrame."""
+    return json.dumps(_columnar(frame), separators=(',', ':'))
+
+
+class Cube:
+    """The dashboard tables with slice queries (see the module docstring)."""
+
+    def __init__(self, cells, gaps=None, effects=None, meta=None):
+        self.cells = cells
+        self.gaps = gaps if gaps is not None else pd.DataFrame(columns=['date', 'zone', 'gap'])
+        self.effects = effects if effects is not None else pd.DataFrame(columns=['kind', 'key'])
+        self.meta = dict(meta or {})
+        self.meta.setdefault('version', self._version())
+        self._periods = {}
+
+    def _version(self):
+        """Content hash of the tables; changes whenever the cube is rebuilt with new data."""
+        digest = hashlib.sha1()
+        for table in (self.cells, self.gaps, self.effects):
+            digest.update(pd.util.hash_pandas_object(table, index=False).to_numpy().tobytes())
+        return digest.hexdigest()[:16]
+
+    @property
+    def zones(self):
+        return sorted(pd.unique(self.cells['zone']).astype(str))
+
+    def index(self):
+        """Description of the cube served as ``/meta`` and written as ``index.json``."""
+        dates = self.cells['date']
+        return {**self.meta, 'zones': self.zones, 'grains': list(GRAINS),
+                'start': None if dates.empty else dates.min().strftime('%Y-%m-%d'),
+                'end': None if dates.empty else dates.max().strftime('%Y-%m-%d'),
+                'measures': list(MEASURES), 'cells': len(self.cells),
+                'effect_kinds': sorted(pd.unique(self.effects['kind']))}
+
+    def _select(self, table, zones, start, end):
+        mask = np.ones(len(table), dtype=bool)
+        if zones:
+            mask &= table['zone'].isin(list(zones)).to_numpy()
+        if start is not None:
+            mask &= (table['date'] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (table['date'] <= pd.Timestamp(end)).to_numpy()
+        return mask
+
+    def period(self, grain):
+        """Period start of every cell at ``grain`` (cached)."""
+        if grain not in self._periods:
+            self._periods[grain] = _period(self.cells['date'], grain).to_numpy()
+        return self._periods[grain]
+
+    def query(self, zones=None, grain='month', peak=None, volatile=None, start=None, end=None):
+        """Price statistics per zone and period for one slice of the cube.
+
+        ``peak`` and ``volatile`` filter on the flags (``None`` keeps all
+        hours or all days). Returns ``zone``, ``period``, ``hours``,
+        ``volatile_days`` (distinct zone-days flagged volatile), ``mean_price``
+        and ``std_price``.
+        """
+        cells = self.cells
+        mask = self._select(cells, zones, start, end)
+        for column, value in (('peak', peak), ('volatile', volatile)):
+            if value is not None:
+                mask &= (cells[column] == int(value)).to_numpy()
+        frame = cells.loc[mask, ['zone', 'date', 'volatile'] + list(MEASURES)]
+        frame = frame.assign(period=self.period(grain)[mask],
+                             volatile_day=frame['date'].where(frame['volatile'] == 1))
+        out = frame.groupby(['zone', 'period'], observed=True, sort=True).agg(
+            hours=('n', 'sum'), price_sum=('price_sum', 'sum'), price_sumsq=('price_sumsq', 'sum'),
+            volatile_days=('volatile_day', 'nunique')).reset_index()
+        mean = out['price_sum'] / out['hours']
+        var = (out['price_sumsq'] - out['hours'] * mean ** 2) / (out['hours'] - 1)
+        out['mean_price'] = mean
+        out['std_price'] = np.sqrt(var.clip(lower=0).where(out['hours'] > 1))
+        out['zone'] = out['zone'].astype(str)
+        return out.drop(columns=['price_sum', 'price_sumsq'])
+
+    def gap_series(self, zones=None, grain='day', start=None, end=None):
+        """Mean actual, synthetic and gap per zone and period."""
+        gaps = self.gaps.loc[self._select(self.gaps, zones, start, end)]
+        gaps = gaps.assign(period=_period(gaps['date'], grain), zone=gaps['zone'].astype(str))
+        return (gaps.groupby(['zone', 'treated', 'period'], sort=True)[['actual', 'synthetic', 'gap']]
+                .mean().reset_index())
+
+    def effect_table(self, kind='dynamic'):
+        return self.effects[self.effects['kind'] == kind].reset_index(drop=True)
+
+    def write(self, folder):
+        """Write the tables as Parquet plus ``index.json`` and the JSON tiles."""
+        folder = Path(folder)
+        (folder / 'tiles' / 'day').mkdir(parents=True, exist_ok=True)
+        for name in TABLES:
+            getattr(self, name).to_parquet(folder / f"{name}.parquet", index=False)
+        (folder / INDEX_FILE).write_text(json.dumps(self.index(), indent=2))
+
+        # Tiles keep the additive measures, so a static client can combine slices itself
+        monthly = self.cells.assign(date=self.period('month'))
+        monthly = (monthly.groupby(['zone', 'date', 'peak', 'volatile'], observed=True, sort=True)
+                   [list(MEASURES)].sum().reset_index())
+        (folder / 'tiles' / 'month.json').write_text(to_json(monthly))
+        columns = ['date', 'peak', 'volatile', 'treated', 'post'] + list(MEASURES)
+        for zone, cells in self.cells.groupby('zone', observed=True):
+            (folder / 'tiles' / 'day' / f"{zone}.json").write_text(to_json(cells[columns]))
+        (folder / 'tiles' / 'gaps.json').write_text(to_json(self.gaps))
+        (folder / 'tiles' / 'effects.json').write_text(to_json(self.effects))
+        return folder
+
+    @classmethod
+    def read(cls, folder):
+        folder = Path(folder)
+        tables = {name: pd.read_parquet(folder / f"{name}.parquet") for name in TABLES}
+        meta = json.loads((folder / INDEX_FILE).read_text())
+        meta = {key: meta[key] for key in ('version', 'threshold', 'volatility_window',
+                                           'post_start') if key in meta}
+        return cls(tables['cells'], tables['gaps'], tables['effects'], meta)
+
+
+def build_cube(sources, window=None, threshold=2.0, volatility_window=None, min_periods=None,
+               value='DA_LMP', chunksize=500_000, timestamp=None, post_start=POLICY_DATE,
+               alpha=1.0):
+    """Stream hourly price files into a :class:`Cube`.
+
+    ``window`` defines peak hours (``hour_window(17, 20)`` by default).
+    A zone-day is volatile when its mean price over all hours is more than
+    ``threshold`` standard deviations from the zone's long-term mean, or
+    from a trailing ``volatility_window`` (see
+    :meth:`ordc.volatility.VolatilityPanel.zscores`). ``sources`` and
+    ``timestamp`` are as in :func:`ordc.stream.stream_peak_prices`.
+    """
+    if isinstance(sources, (str, Path, pd.DataFrame)) or not hasattr(sources, '__iter__'):
+        sources = [sources]
+    window = window or hour_window()
+    aggregator = CellAggregator(window, value)
+
+    columns = list(KEYS) + [value] + list(getattr(window, 'columns', ()))
+    if timestamp is not None:
+        columns = [c for c in columns if c not in ('Date', 'Hr_End')] + [timestamp]
+    columns = list(dict.fromkeys(columns))
+
+    with stage('cells') as step:
+        for source in sources:
+            for chunk in iter_table(source, columns=columns, chunksize=chunksize):
+                if timestamp is not None:
+                    chunk = add_hour_ending(chunk, timestamp)
+                aggregator.update(chunk)
+        cells = step.shape(aggregator.result())
+    with stage('volatile_days'):
+        cells['volatile'] = _volatile_days(cells, threshold, volatility_window, min_periods)
+
+    df_peak = _peak_panel(cells)
+    with stage('gaps') as step:
+        gaps = step.shape(_gaps(df_peak, post_start, alpha))
+    with stage('effects') as step:
+        effects = step.shape(_effects(df_peak))
+
+    meta = {'threshold': threshold, 'volatility_window': volatility_window,
+            'post_start': pd.Timestamp(post_start).strftime('%Y-%m-%d')}
+    return Cube(cells, gaps, effects, meta)
@@ -0,0 +1,179 @@
+"""Event-study (leads and lags) estimates of the policy effect with two-way FE.
+
+The single ``did`` coefficient averages the whole post period, and the
+price-trend figure is the only check on pre-trends. An event study instead
+estimates one coefficient per period relative to the policy start (months
+for the monthly panel, weeks for a weekly one), for the treated zone versus
+the controls, relative to a reference period.
+
+:class:`EventStudy` factorizes the panel's effects and periods once. It
+builds a single sparse (CSR) design with one indicator per calendar period
+for the treated rows, one nonzero per treated row. Every event-time dummy
+is a sum of these per-period indicators: the period itself inside the
+window, or the periods binned into an endpoint. A fit multiplies the sparse
+design by the window's aggregation, demeans only the event-time columns it
+has not seen yet with an :class:`~ordc.absorb.Absorber`, and caches them by
+the periods they cover. Windows and reference periods that share columns,
+as a sweep's do, reuse them. Memory grows with the event-time columns
+actually used, not with the number of calendar periods, so weekly periods
+over the hourly panel stay cheap.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .absorb import Absorber, within_ols
+from .panel import FitSummary
+
+
+@dataclass
+class EventStudyResult:
+    """Relative-time coefficients with a joint test of the leads."""
+    coefficients: pd.DataFrame    # indexed by relative period; the reference row is zero
+    reference: int
+    window: tuple
+    pretrend_stat: float          # F statistic of all leads jointly zero
+    pretrend_pvalue: float
+    summary: FitSummary
+
+    @property
+    def post_effect(self):
+        """Mean of the lag coefficients (relative periods 0 and later)."""
+        rel = self.coefficients.index
+        lags = self.coefficients[(rel >= 0) & (rel != self.reference)]
+        return float(lags['coef'].mean())
+
+
+def event_label(rel):
+    return f"rel_{rel}"
+
+
+def treated_indicators(codes, is_treated, n_periods):
+    """CSR matrix (rows x periods) with a one in each treated row's period column."""
+    from scipy import sparse
+
+    indptr = np.concatenate([[0], np.cumsum(is_treated)])
+    return sparse.csr_matrix((np.ones(indptr[-1]), codes[is_treated], indptr),
+                             shape=(len(codes), n_periods))
+
+
+class EventStudy:
+    """Cached design for event-study fits on one panel.
+
+    Parameters
+    ----------
+    panel : DataFrame
+        Prepared panel (see :func:`~ordc.panel.prepare_panel`).
+    dependent : str
+        Outcome column.
+    controls : sequence of str
+        Additional regressors, demeaned once and reused by every fit.
+    effects : sequence
+        Fixed effects absorbed, as for :class:`~ordc.absorb.Absorber`.
+    time : str
+        Column whose sorted unique values are the event-time periods.
+    event_date : optional
+        First treated period; by default the first ``post`` period of the
+        treated rows.
+    """
+
+    def __init__(self, panel, dependent='avg_price', controls=(),
+                 effects=('panel_id', 'time_id'), time='date', treated='treated',
+                 event_date=None):
+        self.dependent = dependent
+        self.controls = list(controls)
+        codes, self.periods = pd.factorize(panel[time], sort=True)
+        is_treated = panel[treated].to_numpy() == 1
+        if event_date is None:
+            event_date = panel.loc[is_treated & (panel['post'] == 1).to_numpy(), time].min()
+        self.event_index = int(self.periods.searchsorted(event_date))
+
+        self.absorber = Absorber(panel, effects)
+        self.absorber.precompute([dependent] + self.controls)
+        # One sparse indicator per calendar period for the treated rows
+        self.indicators = treated_indicators(codes, is_treated, len(self.periods))
+        self.treated_counts = np.bincount(codes[is_treated], minlength=len(self.periods))
+        self._columns = {}
+
+    @property
+    def relative(self):
+        """Relative period of each calendar period."""
+        return np.arange(len(self.periods)) - self.event_index
+
+    def _aggregation(self, window, reference):
+        """Map calendar periods to event-time columns, binning beyond the window."""
+        lo, hi = window
+        if not lo <= reference <= hi:
+            raise ValueError(f"Reference period {reference} is outside the window {window}")
+        binned = np.clip(self.relative, lo, hi)
+        labels = [r for r in range(lo, hi + 1)
+                  if r != reference and self.treated_counts[binned == r].sum() > 0]
+        M = (binned[:, None] == np.array(labels)[None, :]).astype(np.float64)
+        return labels, M
+
+    def _event_columns(self, M):
+        """Demeaned event-time columns for the period aggregation ``M`` (periods x columns)."""
+        keys = [tuple(np.flatnonzero(M[:, j])) for j in range(M.shape[1])]
+        missing = [j for j, key in enumerate(keys) if key not in self._columns]
+        if missing:
+            block = self.indicators @ M[:, missing]
+            for j, column in zip(missing, self.absorber.demean(block).T):
+                self._columns[keys[j]] = column
+        return np.column_stack([self._columns[key] for key in keys])
+
+    def fit(self, window=(-12, 12), reference=-1, cov_type='robust'):
+        """Estimate the event-time coefficients for one window and reference.
+
+        Periods beyond the window are binned into its endpoints. The joint
+        pre-trend test is an F test that every lead (relative period below
+        zero, other than the reference) is zero.
+        """
+        from scipy import stats
+
+        labels, M = self._aggregation(window, reference)
+        names = ['const'] + [event_label(r) for r in labels] + self.controls
+        x = np.column_stack([np.ones(self.absorber.nobs), self._event_columns(M)]
+                            + [self.absorber.column(c) for c in self.controls])
+        y = self.absorber.column(self.dependent)
+        summary, cov = within_ols(y, x, names, self.absorber.neffects, cov_type)
+
+        leads = [1 + i for i, r in enumerate(labels) if r < 0]
+        if leads:
+            b = summary.params.to_numpy()[leads]
+            V = cov[np.ix_(leads, leads)]
+            stat = float(b @ np.linalg.solve(V, b) / len(leads))
+            df_resid = self.absorber.nobs - self.absorber.neffects - x.shape[1]
+            pvalue = float(stats.f.sf(stat, len(leads), df_resid))
+        else:
+            stat, pvalue = float('nan'), float('nan')
+
+        event_names = [event_label(r) for r in labels]
+        table = pd.DataFrame({
+            'coef': summary.params[event_names].to_numpy(),
+            'std_error': summary.std_errors[event_names].to_numpy(),
+            'pvalue': summary.pvalues[event_names].to_numpy(),
+        }, index=pd.Index(labels, name='relative_period'))
+        table.loc[reference] = [0.0, np.nan, np.nan]
+        table = table.sort_index()
+        table['lower'] = table['coef'] - 1.96 * table['std_error']
+        table['upper'] = table['coef'] + 1.96 * table['std_error']
+        return EventStudyResult(table, reference, tuple(window), stat, pvalue, summary)
+
+    def sweep(self, windows, references=(-1,), cov_type='robust'):
+        """Fit every window x reference combination; one summary row each."""
+        rows = []
+        for window in windows:
+            for reference in references:
+                result = self.fit(window, reference, cov_type)
+                rel = result.coefficients.index
+                rows.append({
+                    'window': tuple(window),
+                    'reference': reference,
+                    'leads': int(((rel < 0) & (rel != reference)).sum()),
+                    'lags': int(((rel >= 0) & (rel != reference)).sum()),
+                    'pretrend_F': result.pretrend_stat,
+                    'pretrend_pvalue': result.pretrend_pvalue,
+                    'post_effect': result.post_effect,
+                })
+        return pd.DataFrame(rows)
@@ -0,0 +1,146 @@
+"""Declarative specification grids fitted across a process pool.
+
+A grid is the cross product of dependent variable, sample, fixed effects and
+control set; :func:`spec_grid` expands it into ModelSpec objects named the way
+the original twelve models were. :func:`run_grid` fits them in worker
+processes. The columns the specs need are copied once into a shared memory
+block, and each worker maps that block as a DataFrame when it starts, so no
+task carries the panel through pickle.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .panel import CONTROLS, SAMPLES, ModelSpec, compare_models, fit_spec, summarize
+
+# Regressors that are not absorbed by each fixed-effects structure
+EFFECTS = {
+    'none': (('treated', 'post', 'did'), False, False),
+    'entity': (('post', 'did'), True, False),
+    'two-way': (('did',), True, True),
+}
+EFFECT_NAMES = {'none': "Pooled OLS", 'entity': "Entity FE", 'two-way': "Two-way FE"}
+
+
+def spec_name(dependent, sample, effects, controls):
+    """Model name in the style of the original analysis, e.g. 'F vs C Log Two-way FE'."""
+    name = EFFECT_NAMES[effects]
+    if dependent == 'log_price':
+        name = "Log " + name
+    elif dependent != 'avg_price':
+        name = f"{name} ({dependent})"
+    if sample == 'fc':
+        name = "F vs C " + name
+    elif sample != 'all':
+        name = f"{name} [{sample}]"
+    if tuple(controls) == CONTROLS:
+        name += " with Controls"
+    elif controls:
+        name += " with " + ", ".join(controls)
+    return name
+
+
+def spec_grid(dependents=('avg_price', 'log_price'), samples=('all', 'fc'),
+              effects=('none', 'entity', 'two-way'), controls=((), CONTROLS),
+              cov_type='robust'):
+    """Expand the grid into ModelSpec objects, sample-major as in the original report."""
+    specs = []
+    for sample in samples:
+        if sample not in SAMPLES:
+            raise ValueError(f"Unknown sample {sample!r}; expected one of {list(SAMPLES)}")
+        for effect in effects:
+            base, entity, time = EFFECTS[effect]
+            for dependent in dependents:
+                for ctrls in controls:
+                    specs.append(ModelSpec(
+                        spec_name(dependent, sample, effect, ctrls), dependent,
+                        base + tuple(ctrls), sample=sample,
+                        entity_effects=entity, time_effects=time, cov_type=cov_type))
+    return specs
+
+
+class SharedPanel:
+    """The numeric columns of a prepared panel held in one shared memory block.
+
+    Zones are stored as integer codes; ``zones`` keeps the labels so workers
+    can rebuild the ``zone``/``panel_id`` columns used for sample selection.
+    """
+
+    def __init__(self, panel, columns):
+        self.columns = [c for c in dict.fromkeys(columns) if c not in ('zone', 'panel_id')]
+        zone = panel['zone'].astype('category')
+        self.zones = list(zone.cat.categories)
+        self.shape = (len(panel), len(self.columns) + 1)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(8 * self.shape[0] * self.shape[1], 8))
+        self.name = self._shm.name
+        block = np.ndarray(self.shape, dtype=np.float64, buffer=self._shm.buf, order='F')
+        for j, col in enumerate(self.columns):
+            block[:, j] = panel[col].to_numpy(dtype=np.float64)
+        block[:, -1] = zone.cat.codes.to_numpy()
+
+    @property
+    def meta(self):
+        return self.name, self.shape, self.columns, self.zones
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_panel(name, shape, columns, zones):
+    """Map a SharedPanel block as a DataFrame without copying the numeric data."""
+    shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order='F')
+    panel = pd.DataFrame({col: block[:, j] for j, col in enumerate(columns)}, copy=False)
+    panel['zone'] = pd.Categorical.from_codes(block[:, -1].astype(np.int16), zones)
+    panel['panel_id'] = panel['zone']
+    panel['time_id'] = panel['time_id'].astype(np.int64)
+    return shm, panel
+
+
+# Set in each worker by _init_worker
+_worker_shm = None
+_worker_panel = None
+
+
+def _init_worker(meta):
+    global _worker_shm, _worker_panel
+    _worker_shm, _worker_panel = attach_panel(*meta)
+
+
+def _fit_in_worker(spec):
+    return spec.name, summarize(fit_spec(_worker_panel, spec))
+
+
+def fit_grid(panel, specs, max_workers=None):
+    """Fit every spec and return ``{name: FitSummary}`` in spec order.
+
+    With ``max_workers=1`` the specs are fitted serially in this process.
+    """
+    specs = list(specs)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(specs) == 1:
+        return {spec.name: summarize(fit_spec(panel, spec)) for spec in specs}
+
+    columns = ['time_id'] + [c for spec in specs for c in (spec.dependent,) + spec.regressors]
+    with SharedPanel(panel, columns) as shared:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(specs)),
+                                 initializer=_init_worker,
+                                 initargs=(shared.meta,)) as pool:
+            return dict(pool.map(_fit_in_worker, specs))
+
+
+def run_grid(panel, specs=None, max_workers=None):
+    """Fit a spec grid (the full default grid if None) and return the model comparison table."""
+    if specs is None:
+        specs = spec_grid()
+    return compare_models(fit_grid(panel, specs, max_workers))
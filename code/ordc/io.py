@@ -0,0 +1,189 @@
+"""Cached loading of the Excel workbooks used by the analysis scripts.
+
+Parsing the workbooks through openpyxl dominates the runtime of both scripts,
+so each sheet is converted once into a typed Parquet file and read back from
+there on later runs. A small JSON manifest next to the Parquet file records the
+source file's size, mtime and SHA-256 digest; the cache is rebuilt only when
+the workbook's contents actually change.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+# Where converted workbooks are kept; override with ORDC_CACHE_DIR
+CACHE_DIR = Path(os.environ.get("ORDC_CACHE_DIR", ".ordc_cache"))
+
+# Columns used by the two analysis scripts
+PANEL_COLUMNS = ['month', 'zone', 'treated', 'post', 'avg_price',
+                 'load', 'natural gas price', 'weather']
+HOURLY_COLUMNS = ['Date', 'Hr_End', 'zone', 'treated', 'post', 'DA_LMP']
+
+# Storage types applied on conversion; other columns keep the inferred dtype
+DTYPES = {
+    'zone': 'category',
+    'treated': 'int8',
+    'post': 'int8',
+    'Hr_End': 'int8',
+}
+DATE_COLUMNS = ('Date', 'month')
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_types(df):
+    """Parse date columns and apply the compact storage types in DTYPES."""
+    df = df.rename(columns=lambda c: c.strip() if isinstance(c, str) else c)
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    for col, dtype in DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def _cache_paths(path, sheet_name, cache_dir):
+    # Workbooks with the same name in different folders get separate entries
+    location = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:8]
+    stem = f"{path.stem}-{sheet_name}-{location}".replace(' ', '_')
+    return cache_dir / f"{stem}.json", stem
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(manifest_path, manifest):
+    tmp_path = manifest_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _cached_file(path, manifest_path, cache_dir):
+    """Return the cached Parquet path if it is still valid for ``path``."""
+    manifest = _read_manifest(manifest_path)
+    if manifest is None:
+        return None
+    data_path = cache_dir / manifest['data']
+    if not data_path.exists():
+        return None
+    stat = path.stat()
+    if stat.st_mtime_ns == manifest['mtime_ns'] and stat.st_size == manifest['size']:
+        return data_path
+    # The file was touched; only rebuild if its contents changed
+    if file_digest(path) == manifest['sha256']:
+        manifest['mtime_ns'] = stat.st_mtime_ns
+        manifest['size'] = stat.st_size
+        _write_manifest(manifest_path, manifest)
+        return data_path
+    return None
+
+
+def convert_workbook(path, sheet_name=0, cache_dir=None):
+    """Convert one workbook sheet to Parquet and return the full DataFrame."""
+    path = Path(path)
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path, stem = _cache_paths(path, sheet_name, cache_dir)
+    old = _read_manifest(manifest_path)
+
+    stat = path.stat()
+    sha256 = file_digest(path)
+    df = normalize_types(pd.read_excel(path, sheet_name=sheet_name))
+
+    data_name = f"{stem}-{sha256[:16]}.parquet"
+    tmp_path = cache_dir / (data_name + '.tmp')
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_dir / data_name)
+
+    manifest = {
+        'source': str(path.resolve()),
+        'sheet_name': sheet_name,
+        'sha256': sha256,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'data': data_name,
+    }
+    _write_manifest(manifest_path, manifest)
+    if old is not None and old['data'] != data_name:
+        (cache_dir / old['data']).unlink(missing_ok=True)
+    return df
+
+
+def cached_path(path, sheet_name=0, cache_dir=None, refresh=False):
+    """Return the Parquet file for a workbook sheet, converting it if stale."""
+    path = Path(path)
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    manifest_path, _ = _cache_paths(path, sheet_name, cache_dir)
+    data_path = None if refresh else _cached_file(path, manifest_path, cache_dir)
+    if data_path is None:
+        convert_workbook(path, sheet_name, cache_dir)
+        data_path = cache_dir / _read_manifest(manifest_path)['data']
+    return data_path
+
+
+def load_table(path, columns=None, sheet_name=0, cache_dir=None, refresh=False):
+    """Load a workbook sheet through the Parquet cache.
+
+    Only ``columns`` are read from the cache (all columns if None). The Excel
+    file is parsed only when no cache exists, when its contents changed, or
+    when ``refresh`` is True. CSV and Parquet inputs are read directly.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.parquet':
+        return pd.read_parquet(path, columns=columns)
+    if suffix == '.csv':
+        return normalize_types(pd.read_csv(path, usecols=columns))
+
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    manifest_path, _ = _cache_paths(path, sheet_name, cache_dir)
+    data_path = None if refresh else _cached_file(path, manifest_path, cache_dir)
+    if data_path is None:
+        df = convert_workbook(path, sheet_name, cache_dir)
+        return df if columns is None else df[list(columns)]
+    return pd.read_parquet(data_path, columns=columns)
+
+
+def iter_table(source, columns=None, chunksize=100_000):
+    """Yield DataFrame chunks of at most ``chunksize`` rows.
+
+    ``source`` may be a DataFrame, a Parquet or CSV file, or a workbook (read
+    through the Parquet cache). Parquet is read batch by batch, so memory is
+    bounded by the chunk size rather than the file size.
+    """
+    if isinstance(source, pd.DataFrame):
+        frame = source if columns is None else source[list(columns)]
+        for start in range(0, len(frame), chunksize):
+            yield frame.iloc[start:start + chunksize]
+        return
+
+    path = Path(source)
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+            yield normalize_types(chunk)
+        return
+    if suffix != '.parquet':
+        path = cached_path(path)
+
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas()
@@ -0,0 +1,258 @@
+"""Lazy panel preparation with filters and column selection pushed into the scan.
+
+:func:`~ordc.panel.prepare_panel` works on a loaded table. Every column of
+every zone is read, all derived variables are computed for every row, and
+samples such as Zone F vs Zone C are cut only when a model is fitted. On
+the wide all-node panels most of that work is thrown away.
+
+:class:`PanelQuery` describes the same preparation as a plan over a
+Parquet or CSV file (workbooks go through the Parquet cache of
+:mod:`ordc.io`):
+
+* zone and date filters are pushed into the scan. Only the rows they keep
+  are decoded, and Parquet row groups whose statistics rule them out are
+  skipped;
+* only the source columns needed for the requested output columns are
+  read;
+* derived columns (:data:`~ordc.panel.DERIVED_COLUMNS`) are computed only
+  when requested, after filtering.
+
+:func:`sample_queries` groups ModelSpecs by sample, giving one query per
+sample with its zone filter and the union of its models' columns.
+
+The plan runs on Polars' lazy engine when Polars is installed and on a
+pyarrow dataset scan otherwise; both are multi-threaded. The result has
+the same columns, values and dtypes as ``prepare_panel`` followed by
+:func:`~ordc.panel.select_sample`, up to unused categorical levels. The
+one caveat is ``time_id``, which numbers months in order of appearance
+among the scanned rows. It therefore matches whenever the filtered rows
+cover every month.
+"""
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .io import PANEL_COLUMNS, cached_path
+from .panel import DERIVED_COLUMNS, SAMPLES, derive_columns, derived_closure, source_columns
+
+ENGINES = ('polars', 'pyarrow')
+# Source columns renamed on scan, as in prepare_panel
+RENAMES = {'natural gas price': 'natural_gas_price'}
+OUTPUT_COLUMNS = tuple(RENAMES.get(c, c) for c in PANEL_COLUMNS) + tuple(DERIVED_COLUMNS)
+CATEGORICAL = ('zone', 'panel_id', 'year_cat', 'month_cat')
+ROW_INDEX = '__row'
+
+
+def default_engine():
+    """'polars' when it is installed, else 'pyarrow'."""
+    try:
+        import polars  # noqa: F401
+    except ImportError:
+        return 'pyarrow'
+    return 'polars'
+
+
+def spec_columns(specs):
+    """Columns the given ModelSpecs are fitted on: zone, panel identifiers, dependents and regressors."""
+    # 'zone' lets fit_spec and the results store cut the spec's sample as on the full panel
+    columns = ['zone', 'panel_id', 'time_id']
+    for spec in specs:
+        columns += [spec.dependent] + list(spec.regressors)
+    return tuple(dict.fromkeys(columns))
+
+
+def _scan_path(source):
+    path = Path(source)
+    return path if path.suffix.lower() in ('.parquet', '.csv') else cached_path(path)
+
+
+def _polars_expressions(pl, derived):
+    """Polars versions of the derived columns, grouped into stages that depend only on earlier ones."""
+    expressions = {
+        'panel_id': pl.col('zone'),
+        'date': pl.col('month').cast(pl.Datetime('us')),
+        'year': pl.col('date').dt.year().cast(pl.Int16),
+        'month_num': pl.col('date').dt.month().cast(pl.Int8),
+        'year_cat': pl.col('year'),
+        'month_cat': pl.col('month_num'),
+        # Months numbered in order of appearance: rank of each month's first row
+        'time_id': (pl.col(ROW_INDEX).min().over(pl.col('date').dt.truncate('1mo'))
+                    .rank('dense') - 1).cast(pl.Int32),
+        'log_price': pl.col('avg_price').clip(lower_bound=1).log(),
+        'did': (pl.col('treated') * pl.col('post')).cast(pl.Int8),
+    }
+    stages, done = [], set()
+    pending = list(derived)
+    while pending:
+        ready = [name for name in pending
+                 if all(c in done or c not in DERIVED_COLUMNS for c in DERIVED_COLUMNS[name][0])]
+        stages.append([expressions[name].alias(name) for name in ready])
+        done.update(ready)
+        pending = [name for name in pending if name not in done]
+    return stages
+
+
+def _match_types(df):
+    """Apply the storage types prepare_panel gives each column."""
+    for column in CATEGORICAL:
+        if column in df.columns:
+            values = df[column].astype('category')
+            df[column] = values.cat.reorder_categories(values.cat.categories.sort_values())
+    for column in ('month', 'date'):
+        if column in df.columns:
+            df[column] = df[column].astype('datetime64[us]')
+    for column in ('treated', 'post', 'did', 'month_num'):
+        if column in df.columns:
+            df[column] = df[column].astype(np.int8)
+    if 'year' in df.columns:
+        df['year'] = df['year'].astype(np.int16)
+    if 'time_id' in df.columns:
+        time_id = df['time_id'].to_numpy()
+        df['time_id'] = time_id.astype(np.int16 if time_id.max(initial=0) < 2 ** 15 else np.int32)
+    return df
+
+
+def sample_queries(query, specs):
+    """``{sample: query}`` with the rows and columns of the ``specs`` fitted on each sample."""
+    grouped = {}
+    for spec in specs:
+        grouped.setdefault(spec.sample, []).append(spec)
+    return {sample: query.for_specs(group) for sample, group in grouped.items()}
+
+
+@dataclass(frozen=True)
+class PanelQuery:
+    """Lazy plan preparing the monthly DiD panel from a file.
+
+    Parameters
+    ----------
+    source : path
+        Parquet or CSV file with the ``PANEL_COLUMNS`` schema, or a workbook
+        (read through the Parquet cache).
+    zones : tuple, optional
+        Zones to keep; every zone if None.
+    start, end : date-like, optional
+        Inclusive bounds on ``month``.
+    columns : tuple, optional
+        Output columns (source columns with ``natural_gas_price`` renamed,
+        or derived columns); every panel column if None.
+    engine : str, optional
+        'polars' or 'pyarrow'; :func:`default_engine` if None.
+
+    Queries are immutable; :meth:`filter`, :meth:`select` and
+    :meth:`for_spec` return new ones and nothing is read until
+    :meth:`collect`.
+    """
+    source: object
+    zones: tuple = None
+    start: object = None
+    end: object = None
+    columns: tuple = None
+    engine: str = None
+
+    def filter(self, zones=None, start=None, end=None):
+        """Restrict to ``zones`` and to months in ``[start, end]``; unset bounds are kept."""
+        return replace(self, zones=self.zones if zones is None else tuple(zones),
+                       start=self.start if start is None else pd.Timestamp(start),
+                       end=self.end if end is None else pd.Timestamp(end))
+
+    def select(self, *columns):
+        unknown = [c for c in columns if c not in OUTPUT_COLUMNS]
+        if unknown:
+            raise KeyError(f"Not panel columns: {unknown}")
+        return replace(self, columns=tuple(columns))
+
+    def for_spec(self, spec):
+        """The rows and columns one ModelSpec is fitted on."""
+        return self.for_specs([spec])
+
+    def for_specs(self, specs):
+        """The rows and columns of ModelSpecs that share one sample."""
+        samples = {spec.sample for spec in specs}
+        if len(samples) != 1:
+            raise ValueError(f"Specs span several samples: {sorted(samples)}; see sample_queries")
+        query = self.select(*spec_columns(specs))
+        zones = SAMPLES[samples.pop()]
+        return query if zones is None else query.filter(zones=zones)
+
+    @property
+    def output_columns(self):
+        return list(OUTPUT_COLUMNS if self.columns is None else self.columns)
+
+    @property
+    def scan_columns(self):
+        """Source columns read from the file, under their file names."""
+        inverse = {new: old for old, new in RENAMES.items()}
+        return [inverse.get(c, c) for c in source_columns(self.output_columns)]
+
+    @property
+    def derived(self):
+        return derived_closure(self.output_columns)
+
+    def explain(self):
+        """The plan as text: scan, pushed-down predicates, projection and derived columns."""
+        predicates = []
+        if self.zones is not None:
+            predicates.append(f"zone in {list(self.zones)}")
+        if self.start is not None:
+            predicates.append(f"month >= {pd.Timestamp(self.start).date()}")
+        if self.end is not None:
+            predicates.append(f"month <= {pd.Timestamp(self.end).date()}")
+        return "\n".join([
+            f"SCAN {Path(self.source).name} [{self.engine or default_engine()}]",
+            f"  FILTER {' AND '.join(predicates) or '(none)'}",
+            f"  PROJECT {self.scan_columns}",
+            f"DERIVE {self.derived or '(none)'}",
+            f"OUTPUT {self.output_columns}",
+        ])
+
+    def collect(self):
+        """Run the plan and return a pandas DataFrame typed as prepare_panel's output."""
+        engine = self.engine or default_engine()
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}; expected one of {ENGINES}")
+        path = _scan_path(self.source)
+        df = self._collect_polars(path) if engine == 'polars' else self._collect_pyarrow(path)
+        return _match_types(df[self.output_columns].reset_index(drop=True))
+
+    def _collect_polars(self, path):
+        import polars as pl
+
+        frame = pl.scan_parquet(path) if path.suffix.lower() == '.parquet' else \
+            pl.scan_csv(path, try_parse_dates=True)
+        if self.zones is not None:
+            frame = frame.filter(pl.col('zone').cast(pl.String).is_in(list(self.zones)))
+        if self.start is not None:
+            frame = frame.filter(pl.col('month') >= pd.Timestamp(self.start).to_pydatetime())
+        if self.end is not None:
+            frame = frame.filter(pl.col('month') <= pd.Timestamp(self.end).to_pydatetime())
+        frame = frame.select([pl.col(c).alias(RENAMES.get(c, c)) for c in self.scan_columns])
+        if 'time_id' in self.derived:
+            frame = frame.with_row_index(ROW_INDEX)
+        for stage in _polars_expressions(pl, self.derived):
+            frame = frame.with_columns(stage)
+        return frame.select(self.output_columns).collect().to_pandas()
+
+    def _collect_pyarrow(self, path):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        file_format = 'parquet' if path.suffix.lower() == '.parquet' else 'csv'
+        dataset = ds.dataset(path, format=file_format)
+        predicate = None
+        month_type = dataset.schema.field('month').type if 'month' in dataset.schema.names else None
+        for condition in (
+                None if self.zones is None else ds.field('zone').isin(list(self.zones)),
+                None if self.start is None else ds.field('month') >= pa.scalar(
+                    pd.Timestamp(self.start), month_type),
+                None if self.end is None else ds.field('month') <= pa.scalar(
+                    pd.Timestamp(self.end), month_type)):
+            if condition is not None:
+                predicate = condition if predicate is None else predicate & condition
+        table = dataset.to_table(columns=self.scan_columns, filter=predicate, use_threads=True)
+        df = table.to_pandas().rename(columns=RENAMES)
+        if 'month' in df.columns:
+            df['month'] = pd.to_datetime(df['month'])
+        return derive_columns(df, self.derived)
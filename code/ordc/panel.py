@@ -0,0 +1,208 @@
+"""Panel preparation and model fitting for the DiD analysis.
+
+Nothing here imports linearmodels at module load; the estimator classes are
+imported inside :func:`fit_spec`, so workers that only prepare data stay light.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+CONTROLS = ('load', 'natural_gas_price', 'weather')
+
+# Zone subsets a specification can be estimated on (None keeps every zone)
+SAMPLES = {
+    'all': None,
+    'fc': ('Zone F', 'Zone C'),
+}
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """One panel regression: dependent variable, regressors, sample and effects."""
+    name: str
+    dependent: str
+    regressors: tuple
+    sample: str = 'all'
+    entity_effects: bool = False
+    time_effects: bool = False
+    cov_type: str = 'robust'
+
+    @property
+    def pooled(self):
+        return not (self.entity_effects or self.time_effects)
+
+
+# Models 1-12 of the original analysis, in reporting order
+DEFAULT_SPECS = (
+    ModelSpec("Pooled OLS", 'avg_price', ('treated', 'post', 'did')),
+    ModelSpec("Pooled OLS with Controls", 'avg_price',
+              ('treated', 'post', 'did') + CONTROLS),
+    # 'treated' is captured by the entity effects
+    ModelSpec("Entity FE", 'avg_price', ('post', 'did'), entity_effects=True),
+    ModelSpec("Entity FE with Controls", 'avg_price', ('post', 'did') + CONTROLS,
+              entity_effects=True),
+    # Both 'treated' and 'post' are captured by the two-way effects
+    ModelSpec("Two-way FE", 'avg_price', ('did',),
+              entity_effects=True, time_effects=True),
+    ModelSpec("Two-way FE with Controls", 'avg_price', ('did',) + CONTROLS,
+              entity_effects=True, time_effects=True),
+    ModelSpec("Log Two-way FE", 'log_price', ('did',),
+              entity_effects=True, time_effects=True),
+    ModelSpec("Log Two-way FE with Controls", 'log_price', ('did',) + CONTROLS,
+              entity_effects=True, time_effects=True),
+    ModelSpec("F vs C Two-way FE", 'avg_price', ('did',), sample='fc',
+              entity_effects=True, time_effects=True),
+    ModelSpec("F vs C Two-way FE with Controls", 'avg_price', ('did',) + CONTROLS,
+              sample='fc', entity_effects=True, time_effects=True),
+    ModelSpec("F vs C Log Two-way FE", 'log_price', ('did',), sample='fc',
+              entity_effects=True, time_effects=True),
+    ModelSpec("F vs C Log Two-way FE with Controls", 'log_price', ('did',) + CONTROLS,
+              sample='fc', entity_effects=True, time_effects=True),
+)
+
+
+def _time_id(df):
+    # Months numbered in order of appearance
+    time_id = pd.factorize(df['date'].dt.to_period('M'))[0]
+    return time_id.astype(np.int16 if time_id.max(initial=0) < 2 ** 15 else np.int32)
+
+
+# Derived panel columns in the order prepare_panel adds them: name -> (inputs, function)
+DERIVED_COLUMNS = {
+    # A panel ID that's unique for each zone
+    'panel_id': (('zone',), lambda df: df['zone']),
+    'date': (('month',), lambda df: pd.to_datetime(df['month'])),
+    'year': (('date',), lambda df: df['date'].dt.year.astype(np.int16)),
+    'month_num': (('date',), lambda df: df['date'].dt.month.astype(np.int8)),
+    # Variables for time effects
+    'year_cat': (('year',), lambda df: df['year'].astype('category')),
+    'month_cat': (('month_num',), lambda df: df['month_num'].astype('category')),
+    'time_id': (('date',), _time_id),
+    # Log prices to handle skewness; clipped to avoid negative values in log
+    'log_price': (('avg_price',), lambda df: np.log(df['avg_price'].clip(lower=1))),
+    # The DiD interaction term
+    'did': (('treated', 'post'), lambda df: (df['treated'] * df['post']).astype(np.int8)),
+}
+
+
+def derived_closure(columns):
+    """``columns`` plus every derived column they are computed from, in DERIVED_COLUMNS order."""
+    needed = set()
+    stack = [c for c in columns if c in DERIVED_COLUMNS]
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(c for c in DERIVED_COLUMNS[name][0] if c in DERIVED_COLUMNS)
+    return [name for name in DERIVED_COLUMNS if name in needed]
+
+
+def source_columns(columns):
+    """Input columns of the (renamed) table needed to produce ``columns``."""
+    derived = derived_closure(columns)
+    inputs = [c for c in columns if c not in DERIVED_COLUMNS]
+    for name in derived:
+        inputs += [c for c in DERIVED_COLUMNS[name][0] if c not in DERIVED_COLUMNS]
+    return list(dict.fromkeys(inputs))
+
+
+def derive_columns(df, columns=None):
+    """Add the derived ``columns`` (all of DERIVED_COLUMNS if None) and those they need, in place."""
+    for name in derived_closure(DERIVED_COLUMNS if columns is None else columns):
+        df[name] = DERIVED_COLUMNS[name][1](df)
+    return df
+
+
+def prepare_panel(df):
+    """Add the identifiers and derived variables used by the panel models.
+
+    Returns a new DataFrame; ``df`` is left untouched. Identifiers are kept
+    compact: zones as categoricals, calendar fields and ``time_id`` as small
+    integers, and no string time columns.
+    """
+    # Rename column with spaces for easier handling in formulas
+    df = df.rename(columns={'natural gas price': 'natural_gas_price'})
+    return derive_columns(df)
+
+
+def group_counts(panel):
+    """Observation counts in each treated/post cell."""
+    treated = panel['treated'] == 1
+    post = panel['post'] == 1
+    return {
+        'pre_control': int((~post & ~treated).sum()),
+        'pre_treatment': int((~post & treated).sum()),
+        'post_control': int((post & ~treated).sum()),
+        'post_treatment': int((post & treated).sum()),
+    }
+
+
+def sample_mask(panel, sample):
+    """Boolean mask of the rows of ``panel`` in a named sample, or None for all rows."""
+    zones = SAMPLES[sample]
+    if zones is None:
+        return None
+    return panel['zone'].isin(zones).to_numpy()
+
+
+def select_sample(panel, sample):
+    """Rows of ``panel`` belonging to a named sample in SAMPLES."""
+    mask = sample_mask(panel, sample)
+    return panel if mask is None else panel[mask]
+
+
+def fit_spec(panel, spec):
+    """Fit one ModelSpec on a prepared panel and return the linearmodels result."""
+    from linearmodels.panel import PanelOLS, PooledOLS
+
+    data = select_sample(panel, spec.sample).set_index(['panel_id', 'time_id'])
+    y = data[spec.dependent]
+    X = data[list(spec.regressors)].astype(float)
+    X.insert(0, 'const', 1.0)
+    if spec.pooled:
+        model = PooledOLS(y, X)
+    else:
+        model = PanelOLS(y, X, entity_effects=spec.entity_effects,
+                         time_effects=spec.time_effects)
+    return model.fit(cov_type=spec.cov_type)
+
+
+@dataclass
+class FitSummary:
+    """The parts of a fitted result used for reporting, cheap to pickle."""
+    params: pd.Series
+    std_errors: pd.Series
+    pvalues: pd.Series
+    rsquared: float
+    nobs: int
+
+
+def summarize(result):
+    """Reduce a linearmodels result to a FitSummary."""
+    return FitSummary(result.params, result.std_errors, result.pvalues,
+                      float(result.rsquared), int(result.nobs))
+
+
+def compare_models(results, term='did'):
+    """Tabulate the DiD coefficient, p-value and R-squared of each fitted model.
+
+    ``results`` maps model names to fitted results (or FitSummary objects),
+    in reporting order.
+    """
+    coefs, p_values, r_squared = [], [], []
+    for result in results.values():
+        params = result.params
+        # Models without the term report their last parameter instead
+        name = term if term in params.index else params.index[-1]
+        coefs.append(params[name])
+        p_values.append(result.pvalues[name])
+        r_squared.append(result.rsquared)
+
+    return pd.DataFrame({
+        'Model': list(results),
+        'DiD Coefficient': coefs,
+        'P-value': p_values,
+        'R-squared': r_squared,
+        'Significant': [p < 0.05 for p in p_values],
+    })
@@ -0,0 +1,272 @@
+"""Per-stage timing, CPU, memory and optional profiling of the analysis scripts.
+
+A :class:`Profiler` records one row per stage: wall time, CPU time (this
+process plus any worker processes that finished during the stage), peak
+resident memory and the rows/columns of the data the stage produced.
+Stages nest (e.g. one ``fit`` stage per model inside ``models``), and
+:meth:`Profiler.write` saves the records as JSON and CSV next to the
+reports, so runs can be compared as the data grows.
+
+Library code marks its own stages with the module-level :func:`stage`.
+That is a no-op unless a profiler is active (``with Profiler() as prof:``),
+so the package has no timing overhead when it is used without one.
+
+Peak memory on Linux is the ``VmHWM`` high-water mark, which is reset at
+the start of every stage through ``/proc/self/clear_refs``. The figure is
+therefore the stage's own peak. Elsewhere the process-lifetime peak from
+``getrusage`` is reported.
+
+Profiling is opt-in per stage. Name the stages in ``ORDC_PROFILE``
+(comma-separated, or ``all``) and they run under cProfile, or under
+pyinstrument with ``ORDC_PROFILER=pyinstrument``. The output is written
+to ``profiles/`` inside the results folder.
+"""
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_ENV = 'ORDC_PROFILE'
+PROFILER_ENV = 'ORDC_PROFILER'
+PROFILERS = ('cprofile', 'pyinstrument')
+PROC_STATUS = Path('/proc/self/status')
+
+_active = None
+
+
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak-RSS counter; False where that is not possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident memory in MiB (since the last reset on Linux), or None."""
+    try:
+        for line in PROC_STATUS.read_text().splitlines():
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def _shape(data):
+    shape = getattr(data, 'shape', None)
+    if shape is None:
+        return len(data), None
+    return shape[0], (shape[1] if len(shape) > 1 else 1)
+
+
+class Stage:
+    """A running stage; call :meth:`shape` or set ``rows``/``cols`` to record data size."""
+
+    def __init__(self, name, parent, fields):
+        self.name = name
+        self.parent = parent
+        self.rows = None
+        self.cols = None
+        self.fields = dict(fields)
+        self.peak = 0.0
+
+    def shape(self, data):
+        """Record the rows and columns of a DataFrame, array or sized object."""
+        self.rows, self.cols = _shape(data)
+        return data
+
+
+class Profiler:
+    """Collects stage records for one run of a script.
+
+    Parameters
+    ----------
+    profile : iterable of str or 'all', optional
+        Stages to run under a profiler. Defaults to ``ORDC_PROFILE``.
+    profiler : str, optional
+        'cprofile' or 'pyinstrument'. Defaults to ``ORDC_PROFILER`` or cProfile.
+    output_dir : path, optional
+        Folder for profiler output; set by :meth:`write` if not given.
+    """
+
+    def __init__(self, profile=None, profiler=None, output_dir=None):
+        if profile is None:
+            profile = [s.strip() for s in os.environ.get(PROFILE_ENV, '').split(',') if s.strip()]
+        self.profile = 'all' if profile == 'all' or 'all' in profile else set(profile)
+        self.profiler = (profiler or os.environ.get(PROFILER_ENV) or 'cprofile').lower()
+        if self.profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {self.profiler!r}; expected one of {PROFILERS}")
+        self.output_dir = None if output_dir is None else Path(output_dir)
+        self.records = []
+        self.started = datetime.now()
+        self._open = []
+        self._profiling = False
+        self._pending = []
+
+    def __enter__(self):
+        global _active
+        self._previous, _active = _active, self
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self._previous
+
+    def _wants_profile(self, name):
+        return not self._profiling and (self.profile == 'all' or name in self.profile)
+
+    def _observe_peak(self):
+        """Fold the current high-water mark into every open stage."""
+        peak = peak_rss_mb()
+        if peak is not None:
+            for open_stage in self._open:
+                open_stage.peak = max(open_stage.peak, peak)
+
+    @contextmanager
+    def stage(self, name, data=None, **fields):
+        """Time a block as one stage; extra keyword arguments are stored with it."""
+        parent = '/'.join(s.name for s in self._open) or None
+        current = Stage(name, parent, fields)
+        if data is not None:
+            current.shape(data)
+        self._observe_peak()
+        self._open.append(current)
+        _reset_peak_rss()
+
+        session = self._start_profile(name) if self._wants_profile(name) else None
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        try:
+            yield current
+        finally:
+            wall, cpu = time.perf_counter() - wall, _cpu_seconds() - cpu
+            profile_path = self._stop_profile(name, session) if session else None
+            self._observe_peak()
+            self._open.pop()
+            self.records.append({
+                'stage': name if parent is None else f"{parent}/{name}",
+                'parent': parent,
+                'wall_s': wall,
+                'cpu_s': cpu,
+                'peak_rss_mb': current.peak or None,
+                'rows': current.rows,
+                'cols': current.cols,
+                'profile': profile_path,
+                **current.fields,
+            })
+
+    def _start_profile(self, name):
+        self._profiling = True
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler as Sampler
+
+            session = Sampler()
+            session.start()
+        else:
+            session = cProfile.Profile()
+            session.enable()
+        return session
+
+    def _stop_profile(self, name, session):
+        """Stop profiling; the output is written by :meth:`write` when no folder is set yet."""
+        self._profiling = False
+        safe = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+        if self.profiler == 'pyinstrument':
+            session.stop()
+            filename = f"{safe}.html"
+        else:
+            session.disable()
+            filename = f"{safe}.prof"
+        self._pending.append((session, filename))
+        if self.output_dir is not None:
+            self._flush_profiles()
+        return f"profiles/{filename}"
+
+    def _flush_profiles(self):
+        if not self._pending:
+            return
+        folder = self.output_dir / 'profiles'
+        folder.mkdir(parents=True, exist_ok=True)
+        for session, filename in self._pending:
+            if filename.endswith('.html'):
+                (folder / filename).write_text(session.output_html())
+            else:
+                session.dump_stats(folder / filename)
+                # A readable top-30 by cumulative time alongside the binary stats
+                with open(folder / filename.replace('.prof', '.txt'), 'w') as f:
+                    pstats.Stats(session, stream=f).sort_stats('cumulative').print_stats(30)
+        self._pending = []
+
+    def to_frame(self):
+        """Records in the order the stages finished (nested stages before their parents)."""
+        frame = pd.DataFrame(self.records)
+        if not frame.empty:
+            frame[['rows', 'cols']] = frame[['rows', 'cols']].astype('Int64')
+        return frame
+
+    def write(self, results_dir, stem='pipeline_profile'):
+        """Write ``<stem>.json`` and ``<stem>.csv`` to ``results_dir``; returns both paths."""
+        results_dir = Path(results_dir)
+        results_dir.mkdir(parents=True, exist_ok=True)
+        if self.output_dir is None:
+            self.output_dir = results_dir
+        self._flush_profiles()
+
+        json_path = results_dir / f"{stem}.json"
+        csv_path = results_dir / f"{stem}.csv"
+        with open(json_path, 'w') as f:
+            json.dump({
+                'script': Path(sys.argv[0]).name,
+                'started': self.started.isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'stages': self.records,
+            }, f, indent=2, default=str)
+        self.to_frame().to_csv(csv_path, index=False)
+        return json_path, csv_path
+
+    def report(self):
+        """Aligned text table of the top-level and nested stages."""
+        frame = self.to_frame()
+        if frame.empty:
+            return ""
+        columns = ['stage', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows', 'cols']
+        return frame[columns].to_string(index=False, float_format=lambda v: f"{v:.2f}")
+
+
+@contextmanager
+def stage(name, data=None, **fields):
+    """Record a stage on the active profiler; a no-op when none is active."""
+    if _active is None:
+        current = Stage(name, None, fields)
+        if data is not None:
+            current.shape(data)
+        yield current
+    else:
+        with _active.stage(name, data, **fields) as current:
+            yield current
@@ -0,0 +1,458 @@
+"""Incremental daily refresh of the synthetic control and DiD estimates.
+
+A new day of prices should not mean reloading the workbooks and refitting
+everything. This module keeps three pieces of persisted state:
+
+* :class:`PanelStore` is a Parquet store of panel rows. Every append
+  writes one small part file, and a JSON manifest records each part's date
+  range, so a refresh reads and writes only the new rows. A row whose key
+  is already stored with other values (an ISO price revision) replaces the
+  stored row: the parts holding it are rewritten under new names and the
+  manifest is switched over in one atomic write.
+* :class:`SyntheticRefresh` holds the pre-period donor weights frozen at
+  fit time, plus the gap series. A new day costs one dot product per date,
+  and ``avg_effect`` is kept as a running post-period sum and count. A
+  date enters the series once every fitted zone has a price for it, so
+  zones arriving in separate files (NYISO, ISO-NE) are joined up.
+* :class:`DidRefresh` holds :class:`~ordc.suffstats.SufficientStats` for
+  every (sample, dependent variable) pair of a set of ModelSpecs. Fixed
+  effects are entered as dummy columns; dummies for new zones or periods are
+  appended as they appear. A revised row (e.g. the current month's
+  average after one more day) is replaced by a rank-one downdate of the
+  old row followed by an update with the new row. Each spec is then a
+  ``k x k`` solve, with no pass over the data.
+
+Coefficients, standard errors, p-values and R-squared equal those of a
+full PanelOLS refit. The PanelOLS design, demeaned regressors with their
+means added back, is a linear map of the dummy design, so its covariance
+follows from the same statistics. The robust (HC1) meat
+``sum e_i^2 x_i x_i'`` is the one part that depends on the rows
+individually. It is computed at report time from the sample's stored rows,
+which the downdates keep anyway, so the persisted state holds no
+fourth moments and grows with the rows, not with ``k^4``.
+"""
+import json
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .io import normalize_types
+from .panel import DEFAULT_SPECS, SAMPLES, FitSummary
+from .suffstats import SufficientStats
+from .synth import POLICY_DATE, price_matrix
+
+# linearmodels covariance names and their sufficient-statistics equivalents
+COV_TYPES = {'robust': 'HC1', 'unadjusted': 'nonrobust'}
+
+
+class PanelStore:
+    """Parquet store of panel rows with a JSON manifest.
+
+    Parameters
+    ----------
+    root : path
+        Directory holding the part files and ``manifest.json``.
+    keys : sequence of str
+        Columns identifying a row. A row whose key is already stored
+        replaces the stored row if its values differ and is skipped if they
+        are equal, so re-running a refresh is harmless.
+    date : str
+        Date column used to prune parts on read and on duplicate checks.
+    """
+
+    def __init__(self, root, keys=('Date', 'zone'), date='Date'):
+        self.root = Path(root)
+        self.keys = list(keys)
+        self.date = date
+        self.manifest_path = self.root / 'manifest.json'
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'keys': self.keys, 'date': date, 'parts': []}
+
+    def __len__(self):
+        return sum(part['rows'] for part in self.manifest['parts'])
+
+    @property
+    def last_date(self):
+        parts = self.manifest['parts']
+        return pd.Timestamp(max(part['last'] for part in parts)) if parts else None
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def read(self, columns=None, start=None, end=None):
+        """Stored rows with ``start <= date <= end`` (either bound optional)."""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        frames = []
+        for part in self.manifest['parts']:
+            if start is not None and pd.Timestamp(part['last']) < start:
+                continue
+            if end is not None and pd.Timestamp(part['first']) > end:
+                continue
+            frames.append(pd.read_parquet(self.root / part['file'], columns=columns))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = normalize_types(pd.concat(frames, ignore_index=True))
+        if start is not None:
+            df = df[df[self.date] >= start]
+        if end is not None:
+            df = df[df[self.date] <= end]
+        return df.reset_index(drop=True)
+
+    def _key_index(self, df):
+        return pd.MultiIndex.from_frame(df[self.keys].astype(object))
+
+    def changes(self, df):
+        """Rows of ``df`` that are new or differ from the stored row with their key.
+
+        Returns the rows and a boolean array marking revisions, the rows
+        whose key is already stored. Nothing is written.
+        """
+        df = normalize_types(df).drop_duplicates(self.keys, keep='last').reset_index(drop=True)
+        revised = np.zeros(len(df), dtype=bool)
+        if df.empty:
+            return df, revised
+        stored = self.read(start=df[self.date].min(), end=df[self.date].max())
+        if stored.empty:
+            return df, revised
+        position = self._key_index(stored).get_indexer(self._key_index(df))
+        revised = position >= 0
+        columns = [c for c in df.columns if c not in self.keys and c in stored.columns]
+        old = stored[columns].to_numpy(dtype=object)[position[revised]]
+        new = df.loc[revised, columns].to_numpy(dtype=object)
+        same = ((old == new) | (pd.isna(old) & pd.isna(new))).all(axis=1)
+        changed = ~revised
+        changed[revised] = ~same
+        return df[changed].reset_index(drop=True), revised[changed]
+
+    def _write_part(self, df):
+        """Write ``df`` to a new part file; returns its manifest entry."""
+        number = self.manifest.get('next_part', len(self.manifest['parts']))
+        self.manifest['next_part'] = number + 1
+        name = f"part-{number:05d}.parquet"
+        tmp_path = self.root / (name + '.tmp')
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.root / name)
+        return {
+            'file': name,
+            'rows': len(df),
+            'first': df[self.date].min().isoformat(),
+            'last': df[self.date].max().isoformat(),
+        }
+
+    def append(self, df):
+        """Store the new and revised rows of ``df`` (see :meth:`changes`); returns them.
+
+        Parts holding revised keys are rewritten without them under new
+        names. The manifest then switches to the new parts in one write,
+        and only after that are the old files removed, so an interrupted
+        append leaves the previous state intact.
+        """
+        rows, revised = self.changes(df)
+        if rows.empty:
+            return rows
+        self.root.mkdir(parents=True, exist_ok=True)
+        parts, obsolete = self.manifest['parts'], []
+        if revised.any():
+            keys = self._key_index(rows[revised])
+            first, last = rows.loc[revised, self.date].min(), rows.loc[revised, self.date].max()
+            kept = []
+            for part in parts:
+                if pd.Timestamp(part['last']) < first or pd.Timestamp(part['first']) > last:
+                    kept.append(part)
+                    continue
+                stored = normalize_types(pd.read_parquet(self.root / part['file']))
+                drop = self._key_index(stored).isin(keys)
+                if not drop.any():
+                    kept.append(part)
+                    continue
+                obsolete.append(part['file'])
+                if not drop.all():
+                    kept.append(self._write_part(stored[~drop]))
+            parts = kept
+        self.manifest['parts'] = parts + [self._write_part(rows)]
+        self._write_manifest()
+        for name in obsolete:
+            (self.root / name).unlink(missing_ok=True)
+        return rows
+
+
+class SyntheticRefresh:
+    """Gap series of a fitted synthetic control, extended with frozen weights.
+
+    Build it from the output of :func:`~ordc.synth.synthetic_control` (or
+    the simplex version), then pass each new day's peak panel to
+    :meth:`update`.
+    """
+
+    def __init__(self, result_df, weights, treated, post_start=POLICY_DATE):
+        self.result_df = result_df[['actual', 'synthetic', 'gap', 'post']].copy()
+        self.weights = weights
+        self.treated = treated
+        self.post_start = pd.Timestamp(post_start)
+        post_gaps = self.result_df.loc[self.result_df['post'], 'gap'].dropna()
+        self._post_sum = float(post_gaps.sum())
+        self._post_n = len(post_gaps)
+
+    @property
+    def avg_effect(self):
+        """Mean post-period gap, the ``avg_effect`` of Synthetic_control.py."""
+        return self._post_sum / self._post_n if self._post_n else float('nan')
+
+    @property
+    def zones(self):
+        """Donors and the treated zone, the zones every date needs."""
+        return list(self.weights.index) + [self.treated]
+
+    def update(self, df_peak):
+        """Add (or revise) dates from a daily peak panel; returns their rows.
+
+        Dates where the treated zone or any donor has no price, e.g. because
+        its ISO's file has not arrived yet, are skipped; pass all stored
+        zones of those dates again once it has (see ``daily_refresh.py``).
+        """
+        donors = list(self.weights.index)
+        matrix = price_matrix(df_peak).reindex(columns=self.zones).dropna()
+
+        rows = matrix[self.treated].to_frame(name='actual')
+        rows['synthetic'] = matrix[donors].to_numpy() @ self.weights.to_numpy()
+        rows['gap'] = rows['actual'] - rows['synthetic']
+        rows['post'] = rows.index >= self.post_start
+
+        # Take revised dates out of the running post-period mean first
+        revised = self.result_df.index.intersection(rows.index)
+        old = self.result_df.loc[revised]
+        old = old.loc[old['post'], 'gap'].dropna()
+        self._post_sum -= float(old.sum())
+        self._post_n -= len(old)
+        new = rows.loc[rows['post'], 'gap']
+        self._post_sum += float(new.sum())
+        self._post_n += len(new)
+
+        self.result_df = pd.concat([self.result_df.drop(revised), rows]).sort_index()
+        return rows
+
+    def check(self, store, value='avg_price'):
+        """Raise if the gap dates differ from the stored dates that have every zone priced."""
+        stored = store.read(columns=[store.date, 'zone', value]).dropna()
+        stored = stored[stored['zone'].isin(self.zones)]
+        counts = stored.groupby(store.date)['zone'].nunique()
+        complete = pd.DatetimeIndex(counts.index[counts == len(self.zones)])
+        missing = complete.difference(self.result_df.index)
+        extra = self.result_df.index.difference(complete)
+        if len(missing) or len(extra):
+            raise RuntimeError(f"Gap series out of step with the panel store: {len(missing)} "
+                               f"complete stored dates without a gap (first {missing[:3].tolist()}), "
+                               f"{len(extra)} gap dates not complete in the store "
+                               f"(first {extra[:3].tolist()})")
+
+    def save(self, root):
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        self.result_df.to_parquet(root / 'synthetic_gaps.parquet')
+        state = {'treated': self.treated, 'post_start': self.post_start.isoformat(),
+                 'weights': self.weights.to_dict()}
+        with open(root / 'synthetic_weights.json', 'w') as f:
+            json.dump(state, f, indent=2)
+
+    @classmethod
+    def load(cls, root):
+        root = Path(root)
+        with open(root / 'synthetic_weights.json') as f:
+            state = json.load(f)
+        return cls(pd.read_parquet(root / 'synthetic_gaps.parquet'), pd.Series(state['weights']),
+                   state['treated'], state['post_start'])
+
+
+def _dummy_name(column, level):
+    return f"C({column})[T.{level}]"
+
+
+class DidRefresh:
+    """Sufficient statistics for a set of ModelSpecs, updated row by row.
+
+    Parameters
+    ----------
+    specs : sequence of ModelSpec
+        Specifications to keep current; their samples and dependent
+        variables decide which accumulators exist.
+    key : sequence of str
+        Columns identifying a panel row. A row arriving with a stored key
+        replaces the stored one.
+    entity, period : str
+        Columns whose dummies stand in for the entity and time effects.
+    """
+
+    def __init__(self, specs=DEFAULT_SPECS, key=('zone', 'date'), entity='panel_id',
+                 period='date'):
+        self.specs = list(specs)
+        self.key = list(key)
+        self.entity = entity
+        self.period = period
+        self.regressors = list(dict.fromkeys(r for spec in self.specs for r in spec.regressors))
+        self.dependents = list(dict.fromkeys(spec.dependent for spec in self.specs))
+        self.samples = list(dict.fromkeys(spec.sample for spec in self.specs))
+        # Per sample: effect levels in order of appearance (the first is the reference)
+        self.levels = {s: {entity: [], period: []} for s in self.samples}
+        self.stats = {(s, dep): SufficientStats(['Intercept'] + self.regressors)
+                      for s in self.samples for dep in self.dependents}
+        self.rows = {s: None for s in self.samples}
+
+    def _columns(self):
+        return list(dict.fromkeys(self.key + [self.entity, self.period]
+                                  + self.regressors + self.dependents))
+
+    def _design(self, sample, rows):
+        """Design matrix in the accumulator's column order (new levels added first)."""
+        levels = self.levels[sample]
+        added = []
+        for col in (self.entity, self.period):
+            for level in rows[col].drop_duplicates():
+                if level not in levels[col]:
+                    levels[col].append(level)
+                    if len(levels[col]) > 1:
+                        added.append(_dummy_name(col, level))
+        if added:
+            for dep in self.dependents:
+                self.stats[sample, dep].extend(added)
+
+        names = self.stats[sample, self.dependents[0]].columns
+        position = {name: j for j, name in enumerate(names)}
+        X = np.zeros((len(rows), len(names)))
+        X[:, 0] = 1.0
+        for col in (self.entity, self.period):
+            # Accumulator column of each level's dummy (-1 for the reference)
+            target = np.array([-1] + [position[_dummy_name(col, v)] for v in levels[col][1:]])
+            codes = pd.Index(levels[col]).get_indexer(rows[col])
+            columns = target[codes]
+            hit = columns >= 0
+            X[np.flatnonzero(hit), columns[hit]] = 1.0
+        for name in self.regressors:
+            X[:, position[name]] = rows[name].to_numpy(dtype=np.float64)
+        return X
+
+    def _add(self, sample, rows, sign):
+        X = self._design(sample, rows)
+        counts = np.full(len(rows), float(sign))
+        for dep in self.dependents:
+            y = rows[dep].to_numpy(dtype=np.float64)
+            self.stats[sample, dep].update_cells(X, counts, sign * y, sign * y * y)
+
+    def _hc_meat(self, sample, dependent, idx, params):
+        """``sum e_i^2 x_i x_i'`` over the stored rows of ``sample`` for the columns ``idx``."""
+        rows = self.rows[sample]
+        X = self._design(sample, rows)[:, idx]
+        scores = X * (rows[dependent].to_numpy(dtype=np.float64) - X @ params)[:, None]
+        return scores.T @ scores
+
+    def update(self, panel):
+        """Add prepared panel rows (see :func:`~ordc.panel.prepare_panel`).
+
+        Rows whose key is already stored are revisions: the stored row is
+        removed from the statistics and the new one added.
+        """
+        panel = panel[self._columns()].drop_duplicates(self.key, keep='last')
+        for sample in self.samples:
+            zones = SAMPLES[sample]
+            rows = panel if zones is None else panel[panel['zone'].isin(zones)]
+            if rows.empty:
+                continue
+            rows = rows.set_index(self.key, drop=False)
+            stored = self.rows[sample]
+            if stored is not None:
+                revised = stored.index.intersection(rows.index)
+                if len(revised):
+                    self._add(sample, stored.loc[revised], -1)
+                    stored = stored.drop(revised)
+                self.rows[sample] = pd.concat([stored, rows])
+            else:
+                self.rows[sample] = rows
+            self._add(sample, rows, 1)
+        return self
+
+    def fit(self, spec):
+        """Fit one ModelSpec from the current statistics; returns a FitSummary.
+
+        The results are reported the way PanelOLS reports them. The dummy
+        coefficients are not shown. ``const`` is the intercept of the
+        within regression with means added back, ``ybar - xbar'b``. For
+        specs with effects, R-squared is the within R-squared.
+        """
+        from scipy import stats
+
+        if spec.cov_type not in COV_TYPES:
+            raise ValueError(f"Unsupported cov_type {spec.cov_type!r}; "
+                             f"use one of {sorted(COV_TYPES)}")
+        suff = self.stats[spec.sample, spec.dependent]
+        levels = self.levels[spec.sample]
+        effects = ['Intercept']
+        if spec.entity_effects:
+            effects += [_dummy_name(self.entity, v) for v in levels[self.entity][1:]]
+        if spec.time_effects:
+            effects += [_dummy_name(self.period, v) for v in levels[self.period][1:]]
+        regressors = list(spec.regressors)
+        idx = [suff.columns.index(name) for name in effects + regressors]
+        d, k, n = len(effects), len(regressors), suff.nobs
+
+        # LSDV fit on the effect dummies and regressors
+        xtx = suff.xtx[np.ix_(idx, idx)]
+        xty = suff.xty[idx]
+        params = np.linalg.solve(xtx, xty)
+        ssr = suff.yty - 2 * params @ xty + params @ xtx @ params
+        # Residual variation after the effects alone (the within TSS)
+        base = np.linalg.solve(xtx[:d, :d], xty[:d])
+        tss = suff.yty - base @ xty[:d]
+
+        # Rows of the PanelOLS design [1, x_demeaned + xbar] as linear maps of
+        # the LSDV rows: x_demeaned = x - D gamma, xbar from the Intercept row
+        gamma = np.linalg.solve(xtx[:d, :d], xtx[:d, d:])
+        xbar = xtx[0, d:] / n
+        C = np.zeros((k + 1, d + k))
+        C[0, 0] = 1.0
+        C[1:, :d] = -gamma.T
+        C[1:, d:] = np.eye(k)
+        C[1:, 0] += xbar
+        zzi = np.linalg.inv(C @ xtx @ C.T)
+
+        df_resid = n - d - k
+        if spec.cov_type == 'unadjusted':
+            cov = zzi * ssr / df_resid
+        else:
+            meat = C @ self._hc_meat(spec.sample, spec.dependent, idx, params) @ C.T
+            cov = zzi @ (n / df_resid * meat) @ zzi
+
+        names = ['const'] + regressors
+        beta = params[d:]
+        coefs = np.concatenate([[suff.ysum / n - xbar @ beta], beta])
+        std_errors = np.sqrt(np.diag(cov))
+        pvalues = 2 * stats.t.sf(np.abs(coefs / std_errors), df_resid)
+        return FitSummary(pd.Series(coefs, names, name='parameter'),
+                          pd.Series(std_errors, names, name='std_error'),
+                          pd.Series(pvalues, names, name='pvalue'),
+                          float(1 - ssr / tss), int(round(n)))
+
+    def fit_all(self):
+        """``{name: FitSummary}`` for every spec, in order."""
+        return {spec.name: self.fit(spec) for spec in self.specs}
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,86 @@
+"""Parallel, cached, headless rendering of report figures.
+
+A figure is a filename, a module-level draw function ``draw(path, **data)``
+and the precomputed data it plots (see :func:`~ordc.reporting.report_figures`).
+:func:`render_figures` hashes each figure's draw function and data. Figures
+whose hash matches the one recorded in the output folder's
+``.figures.json``, and whose file still exists, are skipped. The remaining
+figures are drawn in a process pool on the Agg backend, so nothing ever
+opens a window and batch jobs never block on ``plt.show()``.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+MANIFEST = '.figures.json'
+
+
+def use_agg():
+    """Select the non-interactive Agg backend unless pyplot is already in use."""
+    if 'matplotlib.pyplot' not in sys.modules:
+        import matplotlib
+
+        matplotlib.use('Agg')
+
+
+def figure_hash(draw, data):
+    """SHA-256 of a draw function's qualified name and its pickled data."""
+    digest = hashlib.sha256(f"{draw.__module__}.{draw.__qualname__}".encode())
+    digest.update(pickle.dumps(data, protocol=4))
+    return digest.hexdigest()
+
+
+def _render(draw, path, data):
+    draw(path, **data)
+    return path
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def render_figures(results_dir, figures, max_workers=None, force=False):
+    """Draw the figures whose data changed; returns the filenames drawn.
+
+    ``figures`` maps filenames (relative to ``results_dir``) to
+    ``(draw, data)`` pairs. Set ``force`` to redraw everything, and
+    ``max_workers=1`` to draw in this process. Scripts that use the process
+    pool need an ``if __name__ == '__main__'`` guard on platforms that
+    spawn workers.
+    """
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = results_dir / MANIFEST
+    manifest = {} if force else _read_manifest(manifest_path)
+
+    hashes = {name: figure_hash(draw, data) for name, (draw, data) in figures.items()}
+    stale = [name for name in figures
+             if manifest.get(name) != hashes[name] or not (results_dir / name).exists()]
+
+    workers = min(len(stale), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        use_agg()
+        for name in stale:
+            draw, data = figures[name]
+            _render(draw, results_dir / name, data)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=use_agg) as pool:
+            futures = [pool.submit(_render, figures[name][0], results_dir / name, figures[name][1])
+                       for name in stale]
+            for future in futures:
+                future.result()
+
+    manifest.update({name: hashes[name] for name in stale})
+    tmp_path = manifest_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return stale
@@ -0,0 +1,461 @@
+"""Text reports and figures for the panel regression and synthetic control analyses.
+
+Each figure is a ``draw_*`` function that takes the output path and
+precomputed plot data, so figures can be drawn in worker processes and
+skipped when their data is unchanged (see :mod:`ordc.render`). matplotlib
+and seaborn are imported on first use, so importing this module (or the
+rest of the package) does not pull in the plotting stack.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .panel import compare_models, group_counts
+from .profiling import stage
+
+CONTROL_VARS = ['load', 'natural_gas_price', 'weather']
+PANEL_FILE = "panel_data.parquet"
+
+_STYLE_SET = False
+
+
+def pyplot():
+    """Import pyplot and apply the project's plot style once per process."""
+    global _STYLE_SET
+    import matplotlib.pyplot as plt
+
+    if not _STYLE_SET:
+        import seaborn as sns
+
+        plt.style.use('seaborn-v0_8-whitegrid')
+        sns.set_palette("deep")
+        plt.rcParams['font.family'] = 'serif'
+        plt.rcParams['font.serif'] = ['Times New Roman']
+        plt.rcParams['font.size'] = 11
+        plt.rcParams['axes.labelsize'] = 12
+        plt.rcParams['axes.titlesize'] = 14
+        plt.rcParams['xtick.labelsize'] = 10
+        plt.rcParams['ytick.labelsize'] = 10
+        _STYLE_SET = True
+    return plt
+
+
+def treatment_date(panel):
+    return panel.loc[panel['post'] == 1, 'date'].min()
+
+
+def write_panel_data(results_dir, panel):
+    """Save the prepared panel as one compact Parquet file, ``panel_data.parquet``.
+
+    Only the keys (``zone``, ``month``) and the model inputs are stored;
+    :func:`read_panel_data` rebuilds the identifiers and derived variables
+    from them. The Zone F vs Zone C sample is ``CompactPanel.mask('fc')``
+    on the same file, not a second copy.
+    """
+    from .compact import CompactPanel
+
+    columns = ['treated', 'post', 'avg_price'] + CONTROL_VARS
+    CompactPanel.from_frame(panel, time='month', columns=columns).to_parquet(
+        Path(results_dir) / PANEL_FILE)
+
+
+def read_panel_data(results_dir, sample=None):
+    """Prepared panel (or one named sample) from ``panel_data.parquet``.
+
+    Values come back from their ``float32`` storage, so they match the
+    panel that was written to about seven significant digits.
+    """
+    from .compact import CompactPanel
+    from .panel import prepare_panel
+
+    compact = CompactPanel.read_parquet(Path(results_dir) / PANEL_FILE, time='month')
+    return prepare_panel(compact.to_frame(mask=compact.mask(sample)))
+
+
+def write_regression_results(path, results):
+    with open(path, "w") as f:
+        f.write("DIFFERENCE-IN-DIFFERENCES ANALYSIS WITH PANEL REGRESSION\n")
+        f.write("="*80 + "\n\n")
+
+        for name, result in results.items():
+            f.write(f"{name} MODEL\n")
+            f.write("-"*80 + "\n")
+            f.write(str(result))
+            f.write("\n\n")
+
+
+def coefficient_summary(results, term='did'):
+    """One row per model: the DiD term's estimate, SE, p-value and 95% interval.
+
+    Models without the term report their last parameter, as in
+    :func:`~ordc.panel.compare_models`.
+    """
+    rows = []
+    for name, result in results.items():
+        variable = term if term in result.params.index else result.params.index[-1]
+        coef, se = result.params[variable], result.std_errors[variable]
+        rows.append({
+            'Model': name,
+            'Variable': variable,
+            'Coefficient': round(coef, 4),
+            'Std Error': round(se, 4),
+            'P-value': round(result.pvalues[variable], 6),
+            'CI': f"[{coef - 1.96 * se:.4f}, {coef + 1.96 * se:.4f}]",
+            'Significant': bool(result.pvalues[variable] < 0.05),
+        })
+    return pd.DataFrame(rows)
+
+
+def r2_components(results):
+    """Within, between and overall R-squared of each model (NaN where not reported)."""
+    return pd.DataFrame({
+        'Model': list(results),
+        'R² within': [getattr(r, 'rsquared_within', np.nan) for r in results.values()],
+        'R² between': [getattr(r, 'rsquared_between', np.nan) for r in results.values()],
+        'R² overall': [getattr(r, 'rsquared_overall', np.nan) for r in results.values()],
+    }).round(4)
+
+
+def write_fit_summary(path, title, summary, note=None):
+    """Write one FitSummary as a coefficient table (estimate, SE, test, 95% interval)."""
+    table = pd.DataFrame({
+        'coef': summary.params,
+        'std err': summary.std_errors,
+        'z': summary.params / summary.std_errors,
+        'P>|z|': summary.pvalues,
+        '[0.025': summary.params - 1.96 * summary.std_errors,
+        '0.975]': summary.params + 1.96 * summary.std_errors,
+    })
+    with open(path, "w") as f:
+        f.write(f"{title}\n")
+        f.write("="*80 + "\n\n")
+        f.write(f"No. Observations: {summary.nobs}\n")
+        f.write(f"R-squared: {summary.rsquared:.4f}\n\n")
+        f.write(table.to_string(float_format=lambda v: f"{v:.4f}"))
+        f.write("\n")
+        if note:
+            f.write(f"\nNOTE: {note}\n")
+
+
+def draw_did_coefficients(path, comparison):
+    """Horizontal bars of the DiD coefficient, grey where not significant."""
+    plt = pyplot()
+    plt.figure(figsize=(12, 8))
+    colors = ['blue' if sig else 'gray' for sig in comparison['Significant']]
+    y_pos = np.arange(len(comparison))
+
+    plt.barh(y_pos, comparison['DiD Coefficient'], color=colors, alpha=0.7)
+    plt.axvline(x=0, color='red', linestyle='--', alpha=0.7)
+    plt.yticks(y_pos, comparison['Model'])
+    plt.xlabel('DiD Coefficient Estimate')
+    plt.title('DiD Coefficient Comparison Across Panel Models')
+    plt.grid(axis='x', alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def draw_event_study(path, coefficients, reference, pretrend_stat, pretrend_pvalue):
+    """Event-time coefficients with 95% intervals around the policy start."""
+    plt = pyplot()
+    plt.figure(figsize=(12, 6))
+    plt.errorbar(coefficients.index, coefficients['coef'],
+                 yerr=1.96 * coefficients['std_error'].fillna(0),
+                 fmt='o-', color='blue', ecolor='gray', capsize=3, label='Zone F vs control')
+    plt.axhline(y=0, color='red', linestyle='--', alpha=0.7)
+    plt.axvline(x=-0.5, color='green', linestyle='--', linewidth=2, label='Treatment Date')
+    plt.title(f'Event Study (reference period {reference}, '
+              f'pre-trend F = {pretrend_stat:.2f}, p = {pretrend_pvalue:.3f})')
+    plt.xlabel('Periods Relative to Treatment')
+    plt.ylabel('Coefficient')
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def draw_trends(path, lines, title, ylabel, treatment_date, date_color='green'):
+    """Monthly series, one per ``(label, style, series)`` in ``lines``, with the treatment date."""
+    plt = pyplot()
+    plt.figure(figsize=(12, 6))
+    for label, style, marker, series in lines:
+        plt.plot(series.index, series.to_numpy(), style, label=label, marker=marker)
+    plt.axvline(x=treatment_date, color=date_color, linestyle='--',
+                linewidth=2, label='Treatment Date')
+    plt.title(title)
+    plt.xlabel('Month')
+    plt.ylabel(ylabel)
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def monthly_cells(panel, columns=('avg_price',) + tuple(CONTROL_VARS)):
+    """Per month, zone and group: row counts and column sums, from one groupby.
+
+    Every monthly mean plotted (by group, by zone, or overall) is a ratio
+    of sums over these few cells, so the panel is grouped only once.
+    """
+    data = panel.assign(month=panel['date'].dt.to_period('M').dt.to_timestamp())
+    grouped = data.groupby(['month', 'zone', 'treated'], observed=True)
+    cells = grouped[list(columns)].sum()
+    cells['count'] = grouped.size()
+    return cells.reset_index()
+
+
+def _mean_by(cells, value, by=None):
+    """Monthly mean of ``value``; per ``by`` group as ``{group: Series}`` when given."""
+    keys = ['month'] if by is None else ['month', by]
+    sums = cells.groupby(keys, observed=True)[[value, 'count']].sum()
+    means = (sums[value] / sums['count']).sort_index()
+    if by is None:
+        return means
+    return {key: group.droplevel(by) for key, group in means.groupby(level=by)}
+
+
+def trend_figures(panel, cells=None):
+    """``{filename: (draw function, data)}`` for the price and control trend figures."""
+    cells = monthly_cells(panel) if cells is None else cells
+    date = treatment_date(panel)
+    by_group = _mean_by(cells, 'avg_price', 'treated')
+    by_zone = _mean_by(cells, 'avg_price', 'zone')
+    figures = {
+        "price_trends.png": (draw_trends, {
+            'lines': [('Treatment (Zone F)', 'b-', 'o', by_group.get(1, pd.Series(dtype=float))),
+                      ('Control', 'r-', 's', by_group.get(0, pd.Series(dtype=float)))],
+            'title': 'Average Price by Group Over Time', 'ylabel': 'Average Price',
+            'treatment_date': date}),
+        "price_trends_F_vs_C.png": (draw_trends, {
+            'lines': [('Zone F', 'b-', 'o', by_zone.get('Zone F', pd.Series(dtype=float))),
+                      ('Zone C', 'g-', 's', by_zone.get('Zone C', pd.Series(dtype=float)))],
+            'title': 'Average Price: Zone F vs Zone C', 'ylabel': 'Average Price',
+            'treatment_date': date, 'date_color': 'red'}),
+    }
+    for control_var in CONTROL_VARS:
+        label = control_var.replace("_", " ")
+        figures[f"{control_var}_trend.png"] = (draw_trends, {
+            'lines': [(None, 'b-', 'o', _mean_by(cells, control_var))],
+            'title': f'{label} Over Time', 'ylabel': label, 'treatment_date': date})
+    return figures
+
+
+def event_study_figure(result):
+    """Draw function and data for the event-study coefficient plot."""
+    return draw_event_study, {
+        'coefficients': result.coefficients[['coef', 'std_error']],
+        'reference': result.reference,
+        'pretrend_stat': result.pretrend_stat,
+        'pretrend_pvalue': result.pretrend_pvalue,
+    }
+
+
+def report_figures(panel, comparison, event_study=None):
+    """Every figure of the panel analysis as ``{filename: (draw function, data)}``."""
+    figures = {"did_coefficient_comparison.png": (draw_did_coefficients, {
+        'comparison': comparison[['Model', 'DiD Coefficient', 'Significant']]})}
+    figures.update(trend_figures(panel))
+    if event_study is not None:
+        figures["event_study.png"] = event_study_figure(event_study)
+    return figures
+
+
+def plot_event_study(result, path):
+    draw, data = event_study_figure(result)
+    draw(path, **data)
+
+
+def draw_synthetic_fit(path, result_df, policy_date):
+    """Actual against synthetic peak price of the treated zone."""
+    plt = pyplot()
+    plt.figure(figsize=(12, 6))
+    plt.plot(result_df.index, result_df['actual'], label="Actual (Treated Zone)", linewidth=2)
+    plt.plot(result_df.index, result_df['synthetic'], label="Synthetic Control", linestyle='--', linewidth=2)
+    plt.axvline(x=policy_date, color='gray', linestyle=':', label='Policy Start (May 2022)')
+    plt.title("Synthetic Control (Peak Hours 16–19 Avg Price)")
+    plt.ylabel("DA_LMP ($/MWh)")
+    plt.xlabel("Date")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def draw_treatment_gap(path, result_df, policy_date):
+    """Actual minus synthetic price of the treated zone."""
+    plt = pyplot()
+    plt.figure(figsize=(12, 5))
+    plt.plot(result_df.index, result_df['gap'], label='Treatment Effect (Actual - Synthetic)', color='crimson')
+    plt.axvline(x=policy_date, color='gray', linestyle=':', label='Policy Start')
+    plt.axhline(0, color='black', linestyle='--')
+    plt.title('Estimated Treatment Effect on DA_LMP (Peak Hours)')
+    plt.xlabel('Date')
+    plt.ylabel('Price Gap ($/MWh)')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+def synthetic_control_figures(result_df, policy_date):
+    """The synthetic control figures as ``{filename: (draw function, data)}``."""
+    data = {'result_df': result_df[['actual', 'synthetic', 'gap']], 'policy_date': policy_date}
+    return {
+        "synthetic_control_fit.png": (draw_synthetic_fit, data),
+        "synthetic_control_gap.png": (draw_treatment_gap, data),
+    }
+
+
+def draw_rolling_effects(path, effects, policy_date):
+    """Rolling and expanding treatment effects with their confidence bands, one panel per estimate."""
+    plt = pyplot()
+    estimates = list(dict.fromkeys(effects['estimate']))
+    fig, axes = plt.subplots(len(estimates), 1, figsize=(12, 4 * len(estimates)), sharex=True,
+                             squeeze=False)
+    for ax, estimate in zip(axes[:, 0], estimates):
+        rows = effects[effects['estimate'] == estimate]
+        for window, line in rows.groupby('window', sort=False):
+            ax.plot(line.index, line['effect'], label=window)
+            ax.fill_between(line.index, line['lower'], line['upper'], alpha=0.2)
+        ax.axvline(x=policy_date, color='gray', linestyle=':', label='Policy Start')
+        ax.axhline(0, color='black', linestyle='--')
+        ax.set_title(f'{estimate} by Window')
+        ax.set_ylabel('Effect ($/MWh)')
+        ax.legend()
+        ax.grid(True)
+    axes[-1, 0].set_xlabel('Date')
+    fig.tight_layout()
+    fig.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+
+def rolling_effects_figure(effects, policy_date):
+    """The rolling effects figure as ``{filename: (draw function, data)}``."""
+    data = {'effects': effects[['estimate', 'window', 'effect', 'lower', 'upper']],
+            'policy_date': policy_date}
+    return {"rolling_effects.png": (draw_rolling_effects, data)}
+
+
+def _coefficient(comparison, model):
+    rows = comparison.loc[comparison['Model'] == model, 'DiD Coefficient']
+    return rows.iloc[0] if len(rows) else None
+
+
+def write_summary(path, panel, comparison):
+    """Write panel_analysis_summary.txt: sample sizes, comparison and interpretation."""
+    counts = group_counts(panel)
+    with open(path, "w") as f:
+        f.write("NYISO DIFFERENCE-IN-DIFFERENCES ANALYSIS WITH PANEL REGRESSION\n")
+        f.write("="*50 + "\n\n")
+        f.write(f"Total observations: {len(panel)}\n")
+        f.write("Control variables: load, natural gas price, weather\n")
+        f.write("Treatment group: Zone F\n")
+        f.write("Control group for full models: Zone NE and Zone C\n")
+        f.write("Additional models comparing Zone F vs Zone C only\n")
+        f.write(f"Post-treatment period begins: {treatment_date(panel)}\n\n")
+
+        f.write("GROUP SIZES\n")
+        f.write("-"*50 + "\n")
+        f.write(f"Pre-treatment, Control: {counts['pre_control']}\n")
+        f.write(f"Pre-treatment, Treatment (Zone F): {counts['pre_treatment']}\n")
+        f.write(f"Post-treatment, Control: {counts['post_control']}\n")
+        f.write(f"Post-treatment, Treatment (Zone F): {counts['post_treatment']}\n\n")
+
+        f.write("MODEL COMPARISON\n")
+        f.write("-"*50 + "\n")
+        f.write(comparison.to_string(index=False))
+        f.write("\n\n")
+
+        f.write("INTERPRETATION\n")
+        f.write("-"*50 + "\n")
+        best = comparison.loc[comparison['R-squared'].idxmax()]
+        f.write(f"Best-fitting model based on R-squared: {best['Model']} (R² = {best['R-squared']:.4f})\n\n")
+
+        f.write(f"DiD coefficient in best model: {best['DiD Coefficient']:.4f}\n")
+        f.write(f"P-value: {best['P-value']:.4f}\n\n")
+
+        if best['P-value'] < 0.05:
+            f.write("The DiD coefficient is statistically significant (p < 0.05).\n")
+            if best['DiD Coefficient'] > 0:
+                f.write("This suggests that the policy change led to a significant price increase in Zone F relative to the control zones.\n")
+            else:
+                f.write("This suggests that the policy change led to a significant price decrease in Zone F relative to the control zones.\n")
+        else:
+            f.write("The DiD coefficient is not statistically significant (p >= 0.05).\n")
+            f.write("This suggests no significant difference in how the policy change affected Zone F compared to the control zones.\n")
+
+        f.write("\nKEY FINDINGS\n")
+        f.write("-"*50 + "\n")
+        f.write("1. Panel regression with two-way fixed effects provides a robust estimation of the policy effect\n")
+        f.write("2. Including both entity and time fixed effects controls for unobserved heterogeneity\n")
+        f.write("3. The most reliable models are those with two-way fixed effects and controls\n")
+
+        # Compare results from different model groups, where both models were fitted
+        f.write("\nCOMPARISON OF DIFFERENT MODEL SPECIFICATIONS\n")
+        f.write("-"*50 + "\n")
+        pooled = _coefficient(comparison, "Pooled OLS")
+        two_way = _coefficient(comparison, "Two-way FE")
+        two_way_ctrls = _coefficient(comparison, "Two-way FE with Controls")
+        fc_ctrls = _coefficient(comparison, "F vs C Two-way FE with Controls")
+        log_ctrls = _coefficient(comparison, "Log Two-way FE with Controls")
+
+        if pooled is not None and two_way is not None:
+            f.write("Pooled vs Fixed Effects: ")
+            if abs(pooled - two_way) > 5:
+                f.write("Large differences between pooled and FE models suggest important unobserved heterogeneity\n")
+            else:
+                f.write("Similar results between pooled and FE models suggest limited unobserved heterogeneity\n")
+
+        if two_way_ctrls is not None and fc_ctrls is not None:
+            f.write("\nAll zones vs F-C only: ")
+            if abs(two_way_ctrls - fc_ctrls) > 5:
+                f.write("Different results when using only Zone C as control suggest heterogeneous policy effects\n")
+            else:
+                f.write("Similar results regardless of control group composition suggest robust policy effects\n")
+
+        if two_way_ctrls is not None and log_ctrls is not None:
+            f.write("\nLog vs Linear models: ")
+            if (two_way_ctrls > 0 and log_ctrls < 0) or (two_way_ctrls < 0 and log_ctrls > 0):
+                f.write("Log and linear models show different signs, suggesting sensitivity to extreme values\n")
+            else:
+                f.write("Log and linear models show consistent direction, suggesting robust results\n")
+
+
+def write_reports(results_dir, panel, results, comparison=None, plots=True, event_study=None,
+                  max_workers=None):
+    """Write every text report and figure of the panel analysis to ``results_dir``.
+
+    ``results`` maps model names to fitted results (e.g. the fits of a
+    :class:`~ordc.store.ResultsStore` run). Besides the text report, the DiD
+    coefficients and the R-squared components are written to
+    ``panel_coefficient_summary.csv`` and ``r2_components.csv``. The
+    comparison table is built from the results unless passed in. Figures (including the event-study plot
+    when ``event_study`` is given) are drawn in parallel by
+    :func:`~ordc.render.render_figures`, which skips those whose data did not
+    change. Set ``plots=False`` to skip the figures.
+    """
+    from .render import render_figures
+
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    if comparison is None:
+        comparison = compare_models(results)
+
+    with stage('regression_text'):
+        write_regression_results(results_dir / "panel_regression_results.txt", results)
+        coefficient_summary(results).to_csv(results_dir / "panel_coefficient_summary.csv",
+                                            index=False)
+        r2_components(results).to_csv(results_dir / "r2_components.csv", index=False)
+    if plots:
+        with stage('figures') as figures:
+            drawn = render_figures(results_dir, report_figures(panel, comparison, event_study),
+                                   max_workers=max_workers)
+            figures.rows = len(drawn)
+    with stage('summary'):
+        write_summary(results_dir / "panel_analysis_summary.txt", panel, comparison)
+    return comparison
@@ -0,0 +1,205 @@
+"""Rolling- and expanding-window treatment effects from prefix sums.
+
+``avg_effect`` in the synthetic control script is one mean over the whole
+post period. Here the same quantities are tracked through time, stepped
+daily:
+
+* :func:`rolling_gap`: the mean synthetic control gap over a trailing
+  window (e.g. 30 or 90 days) or over an expanding window from the policy
+  date. Given the placebo gaps as well, each window also gets an in-space
+  placebo p-value;
+* :func:`rolling_did`: the DiD of the treated zone against the mean of
+  the control zones, for the window against the pre-period before it. On
+  a balanced panel this equals the two-way FE DiD coefficient estimated on
+  those dates;
+* :func:`seasonal_gap`: the post-period gap by month or season.
+
+All windows come from one pass of prefix sums (:class:`SeriesSums`) of
+the series, its squares and its lagged cross-products. Any window's mean
+and Newey-West standard error then costs O(lags) whatever its length, and
+the bands come from the same sums as the estimates.
+"""
+import numpy as np
+import pandas as pd
+
+from .synth import POLICY_DATE, price_matrix, treated_zones
+
+DEFAULT_LAGS = 7
+SEASONS = {12: 'Winter', 1: 'Winter', 2: 'Winter', 3: 'Spring', 4: 'Spring', 5: 'Spring',
+           6: 'Summer', 7: 'Summer', 8: 'Summer', 9: 'Fall', 10: 'Fall', 11: 'Fall'}
+
+
+def _prefix(values):
+    """Cumulative sums along the first axis with a leading zero row."""
+    out = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+
+def window_bounds(dates, window=None, start=None):
+    """Row bounds ``[lo, hi)`` of the window ending at each of the sorted ``dates``.
+
+    ``window`` is a length such as ``'90D'`` (or a number of days) for a
+    trailing window, or None for an expanding window from ``start`` (the
+    first date by default). Windows ending before ``start`` are empty.
+    """
+    dates = pd.DatetimeIndex(dates)
+    hi = np.arange(1, len(dates) + 1)
+    if window is None:
+        first = 0 if start is None else dates.searchsorted(pd.Timestamp(start))
+        lo = np.full(len(dates), first)
+    else:
+        length = pd.Timedelta(days=window) if np.isscalar(window) and not isinstance(window, str) \
+            else pd.Timedelta(window)
+        lo = dates.searchsorted(dates - length, side='right')
+    return lo, np.maximum(lo, hi)
+
+
+class SeriesSums:
+    """Prefix sums of one or more daily series for window means with Newey-West SEs.
+
+    Each column is centred on its overall mean before summing, which keeps
+    the differences of large prefix sums accurate. Missing values are left
+    out of every sum.
+    """
+
+    def __init__(self, values, lags=DEFAULT_LAGS):
+        x = np.asarray(values, dtype=np.float64)
+        x = x.reshape(len(x), -1)
+        observed = ~np.isnan(x)
+        x = np.where(observed, x, 0.0)
+        self.center = x.sum(axis=0) / np.maximum(observed.sum(axis=0), 1)
+        x = np.where(observed, x - self.center, 0.0)
+        self.lags = lags
+        self.n = _prefix(observed.astype(np.float64))
+        self.s = _prefix(x)
+        self.ss = _prefix(x * x)
+        # Lag l: products x_t x_{t-l} and the terms needed to centre them, indexed by t
+        self.lagged = []
+        for lag in range(1, lags + 1):
+            pair = np.zeros_like(observed)
+            pair[lag:] = observed[lag:] & observed[:-lag]
+            current = np.zeros_like(x)
+            previous = np.zeros_like(x)
+            current[lag:] = np.where(pair[lag:], x[lag:], 0.0)
+            previous[lag:] = np.where(pair[lag:], x[:-lag], 0.0)
+            self.lagged.append((_prefix(current * previous), _prefix(current), _prefix(previous),
+                                _prefix(pair.astype(np.float64))))
+
+    def mean(self, lo, hi):
+        """Mean, Newey-West standard error and count over rows ``[lo, hi)`` of each window.
+
+        ``lo`` and ``hi`` are arrays with one entry per window; the results
+        have one row per window and one column per series.
+        """
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        n = self.n[hi] - self.n[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            m = (self.s[hi] - self.s[lo]) / n
+            var = (self.ss[hi] - self.ss[lo]) / n - m * m
+            long_run = var.copy()
+            for lag, (cross, current, previous, pairs) in enumerate(self.lagged, start=1):
+                first = np.minimum(lo + lag, hi)
+                gamma = ((cross[hi] - cross[first]) - m * ((current[hi] - current[first])
+                                                           + (previous[hi] - previous[first]))
+                         + m * m * (pairs[hi] - pairs[first])) / n
+                long_run += 2 * (1 - lag / (self.lags + 1)) * gamma
+            # Bartlett weights keep the estimate non-negative up to rounding
+            long_run = np.where(long_run > 0, long_run, np.maximum(var, 0.0))
+            se = np.sqrt(long_run / n)
+        return m + self.center, se, n
+
+
+def _band(frame, level):
+    from scipy import stats
+
+    z = stats.norm.ppf(0.5 + level / 2)
+    frame['lower'] = frame['effect'] - z * frame['std_error']
+    frame['upper'] = frame['effect'] + z * frame['std_error']
+    return frame
+
+
+def rolling_gap(gaps, window='90D', start=POLICY_DATE, treated=None, lags=DEFAULT_LAGS,
+                level=0.95, min_periods=7):
+    """Mean synthetic control gap over a window ending at each date.
+
+    ``gaps`` is the gap Series of the treated zone (``result_df['gap']``)
+    or a date x zone DataFrame of gaps such as ``PlaceboResult.gaps`` with
+    ``treated`` naming the treated column. ``window=None`` gives the
+    expanding mean from ``start``; trailing windows cover every date, so
+    pre-period windows show the fit error. Returns ``effect``,
+    ``std_error`` (Newey-West with ``lags``), the ``level`` band and
+    ``n_days``. With placebos it also returns ``placebo_pvalue``: the share
+    of units (placebos plus the treated zone) whose window mean is at least
+    as large in absolute value.
+    """
+    gaps = gaps.sort_index()
+    frame_input = isinstance(gaps, pd.DataFrame)
+    if frame_input and treated is None:
+        raise ValueError("Name the treated column of the gap DataFrame")
+    values = gaps.to_numpy(dtype=np.float64)
+    lo, hi = window_bounds(gaps.index, window, start)
+    mean, se, n = SeriesSums(values, lags).mean(lo, hi)
+
+    column = list(gaps.columns).index(treated) if frame_input else 0
+    out = pd.DataFrame({'effect': mean[:, column], 'std_error': se[:, column],
+                        'n_days': n[:, column].astype(np.int64)}, index=gaps.index)
+    if frame_input and values.shape[1] > 1:
+        placebos = np.delete(mean, column, axis=1)
+        at_least = (np.abs(placebos) >= np.abs(mean[:, [column]])).sum(axis=1)
+        out['placebo_pvalue'] = (at_least + 1) / (placebos.shape[1] + 1)
+    out = _band(out, level)
+    return out[out['n_days'] >= min_periods]
+
+
+def treated_difference(df_peak, treated, controls=None, value='avg_price'):
+    """Daily price of the treated zone minus the mean of the control zones."""
+    matrix = price_matrix(df_peak, value)
+    if controls is None:
+        treated_set = set(treated_zones(df_peak))
+        controls = [zone for zone in matrix.columns if zone not in treated_set]
+    return matrix[treated] - matrix[list(controls)].mean(axis=1)
+
+
+def rolling_did(df_peak, treated, window='90D', post_start=POLICY_DATE, controls=None,
+                value='avg_price', lags=DEFAULT_LAGS, level=0.95, min_periods=7):
+    """DiD of ``treated`` against the control mean for a window ending at each date.
+
+    The window's mean treated-minus-control difference is compared with its
+    mean over the pre-period days before the window. For windows after the
+    policy that is the whole pre-period; for earlier windows it makes the
+    series a rolling pre-trend check. ``window=None`` gives the expanding
+    estimate from ``post_start``. The standard error adds the Newey-West
+    variances of the two means.
+    """
+    difference = treated_difference(df_peak, treated, controls, value).sort_index()
+    dates = difference.index
+    sums = SeriesSums(difference.to_numpy(), lags)
+    lo, hi = window_bounds(dates, window, post_start)
+    n_pre = dates.searchsorted(pd.Timestamp(post_start))
+    base_hi = np.minimum(lo, n_pre)
+
+    window_mean, window_se, n_window = (a[:, 0] for a in sums.mean(lo, hi))
+    base_mean, base_se, n_base = (a[:, 0] for a in sums.mean(np.zeros_like(lo), base_hi))
+    out = pd.DataFrame({'effect': window_mean - base_mean,
+                        'std_error': np.sqrt(window_se ** 2 + base_se ** 2),
+                        'n_days': n_window.astype(np.int64),
+                        'n_baseline_days': n_base.astype(np.int64)}, index=dates)
+    out = _band(out, level)
+    return out[(out['n_days'] >= min_periods) & (out['n_baseline_days'] >= min_periods)]
+
+
+def seasonal_gap(gap, post_start=POLICY_DATE, by='season', level=0.95):
+    """Mean post-period gap by ``'season'`` or ``'month'`` of the year, with iid standard errors."""
+    post = gap[(gap.index >= pd.Timestamp(post_start))].dropna()
+    if by == 'season':
+        keys = post.index.month.map(SEASONS)
+    elif by == 'month':
+        keys = post.index.month
+    else:
+        raise ValueError(f"Unknown grouping {by!r}; expected 'season' or 'month'")
+    grouped = post.groupby(keys)
+    out = pd.DataFrame({'effect': grouped.mean(), 'std_error': grouped.std() / np.sqrt(grouped.size()),
+                        'n_days': grouped.size()})
+    out.index.name = by
+    return _band(out, level)
@@ -0,0 +1,154 @@
+"""Local HTTP/JSON endpoint serving slices of the dashboard cube.
+
+The server loads a cube written by :meth:`ordc.cube.Cube.write` once and
+answers GET requests from it, never from the hourly data:
+
+* ``/meta``: zones, date range, grains and the cube version;
+* ``/cube?zone=Zone F&zone=NE&grain=month&peak=1&volatile=0&start=2021-01-01&end=2023-12-31``:
+  hours, volatile days, mean and standard deviation of the price per zone
+  and period (:meth:`Cube.query <ordc.cube.Cube.query>`);
+* ``/gaps?zone=Zone F&grain=month``: synthetic control and placebo gaps;
+* ``/effects?kind=dynamic``: staggered DiD effects (``simple``,
+  ``dynamic``, ``group`` or ``calendar``).
+
+Responses are columnar JSON (``{column: [values]}``). Each distinct query
+is computed once and kept in an LRU cache, and responses carry an ``ETag``
+derived from the cube version. A browser revalidating an unchanged slice
+gets ``304 Not Modified``. CORS is open so the dashboard can be served from
+another port.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .cube import Cube, to_json
+
+DEFAULT_PORT = 8050
+CACHE_SIZE = 256
+MAX_AGE = 3600
+
+
+def _flag(value):
+    if value is None or value.lower() in ('', 'all', 'any'):
+        return None
+    if value.lower() in ('1', 'true', 'yes', 'peak', 'volatile'):
+        return 1
+    if value.lower() in ('0', 'false', 'no', 'offpeak', 'off-peak', 'calm'):
+        return 0
+    raise ValueError(f"Invalid flag {value!r}; expected 0, 1 or all")
+
+
+class QueryCache:
+    """Thread-safe LRU cache of response bodies."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+        # Computed outside the lock; two threads racing on one key both get the same result
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+
+class CubeService:
+    """Maps request paths and query strings to cached JSON bodies."""
+
+    def __init__(self, cube, cache_size=CACHE_SIZE):
+        self.cube = cube
+        self.cache = QueryCache(cache_size)
+        self.routes = {'/meta': self.meta, '/cube': self.slice, '/gaps': self.gaps,
+                       '/effects': self.effects}
+
+    def meta(self, params):
+        return json.dumps({**self.cube.index(),
+                           'cache': {'hits': self.cache.hits, 'misses': self.cache.misses}})
+
+    def slice(self, params):
+        first = lambda name, default=None: params.get(name, [default])[0]  # noqa: E731
+        frame = self.cube.query(zones=params.get('zone'), grain=first('grain', 'month'),
+                                peak=_flag(first('peak')), volatile=_flag(first('volatile')),
+                                start=first('start'), end=first('end'))
+        return to_json(frame)
+
+    def gaps(self, params):
+        first = lambda name, default=None: params.get(name, [default])[0]  # noqa: E731
+        return to_json(self.cube.gap_series(zones=params.get('zone'), grain=first('grain', 'day'),
+                                            start=first('start'), end=first('end')))
+
+    def effects(self, params):
+        return to_json(self.cube.effect_table(params.get('kind', ['dynamic'])[0]))
+
+    def key(self, path, params):
+        return path, tuple(sorted((name, tuple(values)) for name, values in params.items()))
+
+    def etag(self, key):
+        digest = hashlib.sha1(repr((self.cube.meta['version'], key)).encode()).hexdigest()
+        return f'"{digest[:20]}"'
+
+    def respond(self, path, query):
+        """Return ``(status, body, etag)`` for one request."""
+        if path not in self.routes:
+            return 404, json.dumps({'error': f"Unknown path {path!r}", 'paths': list(self.routes)}), None
+        params = parse_qs(query, keep_blank_values=False)
+        key = self.key(path, params)
+        if path == '/meta':
+            return 200, self.meta(params), None
+        try:
+            body = self.cache.get(key, lambda: self.routes[path](params))
+        except ValueError as err:
+            return 400, json.dumps({'error': str(err)}), None
+        return 200, body, self.etag(key)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            status, body, etag = service.respond(url.path.rstrip('/') or '/', url.query)
+            if etag is not None and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self._headers(etag)
+                self.end_headers()
+                return
+            data = body.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self._headers(etag)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _headers(self, etag):
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if etag is not None:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', f"public, max-age={MAX_AGE}")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def make_server(folder_or_cube, host='127.0.0.1', port=DEFAULT_PORT, cache_size=CACHE_SIZE):
+    """A threading HTTP server for a cube folder (or a :class:`Cube`); call ``serve_forever()``."""
+    cube = folder_or_cube if isinstance(folder_or_cube, Cube) else Cube.read(folder_or_cube)
+    return ThreadingHTTPServer((host, port), make_handler(CubeService(cube, cache_size)))
@@ -0,0 +1,146 @@
+"""Synthetic NYISO-shaped price panels for benchmarks and tests.
+
+The workbooks are not distributed, so scaling is measured on generated
+data with the same schema. :func:`iter_hourly_panel` yields hourly (or
+sub-hourly) rows with the columns ``Date``, ``Hr_End``, ``zone``,
+``treated``, ``post``, ``DA_LMP``, ``load``, ``natural gas price`` and
+``weather``. Rows come in chunks of whole days, so any size can be
+generated, written or streamed in bounded memory.
+
+Prices follow a simple structure: a gas-driven daily level (a common
+gas price scaled by a zone basis), a zone premium, an evening-peak hourly
+shape, seasonal weather and load, occasional zone-day price spikes (the
+volatile days), and a constant ``effect`` $/MWh for ``Zone F`` from the
+policy date on. The first three
+zones are ``Zone F`` (treated), ``Zone C`` and ``NE``; further zones are
+numbered donors.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from .synth import POLICY_DATE
+
+BASE_ZONES = ('Zone F', 'Zone C', 'NE')
+FREQUENCIES = {'h': 1, '15min': 4, '5min': 12}
+
+
+def zone_names(n_zones):
+    if n_zones < len(BASE_ZONES):
+        raise ValueError(f"At least {len(BASE_ZONES)} zones are needed")
+    return list(BASE_ZONES) + [f"Zone {i:04d}" for i in range(len(BASE_ZONES), n_zones)]
+
+
+def panel_shape(rows, years=7, freq='h'):
+    """Zones and days giving about ``rows`` rows.
+
+    Days grow up to ``years`` years with the three base zones; larger
+    panels add zones.
+    """
+    per_day = 24 * FREQUENCIES[freq]
+    max_days = int(years * 365)
+    n_zones = max(len(BASE_ZONES), math.ceil(rows / (max_days * per_day)))
+    n_days = max(1, math.ceil(rows / (n_zones * per_day)))
+    return n_zones, n_days
+
+
+def iter_hourly_panel(n_zones=3, n_days=365, freq='h', start=None, policy_date=POLICY_DATE,
+                      effect=5.0, spike_rate=0.03, chunk_rows=1_000_000, seed=0):
+    """Yield the synthetic panel in chunks of whole days.
+
+    By default the sample is centred on ``policy_date``, so every size has
+    pre- and post-policy days. The output is reproducible for a given
+    ``seed`` and does not depend on ``chunk_rows``.
+    """
+    per_hour = FREQUENCIES[freq]
+    zones = zone_names(n_zones)
+    if start is None:
+        start = pd.Timestamp(policy_date) - pd.Timedelta(days=n_days // 2)
+    dates = pd.date_range(start, periods=n_days, freq='D')
+
+    # Day- and zone-level drivers, drawn up front so chunking does not change them
+    rng = np.random.default_rng(seed)
+    gas = np.maximum(1.5, 3 + np.cumsum(rng.normal(scale=0.08, size=n_days)))
+    season = np.cos(2 * np.pi * (dates.dayofyear.to_numpy() - 200) / 365.25)
+    premium = np.concatenate([[8.0, 0.0, 10.0], rng.normal(4.0, 3.0, n_zones - 3)])
+    load_scale = np.concatenate([[1500.0, 1800.0, 2500.0], rng.uniform(500, 3000, n_zones - 3)])
+    # Delivered gas prices scale differently by zone, so they are not absorbed by time effects
+    gas_basis = np.concatenate([[1.1, 1.0, 1.25], rng.uniform(0.9, 1.3, n_zones - 3)])
+    spikes = rng.random((n_days, n_zones)) < spike_rate
+    spike_size = np.where(spikes, rng.gamma(2.0, 40.0, (n_days, n_zones)), 0.0)
+    day_seeds = np.random.SeedSequence(seed).spawn(n_days)
+
+    # Interval index within a day: hour ending and sub-hourly position
+    hr_end = np.repeat(np.arange(1, 25, dtype=np.int8), per_hour)
+    shape = 1 + 0.35 * np.exp(-0.5 * ((hr_end - 18.5) / 2.5) ** 2) - 0.15 * (hr_end < 6)
+    per_day = len(hr_end) * n_zones
+    days_per_chunk = max(1, chunk_rows // per_day)
+    zone_index = np.repeat(np.arange(n_zones), len(hr_end))
+    treated = (zone_index == 0).astype(np.int8)
+
+    for first in range(0, n_days, days_per_chunk):
+        days = np.arange(first, min(first + days_per_chunk, n_days))
+        day = np.repeat(days, per_day)
+        zone = np.tile(zone_index, len(days))
+        hour = np.tile(np.tile(hr_end, n_zones), len(days))
+        hourly = np.tile(np.tile(shape, n_zones), len(days))
+        noise = np.concatenate([np.random.default_rng(day_seeds[d]).standard_normal((2, per_day))
+                                for d in days], axis=1)
+
+        post = (dates[day] >= policy_date).astype(np.int8)
+        weather = 55 + 25 * season[day] + 4 * noise[1]
+        load = load_scale[zone] * hourly * (1 + 0.004 * np.abs(weather - 60))
+        zone_gas = gas[day] * gas_basis[zone]
+        price = ((12 * zone_gas + premium[zone]) * hourly + spike_size[day, zone] * hourly
+                 + 0.002 * load + 4 * noise[0] + effect * np.tile(treated, len(days)) * post)
+        yield pd.DataFrame({
+            'Date': dates[day],
+            'Hr_End': hour,
+            'zone': pd.Categorical.from_codes(zone, categories=zones),
+            'treated': np.tile(treated, len(days)),
+            'post': post,
+            'DA_LMP': price,
+            'load': load,
+            'natural gas price': zone_gas,
+            'weather': weather,
+        })
+
+
+def hourly_panel(n_zones=3, n_days=365, freq='h', **kwargs):
+    """The whole synthetic panel as one DataFrame (see :func:`iter_hourly_panel`)."""
+    return pd.concat(iter_hourly_panel(n_zones, n_days, freq, **kwargs), ignore_index=True)
+
+
+def write_hourly_panel(folder, n_zones=3, n_days=365, freq='h', **kwargs):
+    """Write the panel as one Parquet file per chunk; returns the paths in order."""
+    from pathlib import Path
+
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, chunk in enumerate(iter_hourly_panel(n_zones, n_days, freq, **kwargs)):
+        path = folder / f"hourly-{i:05d}.parquet"
+        chunk.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def monthly_panel(chunks):
+    """Aggregate hourly chunks into the monthly DiD database shape (``PANEL_COLUMNS``).
+
+    Only per-(month, zone) sums are kept between chunks.
+    """
+    keys = ['month', 'zone', 'treated', 'post']
+    values = {'DA_LMP': 'avg_price', 'load': 'load', 'natural gas price': 'natural gas price',
+              'weather': 'weather'}
+    total = None
+    for chunk in chunks:
+        frame = chunk[list(values)].assign(
+            month=chunk['Date'].dt.to_period('M').dt.to_timestamp(),
+            zone=chunk['zone'], treated=chunk['treated'], post=chunk['post'])
+        part = frame.groupby(keys, sort=False, observed=True).agg(**{
+            **{name: (name, 'sum') for name in values}, 'n': ('DA_LMP', 'size')})
+        total = part if total is None else total.add(part, fill_value=0)
+    means = total[list(values)].div(total['n'], axis=0).rename(columns=values)
+    return means.reset_index().sort_values(['month', 'zone'], ignore_index=True)
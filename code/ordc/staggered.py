@@ -0,0 +1,230 @@
+"""Staggered-adoption DiD (Callaway and Sant'Anna) for many treated zones.
+
+The panel scripts compare one treated zone with fixed controls. With
+several zones treated at different dates, the two-way FE ``did``
+coefficient mixes comparisons in which earlier-treated zones act as
+controls. Callaway and Sant'Anna instead estimate one group-time effect
+``ATT(g, t)`` for each cohort ``g`` (zones first treated in the same
+period) and each period ``t``. Each one is a 2x2 DiD against never-treated
+(or not-yet-treated) zones relative to a base period. The effects are
+then aggregated by event time, cohort, calendar period or overall.
+
+Without covariates every ``ATT(g, t)`` is a difference of means of
+unit-level changes ``Y_i,t - Y_i,base``. :class:`StaggeredDiD` therefore
+reduces the rows once to the unit x period matrix of cell means, the
+shared group-level aggregate. Each cohort is then a vectorized
+computation over all of its periods on that matrix. Cohorts run in
+parallel on a thread pool, so the cost grows with cohorts x periods x
+units rather than cohorts x rows.
+
+Standard errors come from the influence function of each ``ATT(g, t)``
+with units as clusters. Aggregations are linear in the group-time effects
+with weights proportional to cohort size, and their standard errors
+treat those weights as fixed.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+CONTROL_GROUPS = ('never', 'notyet')
+BASE_PERIODS = ('varying', 'universal')
+AGGREGATIONS = ('simple', 'dynamic', 'group', 'calendar')
+
+
+def first_treated(panel, unit='zone', time='date', treated='treated', post='post'):
+    """First period in which each unit is treated (``treated * post == 1``), NaN if never."""
+    active = (panel[treated] == 1) & (panel[post] == 1)
+    first = panel.loc[active].groupby(unit, observed=True)[time].min()
+    return first.reindex(pd.unique(panel[unit]))
+
+
+@dataclass
+class StaggeredResult:
+    """Group-time effects and their influence functions."""
+    att: pd.DataFrame           # one row per (cohort, period): att, std_error, event_time, ...
+    influence: np.ndarray       # units x group-time cells, scaled so var = sum(psi^2) / N^2
+    cohort_sizes: pd.Series     # treated units per cohort
+
+    @property
+    def n_units(self):
+        return self.influence.shape[0]
+
+    def _combine(self, keys, weights):
+        """Estimates and standard errors of weighted means of the cells sharing a key.
+
+        ``keys`` labels each cell (NaN cells are left out); every key is one
+        weighted mean, computed for all keys at once with grouped sums.
+        """
+        used = pd.notna(keys) & (weights > 0)
+        codes, labels = pd.factorize(keys[used], sort=True)
+        w = weights[used] / np.bincount(codes, weights=weights[used])[codes]
+        estimate = np.bincount(codes, weights=w * self.att['att'].to_numpy()[used],
+                               minlength=len(labels))
+        psi = np.zeros((len(labels), self.n_units))
+        np.add.at(psi, codes, (self.influence[:, used] * w).T)
+        std_error = np.sqrt((psi ** 2).sum(axis=1)) / self.n_units
+        return pd.DataFrame({'att': estimate, 'std_error': std_error}, index=labels)
+
+    def aggregate(self, kind='simple', level=0.95):
+        """Aggregate the group-time effects.
+
+        * ``'simple'``: every post-treatment cell, weighted by cohort size;
+        * ``'dynamic'``: one effect per event time ``t - g``;
+        * ``'group'``: one effect per cohort, averaging its post periods;
+        * ``'calendar'``: one effect per period, over cohorts already treated.
+
+        Returns a DataFrame with ``att``, ``std_error`` and a normal
+        confidence interval.
+        """
+        from scipy import stats
+
+        if kind not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation {kind!r}; expected one of {AGGREGATIONS}")
+        att = self.att
+        size = att['cohort'].map(self.cohort_sizes).to_numpy(dtype=np.float64)
+        post = att['event_time'].to_numpy() >= 0
+
+        if kind == 'simple':
+            keys = pd.Series(np.where(post, 'ATT', None))
+        elif kind == 'dynamic':
+            keys = att['event_time']
+        elif kind == 'group':
+            keys = att['cohort'].where(post)
+        else:
+            keys = att['period'].where(post)
+
+        table = self._combine(keys.to_numpy(), size)
+        table.index.name = {'simple': None, 'dynamic': 'event_time', 'group': 'cohort',
+                            'calendar': 'period'}[kind]
+        z = stats.norm.ppf(0.5 + level / 2)
+        table['lower'] = table['att'] - z * table['std_error']
+        table['upper'] = table['att'] + z * table['std_error']
+        return table
+
+
+class StaggeredDiD:
+    """Callaway-Sant'Anna group-time effects from unit x period cell means.
+
+    Parameters
+    ----------
+    panel : DataFrame
+        Rows at any resolution; several rows per unit and period are
+        averaged into one cell.
+    outcome, unit, time : str
+        Outcome, unit (zone) and period columns.
+    cohort : Series or dict, optional
+        First treated period of each unit (NaN/None for never treated). By
+        default it is derived from ``treated`` and ``post`` with
+        :func:`first_treated`.
+    """
+
+    def __init__(self, panel, outcome='avg_price', unit='zone', time='date', cohort=None,
+                 treated='treated', post='post'):
+        unit_codes, self.units = pd.factorize(panel[unit], sort=True)
+        time_codes, self.periods = pd.factorize(panel[time], sort=True)
+        n_units, n_periods = len(self.units), len(self.periods)
+
+        # Shared aggregate: mean outcome of every unit x period cell
+        cells = unit_codes.astype(np.int64) * n_periods + time_codes
+        y = panel[outcome].to_numpy(dtype=np.float64)
+        sums = np.bincount(cells, weights=y, minlength=n_units * n_periods)
+        counts = np.bincount(cells, minlength=n_units * n_periods)
+        with np.errstate(invalid='ignore'):
+            self.means = (sums / counts).reshape(n_units, n_periods)
+
+        if cohort is None:
+            cohort = first_treated(panel, unit, time, treated, post)
+        cohort = pd.Series(cohort).reindex(self.units)
+        never = cohort.isna().to_numpy()
+        # Cohorts as period indices; never treated units get n_periods (treated after the sample)
+        index = np.full(n_units, n_periods)
+        index[~never] = self.periods.get_indexer(cohort[~never])
+        if (index < 0).any():
+            raise ValueError("Cohort dates must be periods of the panel")
+        self.cohort_index = index
+        self.never = never
+
+    @property
+    def cohorts(self):
+        """Cohort start periods with at least one pre-period, in order."""
+        return np.unique(self.cohort_index[(self.cohort_index > 0)
+                                           & (self.cohort_index < len(self.periods))])
+
+    def _cohort_cells(self, g, control_group, base_period, anticipation):
+        """ATT(g, t) for every usable t, with the influence function of each."""
+        n_units, n_periods = self.means.shape
+        start = g - anticipation
+        t = np.arange(n_periods)
+        if base_period == 'varying':
+            base = np.where(t < start, t - 1, start - 1)
+        else:
+            base = np.full(n_periods, start - 1)
+        usable = (base >= 0) & (t != base)
+        t, base = t[usable], base[usable]
+
+        delta = self.means[:, t] - self.means[:, base]                  # units x cells
+        observed = ~np.isnan(delta)
+        treated = (self.cohort_index == g)[:, None] & observed
+        if control_group == 'never':
+            control = self.never[:, None] & observed
+        else:
+            latest = np.maximum(t, base) + anticipation
+            control = (self.cohort_index[:, None] > latest[None, :]) & observed
+            control &= (self.cohort_index != g)[:, None]
+
+        n_treated, n_control = treated.sum(axis=0), control.sum(axis=0)
+        keep = (n_treated > 0) & (n_control > 0)
+        delta = np.where(observed, delta, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mu_treated = (delta * treated).sum(axis=0) / n_treated
+            mu_control = (delta * control).sum(axis=0) / n_control
+            influence = n_units * (treated * (delta - mu_treated) / n_treated
+                                   - control * (delta - mu_control) / n_control)
+        att = mu_treated - mu_control
+        se = np.sqrt((influence ** 2).sum(axis=0)) / n_units
+        table = pd.DataFrame({
+            'cohort': self.periods[g],
+            'period': self.periods[t],
+            'base_period': self.periods[base],
+            'event_time': t - g,
+            'att': att,
+            'std_error': se,
+            'n_treated': n_treated,
+            'n_control': n_control,
+        })
+        return table[keep], influence[:, keep]
+
+    def fit(self, control_group='never', base_period='varying', anticipation=0,
+            max_workers=None):
+        """Estimate every ATT(g, t); cohorts are computed in parallel.
+
+        ``control_group`` is ``'never'`` (never-treated units) or
+        ``'notyet'`` (units not yet treated by both ``t`` and the base
+        period). Pre-period cells use the previous period as base
+        (``'varying'``) or the period before treatment (``'universal'``).
+        ``anticipation`` shifts the base period that many periods earlier.
+        """
+        if control_group not in CONTROL_GROUPS:
+            raise ValueError(f"Unknown control group {control_group!r}; expected one of {CONTROL_GROUPS}")
+        if base_period not in BASE_PERIODS:
+            raise ValueError(f"Unknown base period {base_period!r}; expected one of {BASE_PERIODS}")
+        if control_group == 'never' and not self.never.any():
+            raise ValueError("No never-treated units; use control_group='notyet'")
+
+        cohorts = list(self.cohorts)
+        run = lambda g: self._cohort_cells(g, control_group, base_period, anticipation)  # noqa: E731
+        workers = max_workers or min(len(cohorts), os.cpu_count() or 1)
+        if workers <= 1:
+            parts = [run(g) for g in cohorts]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                parts = list(pool.map(run, cohorts))
+
+        att = pd.concat([table for table, _ in parts], ignore_index=True)
+        influence = np.hstack([psi for _, psi in parts]) if parts else np.empty((len(self.units), 0))
+        sizes = pd.Series(np.bincount(self.cohort_index, minlength=len(self.periods) + 1)[cohorts],
+                          index=self.periods[cohorts], name='units')
+        return StaggeredResult(att, influence, sizes)
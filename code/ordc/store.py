@@ -0,0 +1,251 @@
+"""Persistent results store: memoized model fits in SQLite.
+
+Every fitted model is stored with its parameters, standard errors,
+p-values, R-squared components (within, between, overall), the number of
+observations and the estimator's text summary. Each entry is keyed by a hash of:
+
+* the data slice the model sees: the sample's rows of the entity, time,
+  dependent and regressor columns, with their names and dtypes;
+* the :class:`~ordc.panel.ModelSpec` and the fitting function;
+* the versions of Python and of the numerical libraries.
+
+:meth:`ResultsStore.fit` returns the stored entry when the key exists and
+fits (and stores) otherwise. An unchanged spec on unchanged data therefore
+costs a hash and a lookup. A new library version or a revised data row
+gives a new key, so stale results are never reused. Old entries stay in
+the store.
+
+Each script run is recorded as an ordered list of entry keys. Reports
+can be regenerated from any run (:meth:`ResultsStore.run`), and
+:meth:`ResultsStore.history` tabulates a term's estimates across every
+stored fit.
+"""
+import hashlib
+import json
+import platform
+import sqlite3
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .panel import FitSummary, fit_spec, select_sample
+
+STORE_FILE = "results.sqlite"
+VERSIONED_PACKAGES = ('numpy', 'pandas', 'scipy', 'linearmodels')
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fits (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    estimator TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    created TEXT NOT NULL,
+    nobs INTEGER,
+    rsquared REAL,
+    rsquared_within REAL,
+    rsquared_between REAL,
+    rsquared_overall REAL,
+    text TEXT
+);
+CREATE TABLE IF NOT EXISTS params (
+    key TEXT NOT NULL REFERENCES fits(key),
+    position INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    coef REAL,
+    std_error REAL,
+    pvalue REAL,
+    PRIMARY KEY (key, position)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started TEXT NOT NULL,
+    script TEXT
+);
+CREATE TABLE IF NOT EXISTS run_fits (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    position INTEGER NOT NULL,
+    key TEXT NOT NULL REFERENCES fits(key),
+    PRIMARY KEY (run_id, position)
+);
+"""
+
+
+def library_versions(packages=VERSIONED_PACKAGES):
+    versions = {'python': platform.python_version()}
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def data_hash(panel, spec, entity='panel_id', time='time_id'):
+    """Hash of the rows and columns of ``panel`` that ``spec`` is fitted on."""
+    columns = list(dict.fromkeys([entity, time, spec.dependent] + list(spec.regressors)))
+    frame = select_sample(panel, spec.sample)[columns]
+    layout = [(column, str(dtype)) for column, dtype in frame.dtypes.items()]
+    return _digest(layout, pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+
+
+def _estimator(fit):
+    return f"{fit.__module__}.{fit.__qualname__}"
+
+
+@dataclass
+class StoredFit(FitSummary):
+    """A FitSummary with the extra fields kept in the store; prints as the estimator's summary."""
+    rsquared_within: float
+    rsquared_between: float
+    rsquared_overall: float
+    text: str
+    key: str
+    created: str
+    cached: bool = False
+
+    def __str__(self):
+        return self.text
+
+
+class ResultsStore:
+    """SQLite store of fitted models (see the module docstring).
+
+    Parameters
+    ----------
+    path : path
+        Database file, created on first use (e.g. ``results_dir/results.sqlite``).
+    versions : dict, optional
+        Library versions folded into every key; defaults to
+        :func:`library_versions`.
+    """
+
+    def __init__(self, path, versions=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.versions = library_versions() if versions is None else dict(versions)
+        self._versions_json = json.dumps(self.versions, sort_keys=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def key(self, panel, spec, fit=fit_spec):
+        """Store key and data hash of one spec on one panel."""
+        spec_json = json.dumps(asdict(spec), sort_keys=True)
+        data = data_hash(panel, spec)
+        return _digest(data, spec_json, _estimator(fit), self._versions_json), data
+
+    def get(self, key):
+        """The stored fit for ``key``, or None."""
+        row = self.conn.execute(
+            "SELECT nobs, rsquared, rsquared_within, rsquared_between, rsquared_overall, text, "
+            "created FROM fits WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        params = pd.read_sql_query(
+            "SELECT term, coef, std_error, pvalue FROM params WHERE key = ? ORDER BY position",
+            self.conn, params=(key,)).set_index('term')
+        params.index.name = None
+        nobs, rsquared, within, between, overall, text, created = row
+        as_float = lambda v: np.nan if v is None else float(v)  # noqa: E731
+        return StoredFit(params['coef'].rename('parameter'),
+                         params['std_error'].rename('std_error'),
+                         params['pvalue'].rename('pvalue'),
+                         as_float(rsquared), int(nobs), as_float(within), as_float(between),
+                         as_float(overall), text, key, created)
+
+    def put(self, key, spec, result, data, fit=fit_spec):
+        """Store a fitted result (linearmodels result or FitSummary); returns the StoredFit."""
+        created = datetime.now().isoformat(timespec='seconds')
+        r2 = {name: float(getattr(result, name, np.nan))
+              for name in ('rsquared_within', 'rsquared_between', 'rsquared_overall')}
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, spec.name, json.dumps(asdict(spec), sort_keys=True), _estimator(fit), data,
+                 self._versions_json, created, int(result.nobs), float(result.rsquared),
+                 r2['rsquared_within'], r2['rsquared_between'], r2['rsquared_overall'],
+                 str(result)))
+            self.conn.execute("DELETE FROM params WHERE key = ?", (key,))
+            self.conn.executemany(
+                "INSERT INTO params VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, i, str(term), float(result.params[term]), float(result.std_errors[term]),
+                  float(result.pvalues[term])) for i, term in enumerate(result.params.index)])
+        return self.get(key)
+
+    def fit(self, panel, spec, fit=fit_spec):
+        """Stored fit of ``spec`` on ``panel``, fitting with ``fit(panel, spec)`` only on a miss."""
+        key, data = self.key(panel, spec, fit)
+        stored = self.get(key)
+        if stored is not None:
+            self.hits += 1
+            stored.cached = True
+            return stored
+        self.misses += 1
+        return self.put(key, spec, fit(panel, spec), data, fit)
+
+    def record_run(self, results, script=None):
+        """Record the ordered fits of one run; returns its ``run_id``."""
+        started = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            cursor = self.conn.execute("INSERT INTO runs (started, script) VALUES (?, ?)",
+                                       (started, script))
+            run_id = cursor.lastrowid
+            self.conn.executemany("INSERT INTO run_fits VALUES (?, ?, ?)",
+                                  [(run_id, i, result.key) for i, result in enumerate(results.values())])
+        return run_id
+
+    def runs(self):
+        """Every recorded run with its start time, script and number of fits."""
+        return pd.read_sql_query(
+            "SELECT r.run_id, r.started, r.script, COUNT(f.key) AS fits FROM runs r "
+            "LEFT JOIN run_fits f ON f.run_id = r.run_id GROUP BY r.run_id ORDER BY r.run_id",
+            self.conn)
+
+    def run(self, run_id=None):
+        """``{model name: StoredFit}`` of a run (the latest by default), in run order."""
+        if run_id is None:
+            row = self.conn.execute("SELECT MAX(run_id) FROM runs").fetchone()
+            run_id = row[0]
+            if run_id is None:
+                raise LookupError(f"No runs recorded in {self.path}")
+        rows = self.conn.execute(
+            "SELECT fits.model, run_fits.key FROM run_fits JOIN fits ON fits.key = run_fits.key "
+            "WHERE run_id = ? ORDER BY position", (run_id,)).fetchall()
+        if not rows:
+            raise LookupError(f"Run {run_id} not found in {self.path}")
+        return {model: self.get(key) for model, key in rows}
+
+    def history(self, term='did', model=None):
+        """One row per stored fit that has ``term``: estimate, SE, p-value and provenance."""
+        query = ("SELECT fits.model, fits.created, fits.estimator, fits.data_hash, fits.versions, "
+                 "fits.nobs, fits.rsquared, params.coef, params.std_error, params.pvalue, fits.key "
+                 "FROM fits JOIN params ON params.key = fits.key WHERE params.term = ?")
+        args = [term]
+        if model is not None:
+            query += " AND fits.model = ?"
+            args.append(model)
+        return pd.read_sql_query(query + " ORDER BY fits.created, fits.model", self.conn,
+                                 params=args)
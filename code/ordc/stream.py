@@ -0,0 +1,140 @@
+"""Streaming aggregation of hourly or sub-hourly prices into the daily peak panel.
+
+:func:`stream_peak_prices` reads price files chunk by chunk and drops rows
+outside a peak window. It keeps running per-(date, zone) sums and counts and
+returns the same ``avg_price`` panel as :func:`ordc.synth.daily_peak_prices`.
+Only the partial sums are kept between chunks, so memory grows with the
+number of output cells, not the number of input rows.
+
+A window is any callable that takes a chunk and returns a boolean mask.
+:func:`hour_window` gives the usual 17-20 hour-ending window,
+:func:`price_above` a volatile-hour definition, and :func:`all_of` combines
+them.
+"""
+import numpy as np
+import pandas as pd
+
+from .io import iter_table
+
+KEYS = ('Date', 'zone', 'treated', 'post')
+
+
+def hour_window(first=17, last=20, column='Hr_End'):
+    """Rows whose hour ending lies in ``[first, last]``."""
+    def window(chunk):
+        return chunk[column].between(first, last).to_numpy()
+    window.columns = (column,)
+    return window
+
+
+def price_above(threshold, column='DA_LMP'):
+    """Rows priced above ``threshold`` $/MWh (a simple volatile-hour definition)."""
+    def window(chunk):
+        return (chunk[column] > threshold).to_numpy()
+    window.columns = (column,)
+    return window
+
+
+def all_of(*windows):
+    """Rows selected by every one of ``windows``."""
+    def window(chunk):
+        mask = np.ones(len(chunk), dtype=bool)
+        for w in windows:
+            mask &= w(chunk)
+        return mask
+    window.columns = tuple(c for w in windows for c in getattr(w, 'columns', ()))
+    return window
+
+
+def add_hour_ending(chunk, timestamp='Timestamp', interval_ending=True):
+    """Derive ``Date`` and ``Hr_End`` (1-24) from sub-hourly interval timestamps.
+
+    With ``interval_ending`` the timestamp marks the end of the interval, so
+    00:00 belongs to hour ending 24 of the previous day.
+    """
+    ts = pd.to_datetime(chunk[timestamp])
+    if interval_ending:
+        ts = ts - pd.Timedelta(1, 'ns')
+    chunk = chunk.assign(Date=ts.dt.normalize(), Hr_End=(ts.dt.hour + 1).astype(np.int8))
+    return chunk
+
+
+class PeakAggregator:
+    """Running per-cell sums and counts of a price inside a window.
+
+    Partial results are consolidated whenever the buffered rows exceed the
+    size of the consolidated table, so work and memory stay proportional to
+    the number of output cells.
+    """
+
+    def __init__(self, window=None, value='DA_LMP', keys=KEYS):
+        self.window = window or hour_window()
+        self.value = value
+        self.keys = list(keys)
+        self._table = None
+        self._pending = []
+        self._pending_rows = 0
+        self.rows_read = 0
+        self.rows_used = 0
+
+    def update(self, chunk):
+        self.rows_read += len(chunk)
+        chunk = chunk[self.window(chunk)]
+        self.rows_used += len(chunk)
+        if chunk.empty:
+            return
+        partial = (chunk.groupby(self.keys, observed=True, sort=False)[self.value]
+                   .agg(['sum', 'count']))
+        self._pending.append(partial)
+        self._pending_rows += len(partial)
+        if self._pending_rows > max(len(self._table) if self._table is not None else 0, 10_000):
+            self._consolidate()
+
+    def _consolidate(self):
+        parts = self._pending if self._table is None else [self._table] + self._pending
+        if parts:
+            self._table = pd.concat(parts).groupby(level=self.keys, observed=True).sum()
+        self._pending, self._pending_rows = [], 0
+
+    @property
+    def cells(self):
+        self._consolidate()
+        return 0 if self._table is None else len(self._table)
+
+    def result(self):
+        """The daily panel: key columns, ``avg_price`` and the number of prices averaged ``n_obs``."""
+        self._consolidate()
+        if self._table is None:
+            return pd.DataFrame(columns=self.keys + ['avg_price', 'n_obs'])
+        out = self._table.sort_index().reset_index()
+        out['avg_price'] = out['sum'] / out['count']
+        out['n_obs'] = out['count']
+        return out.drop(columns=['sum', 'count'])
+
+
+def stream_peak_prices(sources, window=None, value='DA_LMP', keys=KEYS, chunksize=500_000,
+                       timestamp=None):
+    """Aggregate one or more price files into the daily peak panel, chunk by chunk.
+
+    ``sources`` is a path (CSV, Parquet or workbook), a DataFrame, or a list
+    of them, e.g. one file per month of nodal data. Only the key, value and
+    window columns are read. For sub-hourly data, name the interval-ending
+    timestamp column in ``timestamp``; ``Date`` and ``Hr_End`` are then
+    derived from it.
+    """
+    if isinstance(sources, (str, pd.DataFrame)) or not hasattr(sources, '__iter__'):
+        sources = [sources]
+    window = window or hour_window()
+    aggregator = PeakAggregator(window, value, keys)
+
+    columns = list(keys) + [value] + list(getattr(window, 'columns', ()))
+    if timestamp is not None:
+        columns = [c for c in columns if c not in ('Date', 'Hr_End')] + [timestamp]
+    columns = list(dict.fromkeys(columns))
+
+    for source in sources:
+        for chunk in iter_table(source, columns=columns, chunksize=chunksize):
+            if timestamp is not None:
+                chunk = add_hour_ending(chunk, timestamp)
+            aggregator.update(chunk)
+    return aggregator.result()
@@ -0,0 +1,286 @@
+"""OLS from streamed sufficient statistics.
+
+A :class:`SufficientStats` accumulator makes one pass over the rows, chunk by
+chunk, and keeps only fixed-size summaries of a superset of candidate
+columns:
+
+* ``X'X``, ``X'y``, ``y'y`` and ``sum(y)`` for point estimates, R-squared and
+  classical standard errors;
+* per-cluster ``X_g'X_g`` and ``X_g'y_g``, from which the cluster scores
+  ``X_g'e_g = X_g'y_g - X_g'X_g b`` follow for any coefficient vector;
+* with ``robust=True``, packed fourth moments ``sum x_a x_b x_c x_d`` (plus
+  the matching ``y`` and ``y^2`` terms) so heteroskedasticity-robust errors
+  need no second pass.
+
+Any subset of the accumulated columns can then be fitted with any of the
+covariance types the statistics support without touching the data again.
+Memory is ``O(k^2 + G k^2)`` for ``k`` columns and ``G`` clusters, plus
+``O(k^4 / 4)`` for the robust moments, independent of the number of rows.
+
+:class:`Design` turns raw chunks into design matrices with fixed dummy
+levels, named like patsy (``Intercept``, ``C(zone)[T.F]``), so chunks that
+lack some levels still line up.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .panel import FitSummary
+
+COV_TYPES = ('nonrobust', 'HC0', 'HC1', 'cluster')
+
+
+class Design:
+    """Column layout for streamed design matrices.
+
+    Parameters
+    ----------
+    numeric : sequence of str
+        Columns used as they are.
+    categorical : dict
+        ``{column: levels}``; each column becomes one dummy per level except
+        the first, which is the reference.
+    intercept : bool
+        Prepend an ``Intercept`` column of ones.
+    """
+
+    def __init__(self, numeric=(), categorical=None, intercept=True):
+        self.numeric = list(numeric)
+        self.categorical = {col: list(levels) for col, levels in (categorical or {}).items()}
+        self.intercept = intercept
+        self.names = (['Intercept'] if intercept else [])
+        for col, levels in self.categorical.items():
+            self.names += [f"C({col})[T.{level}]" for level in levels[1:]]
+        self.names += self.numeric
+
+    def transform(self, chunk):
+        """Design matrix (float64, rows x len(names)) for a DataFrame chunk."""
+        parts = []
+        if self.intercept:
+            parts.append(np.ones((len(chunk), 1)))
+        for col, levels in self.categorical.items():
+            codes = pd.Categorical(chunk[col], categories=levels).codes
+            if (codes < 0).any():
+                unknown = set(chunk[col][codes < 0])
+                raise ValueError(f"Unexpected levels in {col!r}: {sorted(map(str, unknown))}")
+            parts.append((codes[:, None] == np.arange(1, len(levels))).astype(np.float64))
+        if self.numeric:
+            parts.append(chunk[self.numeric].to_numpy(dtype=np.float64))
+        return np.hstack(parts) if parts else np.empty((len(chunk), 0))
+
+
+class SufficientStats:
+    """Streaming accumulator of OLS sufficient statistics for named columns.
+
+    Parameters
+    ----------
+    columns : sequence of str
+        Names of the candidate regressors, in design-matrix order.
+    robust : bool
+        Also accumulate the fourth moments needed for HC standard errors.
+
+    The fourth moments are a dense ``p x p`` matrix over the ``p = k(k+1)/2``
+    column pairs, so they take ``O(k^4)`` memory and ``O(n k^4)`` time. At
+    ``k = 100`` that is 200 MB; each level of a ``C(col)`` dummy counts as a
+    column, so ``robust`` is off by default and should only be turned on
+    for small designs (absorb high-dimensional categoricals first, e.g.
+    with :class:`~ordc.sparse.SparseFE`).
+    """
+
+    def __init__(self, columns, robust=False):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.robust = robust
+        self.nobs = 0.0
+        self.ysum = 0.0
+        self.yty = 0.0
+        self.xtx = np.zeros((k, k))
+        self.xty = np.zeros(k)
+        self.clusters = {}
+        # Upper-triangle pairs (a, b), a <= b, index the packed moments
+        self._pairs = np.triu_indices(k)
+        if robust:
+            p = len(self._pairs[0])
+            self.m4 = np.zeros((p, p))
+            self.m3y = np.zeros((p, k))
+            self.m2yy = np.zeros(p)
+
+    def update(self, X, y, clusters=None):
+        """Add rows of a design matrix and response."""
+        y = np.asarray(y, dtype=np.float64)
+        self.update_cells(X, np.ones(len(y)), y, y * y, clusters)
+
+    def update_cells(self, X, counts, ysum, yysum, clusters=None):
+        """Add pre-aggregated rows: each row of ``X`` stands for ``counts`` observations.
+
+        ``ysum`` and ``yysum`` are the per-row sums of ``y`` and ``y**2``. Plain
+        rows are the special case ``counts=1``, ``ysum=y``, ``yysum=y**2``.
+        Negative counts (with negated sums) remove rows added earlier, which
+        is how a revised row is replaced.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        counts = np.asarray(counts, dtype=np.float64)
+        ysum = np.asarray(ysum, dtype=np.float64)
+        yysum = np.asarray(yysum, dtype=np.float64)
+
+        self.nobs += counts.sum()
+        self.ysum += ysum.sum()
+        self.yty += yysum.sum()
+        self.xtx += X.T @ (X * counts[:, None])
+        self.xty += X.T @ ysum
+
+        if self.robust:
+            Z = X[:, self._pairs[0]] * X[:, self._pairs[1]]
+            self.m4 += Z.T @ (Z * counts[:, None])
+            self.m3y += Z.T @ (X * ysum[:, None])
+            self.m2yy += Z.T @ yysum
+
+        if clusters is not None:
+            codes, labels = pd.factorize(np.asarray(clusters))
+            for g, label in enumerate(labels):
+                rows = codes == g
+                Xg = X[rows]
+                xtx_g = Xg.T @ (Xg * counts[rows, None])
+                xty_g = Xg.T @ ysum[rows]
+                if label in self.clusters:
+                    self.clusters[label][0] += xtx_g
+                    self.clusters[label][1] += xty_g
+                else:
+                    self.clusters[label] = [xtx_g, xty_g]
+
+    def merge(self, other):
+        """Fold in statistics accumulated separately (e.g. by another worker)."""
+        if other.columns != self.columns or other.robust != self.robust:
+            raise ValueError("Cannot merge statistics over different columns")
+        self.nobs += other.nobs
+        self.ysum += other.ysum
+        self.yty += other.yty
+        self.xtx += other.xtx
+        self.xty += other.xty
+        if self.robust:
+            self.m4 += other.m4
+            self.m3y += other.m3y
+            self.m2yy += other.m2yy
+        for label, (xtx_g, xty_g) in other.clusters.items():
+            if label in self.clusters:
+                self.clusters[label][0] += xtx_g
+                self.clusters[label][1] += xty_g
+            else:
+                self.clusters[label] = [xtx_g.copy(), xty_g.copy()]
+        return self
+
+    def extend(self, columns):
+        """Append new, so far all-zero columns (e.g. dummies for a new level).
+
+        Rows already accumulated had zeros in these columns, so every existing
+        statistic carries over unchanged and later rows can use them.
+        """
+        new = [name for name in columns if name not in self.columns]
+        if not new:
+            return self
+        k = len(self.columns)
+        grown = SufficientStats(self.columns + new, robust=self.robust)
+        grown.nobs, grown.ysum, grown.yty = self.nobs, self.ysum, self.yty
+        grown.xtx[:k, :k] = self.xtx
+        grown.xty[:k] = self.xty
+        pad = len(new)
+        grown.clusters = {label: [np.pad(xtx_g, (0, pad)), np.pad(xty_g, (0, pad))]
+                          for label, (xtx_g, xty_g) in self.clusters.items()}
+        if self.robust:
+            # Position of each old packed pair among the new packed pairs
+            lookup = np.full((k + pad, k + pad), -1)
+            lookup[grown._pairs] = np.arange(len(grown._pairs[0]))
+            moved = lookup[self._pairs]
+            grown.m4[np.ix_(moved, moved)] = self.m4
+            grown.m3y[moved, :k] = self.m3y
+            grown.m2yy[moved] = self.m2yy
+        self.__dict__.update(grown.__dict__)
+        return self
+
+    def _hc_meat(self, idx, params):
+        """``sum e_i^2 x_i x_i'`` over the columns ``idx`` at ``params``."""
+        k = len(self.columns)
+        pair_index = np.full((k, k), -1)
+        pair_index[self._pairs] = np.arange(len(self._pairs[0]))
+        pair_index = np.maximum(pair_index, pair_index.T)
+
+        # Full coefficient vector over all columns (zeros outside the subset)
+        beta = np.zeros(k)
+        beta[idx] = params
+        # (x'b)^2 = sum_{c<=d} w_cd b_c b_d x_c x_d with w = 1 on, 2 off the diagonal
+        a, b = self._pairs
+        bb = beta[a] * beta[b] * np.where(a == b, 1.0, 2.0)
+
+        sub = pair_index[np.ix_(idx, idx)]
+        meat = self.m2yy[sub] - 2 * (self.m3y[sub] @ beta) + (self.m4[sub] @ bb)
+        return meat
+
+    def fit(self, columns=None, cov_type='nonrobust'):
+        """Fit OLS on a subset of the accumulated columns; returns a FitSummary.
+
+        ``cov_type`` is one of 'nonrobust', 'HC0', 'HC1' or 'cluster'. The
+        cluster covariance uses the statsmodels small-sample correction
+        ``G/(G-1) * (N-1)/(N-K)``. Columns with no variation in the sample
+        (e.g. dummies for levels not yet observed) are dropped with a warning.
+        """
+        from scipy import stats
+
+        if cov_type not in COV_TYPES:
+            raise ValueError(f"Unknown cov_type {cov_type!r}; expected one of {COV_TYPES}")
+        names = self.columns if columns is None else list(columns)
+        idx = [self.columns.index(name) for name in names]
+        empty = [name for name, i in zip(names, idx) if self.xtx[i, i] == 0]
+        if empty:
+            warnings.warn(f"Dropping columns with no observations: {empty}", stacklevel=2)
+            names = [name for name in names if name not in empty]
+            idx = [self.columns.index(name) for name in names]
+
+        xtx = self.xtx[np.ix_(idx, idx)]
+        xty = self.xty[idx]
+        xtxi = np.linalg.inv(xtx)
+        params = xtxi @ xty
+        n, k = self.nobs, len(idx)
+        ssr = self.yty - 2 * params @ xty + params @ xtx @ params
+
+        if cov_type == 'nonrobust':
+            cov = xtxi * ssr / (n - k)
+        elif cov_type in ('HC0', 'HC1'):
+            if not self.robust:
+                raise ValueError("HC covariance needs statistics accumulated with robust=True")
+            cov = xtxi @ self._hc_meat(idx, params) @ xtxi
+            if cov_type == 'HC1':
+                cov *= n / (n - k)
+        else:
+            if not self.clusters:
+                raise ValueError("Cluster covariance needs cluster labels passed to update()")
+            scores = np.array([xty_g[idx] - xtx_g[np.ix_(idx, idx)] @ params
+                               for xtx_g, xty_g in self.clusters.values()])
+            n_groups = len(scores)
+            correction = n_groups / (n_groups - 1) * (n - 1) / (n - k)
+            cov = correction * xtxi @ (scores.T @ scores) @ xtxi
+
+        std_errors = np.sqrt(np.diag(cov))
+        tstats = np.abs(params / std_errors)
+        if cov_type == 'nonrobust':
+            pvalues = 2 * stats.t.sf(tstats, n - k)
+        else:
+            pvalues = 2 * stats.norm.sf(tstats)
+        tss = self.yty - self.ysum ** 2 / n
+        return FitSummary(pd.Series(params, names, name='parameter'),
+                          pd.Series(std_errors, names, name='std_error'),
+                          pd.Series(pvalues, names, name='pvalue'),
+                          float(1 - ssr / tss), int(n))
+
+
+def accumulate(chunks, design, dependent, cluster=None, robust=False):
+    """Build SufficientStats from an iterable of DataFrame chunks in one pass.
+
+    Pass ``robust=True`` to fit HC covariances; see :class:`SufficientStats`
+    for its ``O(k^4)`` memory.
+    """
+    suff = SufficientStats(design.names, robust=robust)
+    for chunk in chunks:
+        suff.update(design.transform(chunk), chunk[dependent].to_numpy(dtype=np.float64),
+                    None if cluster is None else chunk[cluster].to_numpy())
+    return suff
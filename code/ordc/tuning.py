@@ -0,0 +1,268 @@
+"""Cross-validated search over the synthetic control's penalty, peak window and donor pool.
+
+``Synthetic_control.py`` fixes the ridge penalty (``alpha=1.0``), the 17-20
+peak window and the donor pool by hand. :func:`search` scores every
+:class:`Candidate` combination by out-of-sample RMSPE on time-series splits
+of the pre-period. The pre-period is cut into ``n_folds + 1`` consecutive
+blocks, and fold ``k`` fits on blocks ``0..k-1`` and predicts block ``k``.
+
+Both the fit and the validation error are quadratic forms in the zone Gram
+matrix of a block's rows. For each peak window the price matrix is built
+once from hourly prefix sums (:class:`HourlyPrices`), and the Gram matrix
+of every block is computed once over all zones. A candidate then only
+selects its donors' rows and columns: the training Gram of fold ``k`` is a
+prefix sum of block Grams, and the validation SSE is
+``y'y - 2 w'X'y + w'X'X w`` on the held-out block. No candidate touches the
+data again. Candidates are scored on a process pool whose workers receive
+the Grams once, at start-up.
+
+Rows with a missing price in any zone are left out of every Gram, so all
+candidates are scored on the same dates. Each window averages different
+hours, so its RMSPE is measured on its own outcome. Comparisons across
+windows therefore favour smoother averages as well as better fits, and
+:meth:`SearchResult.best_by` gives the best candidate within each window.
+"""
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .stream import KEYS, hour_window, stream_peak_prices
+from .synth import POLICY_DATE, simplex_synthetic_control, simplex_weights, synthetic_control
+
+METHODS = ('ridge', 'simplex')
+PEAK_WINDOWS = ((17, 20), (16, 19), (18, 21), (16, 21), (17, 22), (14, 20))
+RIDGE_PENALTIES = (0.0, 1.0, 1e2, 1e4, 1e5, 1e6, 1e7)
+# Pools are enumerated only up to this many candidate donors (2^J subsets)
+MAX_ENUMERATED_DONORS = 12
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """One synthetic control configuration."""
+    window: tuple        # (first, last) hour ending of the peak window
+    penalty: float       # alpha of ridge_weights, or the penalty of simplex_weights
+    donors: tuple
+    method: str = 'ridge'
+
+
+class HourlyPrices:
+    """Daily price sums and counts per zone and hour ending, prefix-summed over hours.
+
+    ``cells`` is the output of :func:`hourly_cells`. Any peak window's
+    date x zone matrix is then a difference of two prefix sums per cell.
+    """
+
+    def __init__(self, cells, value='avg_price'):
+        self.dates = pd.DatetimeIndex(np.sort(cells['Date'].unique()))
+        self.zones = list(pd.unique(cells['zone'].astype(str)))
+        date_codes = self.dates.get_indexer(cells['Date'])
+        zone_codes = pd.Index(self.zones).get_indexer(cells['zone'].astype(str))
+        hours = cells['Hr_End'].to_numpy(dtype=np.int64)
+        shape = (len(self.dates), len(self.zones), 25)
+        sums, counts = np.zeros(shape), np.zeros(shape)
+        n = cells['n_obs'].to_numpy(dtype=np.float64)
+        np.add.at(sums, (date_codes, zone_codes, hours), cells[value].to_numpy(dtype=np.float64) * n)
+        np.add.at(counts, (date_codes, zone_codes, hours), n)
+        self.sums = np.cumsum(sums, axis=2)
+        self.counts = np.cumsum(counts, axis=2)
+
+    def matrix(self, first, last):
+        """Mean price over hours ending ``first..last`` as a date x zone matrix."""
+        if not 1 <= first <= last <= 24:
+            raise ValueError(f"Invalid peak window {first}-{last}")
+        total = self.sums[:, :, last] - self.sums[:, :, first - 1]
+        count = self.counts[:, :, last] - self.counts[:, :, first - 1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = np.where(count > 0, total / count, np.nan)
+        matrix = pd.DataFrame(values, index=self.dates, columns=self.zones)
+        matrix.index.name = 'Date'
+        matrix.columns.name = 'zone'
+        return matrix
+
+
+def hourly_cells(sources, value='DA_LMP', keys=KEYS, chunksize=500_000, timestamp=None):
+    """Stream the hourly files once into per date, zone and hour-ending averages and counts."""
+    return stream_peak_prices(sources, window=hour_window(1, 24), value=value,
+                              keys=tuple(keys) + ('Hr_End',), chunksize=chunksize,
+                              timestamp=timestamp)
+
+
+def fold_blocks(dates, n_folds=5, post_start=POLICY_DATE):
+    """Block number (0..n_folds) of each pre-period date, -1 after ``post_start``."""
+    dates = pd.DatetimeIndex(dates)
+    pre = dates < pd.Timestamp(post_start)
+    blocks = np.full(len(dates), -1)
+    blocks[pre] = np.arange(pre.sum()) * (n_folds + 1) // max(pre.sum(), 1)
+    return blocks
+
+
+def block_grams(matrix, n_folds=5, post_start=POLICY_DATE):
+    """Gram matrix over all zones and row count of each pre-period block.
+
+    Rows with a missing price in any zone are dropped. Returns arrays of
+    shape ``(n_folds + 1, J, J)`` and ``(n_folds + 1,)``.
+    """
+    values = matrix.to_numpy(dtype=np.float64)
+    blocks = fold_blocks(matrix.index, n_folds, post_start)
+    complete = ~np.isnan(values).any(axis=1)
+    grams = np.zeros((n_folds + 1, values.shape[1], values.shape[1]))
+    rows = np.zeros(n_folds + 1)
+    for b in range(n_folds + 1):
+        Z = values[(blocks == b) & complete]
+        grams[b] = Z.T @ Z
+        rows[b] = len(Z)
+    return grams, rows
+
+
+def donor_pools(zones, treated, min_donors=2, max_donors=None):
+    """Every subset of the other zones with ``min_donors`` to ``max_donors`` members."""
+    others = [zone for zone in zones if zone != treated]
+    if len(others) > MAX_ENUMERATED_DONORS:
+        raise ValueError(f"{len(others)} candidate donors give too many subsets to enumerate; "
+                         "pass explicit donor pools")
+    max_donors = len(others) if max_donors is None else max_donors
+    return [pool for size in range(min_donors, max_donors + 1)
+            for pool in itertools.combinations(others, size)]
+
+
+def candidate_grid(zones, treated, windows=PEAK_WINDOWS, penalties=RIDGE_PENALTIES, pools=None,
+                   methods=('ridge',), min_donors=2):
+    """Cross product of windows, penalties, donor pools and methods as Candidates."""
+    for method in methods:
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}; expected one of {METHODS}")
+    if pools is None:
+        pools = donor_pools(zones, treated, min_donors)
+    return [Candidate(tuple(window), float(penalty), tuple(pool), method)
+            for method in methods for window in windows for pool in pools
+            for penalty in penalties]
+
+
+def cv_rmspe(grams, rows, donors, treated, penalty=0.0, method='ridge'):
+    """Out-of-sample RMSPE of each fold and pooled over folds, from block Grams.
+
+    ``donors`` and ``treated`` index the Gram's zones. Fold ``k`` fits on
+    blocks ``0..k-1`` and predicts block ``k``.
+    """
+    d, t = np.asarray(donors), treated
+    train = np.cumsum(grams, axis=0)
+    train_rows = np.cumsum(rows)
+    sse, n = [], []
+    for k in range(1, len(grams)):
+        A = train[k - 1]
+        if method == 'ridge':
+            # Same normal equations as ridge_weights, from the stored Gram
+            w = np.linalg.solve(A[np.ix_(d, d)] + penalty * np.eye(len(d)), A[d, t])
+        else:
+            w, _ = simplex_weights(A[np.ix_(d, d)] / train_rows[k - 1], A[d, t] / train_rows[k - 1],
+                                   penalty)
+        V = grams[k]
+        sse.append(V[t, t] - 2 * w @ V[d, t] + w @ V[np.ix_(d, d)] @ w)
+        n.append(rows[k])
+    sse, n = np.array(sse), np.array(n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.sqrt(np.maximum(sse, 0) / n), float(np.sqrt(max(sse.sum(), 0) / n.sum()))
+
+
+# Set in each worker by _init_worker: window -> (block Grams, block rows), and the zones
+_worker_grams = None
+_worker_zones = None
+
+
+def _init_worker(grams, zones):
+    global _worker_grams, _worker_zones
+    _worker_grams, _worker_zones = grams, zones
+
+
+def _score(candidate, treated):
+    start = time.perf_counter()
+    grams, rows = _worker_grams[candidate.window]
+    donors = [_worker_zones.index(zone) for zone in candidate.donors]
+    folds, pooled = cv_rmspe(grams, rows, donors, _worker_zones.index(treated),
+                             candidate.penalty, candidate.method)
+    return pooled, folds, time.perf_counter() - start
+
+
+def _score_chunk(args):
+    candidates, treated = args
+    return [_score(candidate, treated) for candidate in candidates]
+
+
+@dataclass
+class SearchResult:
+    """Scores of every candidate, best first."""
+    table: pd.DataFrame         # one row per candidate: configuration, cv_rmspe, fold RMSPEs, seconds
+    candidates: list            # Candidate objects in table order
+    prep_seconds: dict = field(default_factory=dict)   # window -> price matrix and Gram time
+
+    @property
+    def best(self):
+        return self.candidates[0]
+
+    def best_by(self, column):
+        """Best candidate for each value of ``column`` (e.g. 'window' or 'penalty')."""
+        return self.table.loc[self.table.groupby(column, sort=False)['cv_rmspe'].idxmin()]
+
+
+def search(prices, treated, candidates, post_start=POLICY_DATE, n_folds=5, max_workers=None,
+           chunksize=None):
+    """Score ``candidates`` by time-series cross-validation of the pre-period.
+
+    ``prices`` is a :class:`HourlyPrices` or a dict mapping each window
+    ``(first, last)`` to its date x zone price matrix. Returns a
+    :class:`SearchResult` sorted by pooled out-of-sample RMSPE. With
+    ``max_workers=1`` candidates are scored in this process.
+    """
+    candidates = list(candidates)
+    windows = list(dict.fromkeys(candidate.window for candidate in candidates))
+    grams, prep_seconds, zones = {}, {}, None
+    for window in windows:
+        start = time.perf_counter()
+        matrix = prices.matrix(*window) if isinstance(prices, HourlyPrices) else prices[window]
+        zones = list(matrix.columns) if zones is None else zones
+        grams[window] = block_grams(matrix[zones], n_folds, post_start)
+        prep_seconds[window] = time.perf_counter() - start
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(candidates) == 1:
+        _init_worker(grams, zones)
+        scores = _score_chunk((candidates, treated))
+    else:
+        chunksize = chunksize or max(1, len(candidates) // (4 * max_workers))
+        chunks = [(candidates[i:i + chunksize], treated)
+                  for i in range(0, len(candidates), chunksize)]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(grams, zones)) as pool:
+            scores = [score for part in pool.map(_score_chunk, chunks) for score in part]
+
+    table = pd.DataFrame({
+        'method': [c.method for c in candidates],
+        'window': [f"{c.window[0]}-{c.window[1]}" for c in candidates],
+        'penalty': [c.penalty for c in candidates],
+        'n_donors': [len(c.donors) for c in candidates],
+        'donors': [", ".join(c.donors) for c in candidates],
+        'cv_rmspe': [pooled for pooled, _, _ in scores],
+    })
+    folds = np.array([fold for _, fold, _ in scores])
+    for k in range(folds.shape[1]):
+        table[f"fold_{k + 1}_rmspe"] = folds[:, k]
+    table['seconds'] = [seconds for _, _, seconds in scores]
+    order = np.argsort(table['cv_rmspe'].to_numpy(), kind='stable')
+    return SearchResult(table.iloc[order].reset_index(drop=True),
+                        [candidates[i] for i in order], prep_seconds)
+
+
+def refit(prices, treated, candidate, post_start=POLICY_DATE):
+    """Fit the chosen candidate on the whole pre-period; same return as ``synthetic_control``."""
+    matrix = prices.matrix(*candidate.window) if isinstance(prices, HourlyPrices) \
+        else prices[candidate.window]
+    if candidate.method == 'ridge':
+        return synthetic_control(matrix, treated, list(candidate.donors), post_start,
+                                 alpha=candidate.penalty)
+    return simplex_synthetic_control(matrix, treated, list(candidate.donors), post_start,
+                                     penalty=candidate.penalty)
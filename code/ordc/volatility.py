@@ -0,0 +1,252 @@
+"""Volatile-day flags and the triple-interaction models on the hourly panel.
+
+The headline volatility result compares Zone F with its controls on
+volatile days. A zone-day counts as volatile when its mean price lies more
+than ``threshold`` standard deviations from that zone's mean. The mean and
+standard deviation are either long-term (the whole sample) or taken over a
+trailing window of earlier days. The triple-interaction model adds
+``is_volatile`` and its interactions with ``treated``, ``post`` and
+``treated x post`` to the DiD with zone and year effects.
+
+:class:`VolatilityPanel` reduces the hourly rows once to zone-day cells
+(hour counts, sums and sums of squares of the price). It also builds the
+date x zone matrix of daily means. All of these are shared by every
+volatility definition:
+
+* z-scores are vectorized over zones on the date x zone matrix, with one
+  rolling pass per window, and are cached per window;
+* every regressor is constant within a zone-day, so each model is an OLS
+  on the cells through :meth:`SufficientStats.update_cells
+  <ordc.suffstats.SufficientStats.update_cells>`. That is exact for
+  coefficients and for clustered, HC and classical standard errors, and
+  costs O(zone-days) per fit, not O(hours).
+
+A threshold sweep therefore redoes only a comparison and a small cell
+regression per threshold. :func:`volatility_terms` adds the same flags and
+interactions to the hourly rows for use with other estimators.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .suffstats import SufficientStats
+
+VOLATILITY_TERMS = ('is_volatile', 'treat_volatile', 'post_volatile', 'treat_post_volatile')
+MODELS = {
+    # Model name: (regressors after the effects, days used, term reported by sweeps)
+    'triple': (('treat_post', 'post') + VOLATILITY_TERMS, 'all', 'treat_post_volatile'),
+    'volatile_only': (('treat_post', 'post'), 'volatile', 'treat_post'),
+}
+SIDES = ('both', 'upper', 'lower')
+
+
+def volatility_terms(df, is_volatile, treated='treated', post='post'):
+    """Return ``df`` with the DiD and triple-interaction columns added (as ``int8``).
+
+    ``is_volatile`` is a boolean per row of ``df``, e.g. from
+    :meth:`VolatilityPanel.row_flags`.
+    """
+    v = np.asarray(is_volatile).astype(np.int8)
+    t = df[treated].to_numpy(dtype=np.int8)
+    p = df[post].to_numpy(dtype=np.int8)
+    return df.assign(treat_post=t * p, is_volatile=v, treat_volatile=t * v,
+                     post_volatile=p * v, treat_post_volatile=t * p * v)
+
+
+class VolatilityPanel:
+    """Zone-day cells of an hourly panel, shared across volatility definitions.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Hourly rows with ``date``, ``zone``, ``treated``, ``post`` and
+        ``value`` columns. ``treated`` and ``post`` must be constant within
+        a zone-day.
+    value : str
+        Price column; it is both the regression outcome and the series
+        whose deviations define volatile days.
+    """
+
+    def __init__(self, df, value='DA_LMP', date='Date', zone='zone', treated='treated',
+                 post='post'):
+        self.value = value
+        zone_codes, self.zones = pd.factorize(df[zone], sort=True)
+        date_codes, self.dates = pd.factorize(pd.to_datetime(df[date]), sort=True)
+        self.day_codes, cells = pd.factorize(date_codes.astype(np.int64) * len(self.zones)
+                                             + zone_codes, sort=True)
+        self.day_date, self.day_zone = np.divmod(cells, len(self.zones))
+        n_days = len(cells)
+
+        y = df[value].to_numpy(dtype=np.float64)
+        self.counts = np.bincount(self.day_codes, minlength=n_days).astype(np.float64)
+        self.ysum = np.bincount(self.day_codes, weights=y, minlength=n_days)
+        self.yysum = np.bincount(self.day_codes, weights=y * y, minlength=n_days)
+
+        flags = {}
+        for name, column in (('treated', treated), ('post', post)):
+            values = df[column].to_numpy(dtype=np.float64)
+            sums = np.bincount(self.day_codes, weights=values, minlength=n_days)
+            flags[name] = sums / self.counts
+            if not np.all((flags[name] == 0) | (flags[name] == 1)):
+                raise ValueError(f"{column!r} must be 0/1 and constant within each zone-day")
+        self.treated = flags['treated']
+        self.post = flags['post']
+
+        # Date x zone matrix of daily means, for the rolling statistics
+        daily = np.full((len(self.dates), len(self.zones)), np.nan)
+        daily[self.day_date, self.day_zone] = self.ysum / self.counts
+        self.daily = pd.DataFrame(daily, index=self.dates, columns=self.zones)
+        self._zscores = {}
+        self._designs = {}
+
+    @property
+    def nobs(self):
+        return int(self.counts.sum())
+
+    def keys(self, name):
+        """Day-level labels used for effects and clusters."""
+        if name == 'zone':
+            return self.zones[self.day_zone]
+        dates = self.dates[self.day_date]
+        if name == 'year':
+            return dates.year
+        if name == 'month':
+            return dates.month
+        if name == 'date':
+            return dates
+        raise ValueError(f"Unknown key {name!r}; expected zone, year, month or date")
+
+    def zscores(self, window=None, min_periods=None):
+        """Standardized daily mean price of every zone-day, cached per window.
+
+        With ``window=None`` the mean and standard deviation are each zone's
+        long-term values. Otherwise they come from a trailing window of
+        earlier days, excluding the day itself: an integer number of rows of
+        the date x zone matrix or an offset such as ``'90D'``. Days without
+        enough history get NaN and are never flagged.
+        """
+        key = (window, min_periods)
+        if key not in self._zscores:
+            if window is None:
+                mean, std = self.daily.mean(), self.daily.std()
+            else:
+                rolling = self.daily.rolling(window, min_periods=min_periods, closed='left')
+                mean, std = rolling.mean(), rolling.std()
+            z = ((self.daily - mean) / std).to_numpy()
+            self._zscores[key] = z[self.day_date, self.day_zone]
+        return self._zscores[key]
+
+    def flags(self, threshold=2.0, window=None, side='both', min_periods=None):
+        """Boolean volatile flag per zone-day.
+
+        ``side`` selects deviations in either direction (``'both'``), only
+        price spikes (``'upper'``) or only slumps (``'lower'``).
+        """
+        if side not in SIDES:
+            raise ValueError(f"Unknown side {side!r}; expected one of {SIDES}")
+        z = self.zscores(window, min_periods)
+        deviation = np.abs(z) if side == 'both' else z if side == 'upper' else -z
+        with np.errstate(invalid='ignore'):
+            return deviation > threshold
+
+    def row_flags(self, threshold=2.0, window=None, side='both', min_periods=None):
+        """The volatile flag broadcast back to the hourly rows."""
+        return self.flags(threshold, window, side, min_periods)[self.day_codes]
+
+    def _base_design(self, effects, days):
+        """Intercept and drop-first dummies for ``effects`` over the selected days.
+
+        Only levels present among ``days`` get a dummy. The full-sample
+        design is cached per effect structure.
+        """
+        key = tuple(effects)
+        if days is None and key in self._designs:
+            return self._designs[key]
+        parts, names = [np.ones((self.day_zone.size, 1))], ['Intercept']
+        for effect in effects:
+            codes, levels = pd.factorize(self.keys(effect), sort=True)
+            present = np.unique(codes if days is None else codes[days])
+            names += [f"C({effect})[T.{levels[level]}]" for level in present[1:]]
+            parts.append((codes[:, None] == present[1:]).astype(np.float64))
+        design = np.hstack(parts), names
+        if days is None:
+            self._designs[key] = design
+        return design
+
+    def design(self, volatile, model='triple', effects=('zone', 'year')):
+        """Zone-day design matrix, column names and the days used for one model."""
+        regressors, sample, _ = MODELS[model]
+        days = volatile if sample == 'volatile' else None
+        base, names = self._base_design(effects, days)
+        t, p, v = self.treated, self.post, volatile.astype(np.float64)
+        terms = {'treat_post': t * p, 'post': p, 'is_volatile': v, 'treat_volatile': t * v,
+                 'post_volatile': p * v, 'treat_post_volatile': t * p * v}
+        X = np.column_stack([base] + [terms[name] for name in regressors])
+        return X, names + list(regressors), days
+
+    def fit(self, threshold=2.0, window=None, model='triple', effects=('zone', 'year'),
+            cluster='zone', cov_type='cluster', side='both', min_periods=None):
+        """Fit the triple-interaction or volatile-days-only model; returns a FitSummary.
+
+        ``cluster`` is a day-level key (``'zone'`` or ``'date'``) and is
+        used when ``cov_type='cluster'``; the other covariance types are
+        those of :meth:`SufficientStats.fit <ordc.suffstats.SufficientStats.fit>`.
+        """
+        volatile = self.flags(threshold, window, side, min_periods)
+        return self._fit(volatile, model, effects, cluster, cov_type)
+
+    def _fit(self, volatile, model, effects, cluster, cov_type):
+        X, names, days = self.design(volatile, model, effects)
+        counts, ysum, yysum = self.counts, self.ysum, self.yysum
+        clusters = self.keys(cluster) if cov_type == 'cluster' else None
+        if days is not None:
+            X, counts, ysum, yysum = X[days], counts[days], ysum[days], yysum[days]
+            clusters = None if clusters is None else clusters[days]
+        if clusters is not None and len(pd.unique(np.asarray(clusters))) < 2:
+            raise np.linalg.LinAlgError(f"Fewer than two {cluster!r} clusters in the sample")
+        suff = SufficientStats(names, robust=cov_type in ('HC0', 'HC1'))
+        suff.update_cells(X, counts, ysum, yysum, clusters)
+        # e.g. no volatile days before the policy makes 'post' a sum of year dummies
+        used = np.diag(suff.xtx) > 0
+        if np.linalg.matrix_rank(suff.xtx[np.ix_(used, used)]) < used.sum():
+            raise np.linalg.LinAlgError(f"Collinear design for the {model!r} model")
+        return suff.fit(cov_type=cov_type)
+
+    def sweep(self, thresholds, windows=(None,), models=('triple', 'volatile_only'),
+              effects=('zone', 'year'), cluster='zone', cov_type='cluster', side='both',
+              min_periods=None):
+        """Fit every window x threshold x model; one row per fit.
+
+        Each row reports the model's key term (``treat_post_volatile`` for
+        the triple interaction, ``treat_post`` on volatile days only), its
+        standard error and p-value, and the number and share of volatile
+        zone-days. Fits whose design is singular (e.g. a threshold so high
+        that no treated day after the policy is volatile) get NaN.
+        """
+        rows = []
+        for window in windows:
+            for threshold in thresholds:
+                volatile = self.flags(threshold, window, side, min_periods)
+                for model in models:
+                    term = MODELS[model][2]
+                    row = {'window': window, 'threshold': threshold, 'model': model,
+                           'volatile_days': int(volatile.sum()),
+                           'volatile_share': float(volatile.mean()), 'term': term}
+                    try:
+                        with warnings.catch_warnings():
+                            # Terms with no volatile days are dropped; reported as NaN below
+                            warnings.simplefilter('ignore')
+                            summary = self._fit(volatile, model, effects, cluster, cov_type)
+                    except np.linalg.LinAlgError:
+                        summary = None
+                    if summary is None or term not in summary.params.index:
+                        row.update(coef=np.nan, std_error=np.nan, pvalue=np.nan,
+                                   nobs=0, rsquared=np.nan)
+                    else:
+                        row.update(coef=summary.params[term],
+                                   std_error=summary.std_errors[term],
+                                   pvalue=summary.pvalues[term], nobs=summary.nobs,
+                                   rsquared=summary.rsquared)
+                    rows.append(row)
+        return pd.DataFrame(rows)
@@ -0,0 +1,100 @@
+"""Cross-validated search for the synthetic control's penalty, peak window and donor pool.
+
+Run from the folder holding the hourly workbook:
+
+    python code/tune_synthetic_control.py [--windows 17-20 16-21 ...] [--penalties 0 1 1e4 ...]
+        [--methods ridge simplex] [--folds 5] [--workers N]
+
+Every combination of peak window, penalty, donor pool (all subsets of the
+control zones with at least ``--min-donors`` members) and method is scored
+by out-of-sample RMSPE on time-series splits of the period before May 2022
+(see ``ordc.tuning``). The hourly file is read once, and candidates are
+scored on a process pool. All scores are written to
+``synthetic_control_results/sc_search.csv``. The best configuration is then
+refitted and compared with the fixed one in ``Synthetic_control.py``
+(17-20, ``alpha=1.0``, every control zone).
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from ordc.profiling import Profiler
+from ordc.synth import POLICY_DATE, treated_zones
+from ordc.tuning import (METHODS, PEAK_WINDOWS, RIDGE_PENALTIES, Candidate, HourlyPrices,
+                         candidate_grid, hourly_cells, refit, search)
+
+DATA_FILE = "Sythetic control regression database.xlsx"
+RESULTS_DIR = Path("synthetic_control_results")
+FIXED_WINDOW, FIXED_ALPHA = (17, 20), 1.0
+
+
+def parse_window(text):
+    first, last = (int(part) for part in text.split('-'))
+    return first, last
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--file', default=DATA_FILE)
+    parser.add_argument('--windows', type=parse_window, nargs='+', default=list(PEAK_WINDOWS),
+                        help="peak windows as first-last hour ending, e.g. 17-20")
+    parser.add_argument('--penalties', type=float, nargs='+', default=list(RIDGE_PENALTIES))
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=['ridge'])
+    parser.add_argument('--min-donors', type=int, default=2)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, help="worker processes (default: all CPUs)")
+    args = parser.parse_args()
+    RESULTS_DIR.mkdir(exist_ok=True)
+
+    with Profiler(profile=()) as profiler:
+        with profiler.stage('hourly_cells') as step:
+            cells = step.shape(hourly_cells(args.file))
+        treated = treated_zones(cells)[0]
+        prices = HourlyPrices(cells)
+
+        fixed = Candidate(FIXED_WINDOW, FIXED_ALPHA,
+                          tuple(zone for zone in prices.zones if zone != treated))
+        candidates = candidate_grid(prices.zones, treated, args.windows, args.penalties,
+                                    methods=args.methods, min_donors=args.min_donors)
+        if fixed not in candidates:
+            candidates.append(fixed)
+        with profiler.stage('search', candidates=len(candidates)) as step:
+            result = search(prices, treated, candidates, POLICY_DATE, n_folds=args.folds,
+                            max_workers=args.workers)
+            step.shape(result.table)
+        result.table.to_csv(RESULTS_DIR / "sc_search.csv", index=False)
+
+        with profiler.stage('refit'):
+            best_df, best_weights = refit(prices, treated, result.best)
+            fixed_df, _ = refit(prices, treated, fixed)
+
+    seconds = result.table['seconds']
+    fixed_row = result.table.iloc[result.candidates.index(fixed)]
+    print(f"Scored {len(candidates)} candidates for {treated} with {args.folds} time-series folds "
+          f"of the pre-period (before {POLICY_DATE.date()})")
+    print(f"Runtime per candidate: median {np.median(seconds) * 1e3:.2f} ms, "
+          f"max {seconds.max() * 1e3:.2f} ms; price matrix and Grams per window: "
+          f"{np.mean(list(result.prep_seconds.values())) * 1e3:.1f} ms")
+    print("\nTop candidates by out-of-sample pre-period RMSPE:")
+    print(result.table.head(10).to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    print("\nBest candidate for each peak window:")
+    print(result.best_by('window')[['method', 'window', 'penalty', 'donors', 'cv_rmspe']]
+          .to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+
+    best = result.best
+    print(f"\nBest: {best.method}, hours {best.window[0]}-{best.window[1]}, penalty {best.penalty:g}, "
+          f"donors {', '.join(best.donors)}")
+    print(f"  CV RMSPE {result.table['cv_rmspe'].iloc[0]:.3f} vs {fixed_row['cv_rmspe']:.3f} "
+          f"for the fixed configuration (rank {result.candidates.index(fixed) + 1})")
+    print(f"  Average treatment effect {best_df.loc[best_df['post'], 'gap'].mean():.2f} $/MWh vs "
+          f"{fixed_df.loc[fixed_df['post'], 'gap'].mean():.2f} $/MWh")
+    print("  Donor weights:")
+    print(best_weights.round(3).to_string())
+    print(f"\nAll scores saved to {RESULTS_DIR / 'sc_search.csv'}")
+    print("\nStage timings:")
+    print(profiler.report())
+
+
+if __name__ == '__main__':
+    main()